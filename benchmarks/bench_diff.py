@@ -0,0 +1,38 @@
+"""Benchmark the diff engines of ``compair.diffing`` against difflib on synthetic documents.
+
+The documents come from ``benchmarks.synthetic``: numbered clauses separated by repeated
+boilerplate headings and table rows, with a fraction of the lines edited, inserted or deleted.
+
+Usage:
+    PYTHONPATH=. uv run python benchmarks/bench_diff.py --lines 10000 50000 100000
+"""
+
+import argparse
+import time
+
+from benchmarks.synthetic import make_document_pair
+from compair.diffing import DIFF_ENGINES, unified_diff_lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--edit-ratio", type=float, default=0.01)
+    parser.add_argument("--engines", nargs="+", default=list(DIFF_ENGINES), choices=DIFF_ENGINES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'lines':>8} {'engine':>10} {'best [s]':>10} {'diff lines':>11}")
+    for n_lines in args.lines:
+        lines_a, lines_b = make_document_pair(n_lines, args.edit_ratio)
+        for engine in args.engines:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                diff = unified_diff_lines(lines_a, lines_b, n=1, engine=engine)
+                timings.append(time.perf_counter() - start)
+            print(f"{n_lines:>8} {engine:>10} {min(timings):>10.3f} {len(diff):>11}")
+
+
+if __name__ == "__main__":
+    main()
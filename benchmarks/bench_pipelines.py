@@ -0,0 +1,127 @@
+"""Benchmark the llm-light and llm-heavy pipelines end to end against a local stub LLM server.
+
+Synthetic contract PDFs are generated, parsed, diffed and classified with every request
+answered by ``benchmarks.stub_server`` after a fixed latency, so the numbers show the overhead
+and concurrency of the pipelines without API costs or network variance. Caches are disabled.
+
+Usage:
+    PYTHONPATH=. uv run python benchmarks/bench_pipelines.py --lines 500 2000 --latency 0.5
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.stub_server import StubLLMServer
+from benchmarks.synthetic import make_document_pair, write_pdf
+from compair import client, pipelines
+
+
+def _use_stub(stub: StubLLMServer) -> None:
+    # client.py loads .env on import, so Azure settings from there are dropped as well
+    for name in ("AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_API_KEY"):
+        os.environ.pop(name, None)
+    os.environ["OPENAI_BASE_URL"] = stub.base_url
+    os.environ["OPENAI_API_KEY"] = "stub"
+    client._client = None
+
+
+def bench_llm_light(pdf_a: Path, pdf_b: Path, args: argparse.Namespace) -> tuple[float, ...]:
+    """Run llm-light once and measure its stages.
+
+    Args:
+        pdf_a: Path to the first PDF.
+        pdf_b: Path to the second PDF.
+        args: The parsed command line arguments.
+
+    Returns:
+        Seconds until the diff is ready, until the first change, until the last change, and
+        the number of changes.
+    """
+    start = time.perf_counter()
+    _, _, changes = pipelines.stream_llm_light(
+        str(pdf_a),
+        str(pdf_b),
+        max_concurrency=args.max_concurrency,
+        batch_size=args.batch_size,
+        use_cache=False,
+        parse_workers=args.parse_workers,
+    )
+    diffed = time.perf_counter() - start
+    first = None
+    n_changes = 0
+    for _ in changes:
+        n_changes += 1
+        if first is None:
+            first = time.perf_counter() - start
+    return diffed, first or 0.0, time.perf_counter() - start, n_changes
+
+
+def bench_llm_heavy(pdf_a: Path, pdf_b: Path, args: argparse.Namespace) -> tuple[float, ...]:
+    """Run llm-heavy once and measure its duration.
+
+    Args:
+        pdf_a: Path to the first PDF.
+        pdf_b: Path to the second PDF.
+        args: The parsed command line arguments.
+
+    Returns:
+        Seconds until the report is ready and the number of changes.
+    """
+    start = time.perf_counter()
+    report = pipelines.run_llm_heavy(
+        str(pdf_a),
+        str(pdf_b),
+        use_cache=False,
+        parse_workers=args.parse_workers,
+        chunk_token_budget=args.chunk_tokens,
+        max_concurrency=args.max_concurrency,
+    )
+    return time.perf_counter() - start, len(report.difference_report.changes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--edit-ratio", type=float, default=0.05)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per LLM request")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Random extra seconds")
+    parser.add_argument("--pipelines", nargs="+", default=["light", "heavy"])
+    parser.add_argument("-c", "--max-concurrency", type=int, default=8)
+    parser.add_argument("-b", "--batch-size", type=int, default=1)
+    parser.add_argument("--chunk-tokens", type=int, default=None)
+    parser.add_argument("-w", "--parse-workers", type=int, default=None)
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show pipeline logs")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    with StubLLMServer(args.latency, args.jitter) as stub, tempfile.TemporaryDirectory() as tmp:
+        _use_stub(stub)
+        print(
+            f"{'lines':>6} {'pipeline':>8} {'diff [s]':>9} {'first [s]':>10} {'total [s]':>10} "
+            f"{'changes':>8} {'changes/s':>10} {'requests':>9} {'in flight':>10}"
+        )
+        for n_lines in args.lines:
+            lines_a, lines_b = make_document_pair(n_lines, args.edit_ratio)
+            pdf_a = write_pdf(lines_a, Path(tmp) / f"a-{n_lines}.pdf")
+            pdf_b = write_pdf(lines_b, Path(tmp) / f"b-{n_lines}.pdf")
+            for pipeline in args.pipelines:
+                stub.requests = stub.max_in_flight = 0
+                if pipeline == "light":
+                    diffed, first, total, n_changes = bench_llm_light(pdf_a, pdf_b, args)
+                    timings = f"{diffed:>9.2f} {first:>10.2f}"
+                else:
+                    total, n_changes = bench_llm_heavy(pdf_a, pdf_b, args)
+                    timings = f"{'-':>9} {'-':>10}"
+                print(
+                    f"{n_lines:>6} {pipeline:>8} {timings} {total:>10.2f} {n_changes:>8} "
+                    f"{n_changes / total:>10.1f} {stub.requests:>9} {stub.max_in_flight:>10}"
+                )
+
+
+if __name__ == "__main__":
+    main()
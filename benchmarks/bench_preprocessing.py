@@ -0,0 +1,99 @@
+"""Micro-benchmark the local preprocessing steps on synthetic documents.
+
+Measures ``cleanup_markdown`` on raw, hard-wrapped markdown next to its previous implementation
+and ``MarkdownNormalizer`` fed page by page, ``diff_texts`` on cleaned markdown and
+``DiffHunk.from_unified_diff_lines`` on the resulting unified diff, reporting the best of several
+runs and the throughput in MB/s of input.
+
+Usage:
+    PYTHONPATH=. uv run python benchmarks/bench_preprocessing.py --lines 10000 50000
+"""
+
+import argparse
+import logging
+import time
+from typing import Callable
+
+from benchmarks.legacy import legacy_cleanup_markdown
+from benchmarks.synthetic import make_document_pair, to_raw_markdown
+from compair.diffing import unified_diff_lines
+from compair.models import DiffHunk
+from compair.preprocessing import MarkdownNormalizer, cleanup_markdown, diff_texts
+
+LINES_PER_PAGE = 60
+
+
+def best_of(repeat: int, function: Callable[[], object]) -> float:
+    """Run ``function`` several times and return the fastest duration.
+
+    Args:
+        repeat: Number of runs.
+        function: Zero-argument callable to time.
+
+    Returns:
+        The duration of the fastest run in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def normalize_pages(pages: list[str]) -> str:
+    """Clean-up markdown page by page with ``MarkdownNormalizer``.
+
+    Args:
+        pages: Raw markdown of consecutive pages.
+
+    Returns:
+        The cleaned-up markdown of all pages.
+    """
+    normalizer = MarkdownNormalizer()
+    for page in pages:
+        normalizer.feed(page)
+    return normalizer.finish()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--edit-ratio", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'lines':>8} {'step':>24} {'best [s]':>10} {'MB/s':>8}")
+    for n_lines in args.lines:
+        lines_a, lines_b = make_document_pair(n_lines, args.edit_ratio)
+        raw_markdown = to_raw_markdown(lines_a)
+        raw_lines = raw_markdown.splitlines(keepends=True)
+        pages = [
+            "".join(raw_lines[start : start + LINES_PER_PAGE])
+            for start in range(0, len(raw_lines), LINES_PER_PAGE)
+        ]
+        text_a, text_b = "\n".join(lines_a), "\n".join(lines_b)
+        diff_lines = unified_diff_lines(lines_a, lines_b, n=1)
+        steps: list[tuple[str, int, Callable[[], object]]] = [
+            (
+                "legacy_cleanup_markdown",
+                len(raw_markdown),
+                lambda: legacy_cleanup_markdown(raw_markdown),
+            ),
+            ("cleanup_markdown", len(raw_markdown), lambda: cleanup_markdown(raw_markdown)),
+            ("MarkdownNormalizer", len(raw_markdown), lambda: normalize_pages(pages)),
+            ("diff_texts", len(text_a) + len(text_b), lambda: diff_texts(text_a, text_b)),
+            (
+                "from_unified_diff_lines",
+                sum(len(line) for line in diff_lines),
+                lambda: DiffHunk.from_unified_diff_lines(diff_lines),
+            ),
+        ]
+        for name, size, function in steps:
+            seconds = best_of(args.repeat, function)
+            print(f"{n_lines:>8} {name:>24} {seconds:>10.4f} {size / seconds / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
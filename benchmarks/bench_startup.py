@@ -0,0 +1,84 @@
+"""Benchmark the startup time of the CLI in fresh interpreter processes.
+
+Batch scripts spawn ``compair`` once per document pair, so the time to import the package and
+parse the arguments is paid every time. Each command runs in a new process and the best and
+median wall times are reported next to a bare interpreter start as a baseline. ``--importtime``
+prints the slowest imports of ``compair --help`` as reported by ``python -X importtime``.
+
+Usage:
+    PYTHONPATH=. uv run python benchmarks/bench_startup.py --repeat 20
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+COMMANDS = {
+    "python": ["-c", "pass"],
+    "compair --help": ["-m", "compair", "--help"],
+    "compair batch --help": ["-m", "compair", "batch", "--help"],
+    "import compair.pipelines": ["-c", "import compair.pipelines"],
+}
+
+
+def time_command(args: list[str], repeat: int) -> list[float]:
+    """Run the interpreter with ``args`` several times.
+
+    Args:
+        args: Arguments passed to the current Python interpreter.
+        repeat: Number of runs.
+
+    Returns:
+        The wall time of every run in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], check=True, capture_output=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def slowest_imports(args: list[str], count: int) -> list[tuple[int, str]]:
+    """Return the imports with the largest cumulative time.
+
+    Args:
+        args: Arguments passed to the current Python interpreter.
+        count: Number of imports to return.
+
+    Returns:
+        Pairs of the cumulative import time in microseconds and the module name.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args], check=True, capture_output=True, text=True
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'command':>26} {'best [ms]':>10} {'median [ms]':>12}")
+    for name, command in COMMANDS.items():
+        timings = time_command(command, args.repeat)
+        print(f"{name:>26} {min(timings) * 1e3:>10.1f} {statistics.median(timings) * 1e3:>12.1f}")
+
+    if args.importtime:
+        print()
+        for cumulative, module in slowest_imports(COMMANDS["compair --help"], 15):
+            print(f"{cumulative / 1e3:>10.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Previous implementations kept as baselines for benchmarks and regression tests."""
+
+import re
+
+
+def legacy_cleanup_markdown(markdown_text: str) -> str:
+    """Clean-up markdown with the multi-pass algorithm ``cleanup_markdown`` used before.
+
+    Args:
+        markdown_text: Markdown string extracted from a PDF.
+
+    Returns:
+        The cleaned-up markdown, which ``cleanup_markdown`` must reproduce byte for byte.
+    """
+    text = markdown_text.replace("\r\n", "\n").replace("\r", "\n")
+    paragraphs = re.split(r"\n\s*\n", text)
+
+    normalized_paragraphs = []
+    for para in paragraphs:
+        if para.strip().startswith("```") and para.strip().endswith("```"):
+            normalized_paragraphs.append(para)
+            continue
+
+        collapsed = re.sub(r"\n+", " ", para)
+        collapsed = re.sub(r"\s{2,}", " ", collapsed)
+        collapsed = collapsed.strip()
+        normalized_paragraphs.append(collapsed)
+
+    non_empty_paragraphs = [p for p in normalized_paragraphs if p]
+    normalized = "\n".join(non_empty_paragraphs)
+    return re.sub(r"[ \t]+$", "", normalized, flags=re.MULTILINE)
@@ -0,0 +1,330 @@
+"""Local OpenAI-compatible stub server for benchmarks and offline tests.
+
+The server answers ``POST /v1/chat/completions`` after a configurable latency with a valid
+structured output for the response formats used by ``compair.pipelines``: a
+``ChangeClassification``, a ``ChangeClassificationBatch`` with one entry per hunk id in the
+request, or an empty ``DifferenceReport``. It records the number of requests and the peak
+number of requests in flight.
+
+It also serves the parts of the Files and Batches APIs that ``compair.offline`` and
+``compair.uploads`` use: uploading and retrieving files, creating and retrieving a batch and
+downloading its output. A batch is answered like the chat completions above and completes
+after a configurable latency. ``request_bytes`` sums the size of all chat completion requests.
+
+Usage:
+    uv run python benchmarks/stub_server.py --port 8000 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8000/v1 OPENAI_API_KEY=stub uv run compair a.pdf b.pdf
+"""
+
+import argparse
+import email.parser
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+__all__ = ["StubLLMServer"]
+
+_HUNK_ID_RE = re.compile(r"^Hunk id: (\S+)", re.MULTILINE)
+_BATCH_RE = re.compile(r"/batches/([^/]+)$")
+_FILE_RE = re.compile(r"/files/([^/]+)$")
+_FILE_CONTENT_RE = re.compile(r"/files/([^/]+)/content$")
+
+_CLASSIFICATION = {
+    "change_type": "modified",
+    "category": "Minor",
+    "confidence": 0.9,
+    "location": None,
+    "impact_analysis": None,
+    "summary": "Stub classification.",
+}
+
+
+def _message_text(messages: list[dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(part.get("text", "") for part in content if isinstance(part, dict))
+    return "\n".join(parts)
+
+
+def _structured_output(body: dict[str, Any]) -> dict[str, Any]:
+    response_format = body.get("response_format") or {}
+    name = response_format.get("json_schema", {}).get("name", "")
+    if name == "ChangeClassificationBatch":
+        hunk_ids = _HUNK_ID_RE.findall(_message_text(body.get("messages", [])))
+        return {
+            "classifications": [
+                {"hunk_id": hunk_id, "change_classification": _CLASSIFICATION}
+                for hunk_id in hunk_ids
+            ]
+        }
+    if name == "DifferenceReport":
+        return {"changes": [], "summary": "Stub report."}
+    if name == "DifferenceReportWithInputs":
+        return {
+            "document_a": "",
+            "document_b": "",
+            "difference_report": {"changes": [], "summary": "Stub report."},
+        }
+    return _CLASSIFICATION
+
+
+def _completion(body: dict[str, Any], content: str, request_id: int) -> dict[str, Any]:
+    prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-stub-{request_id}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _multipart_form(content_type: str, data: bytes) -> dict[str, Any]:
+    message = email.parser.BytesParser().parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + data
+    )
+    form: dict[str, Any] = {}
+    for part in message.get_payload():
+        name = part.get_param("name", header="content-disposition")
+        payload = part.get_payload(decode=True)
+        if part.get_filename() is None:
+            form[name] = payload.decode("utf-8")
+        else:
+            form[name] = payload
+            form["filename"] = part.get_filename()
+    return form
+
+
+class StubLLMServer:
+    """OpenAI-compatible chat completions server running in a background thread.
+
+    Use it as a context manager and point the OpenAI client at ``base_url``.
+
+    Args:
+        latency: Seconds each request takes before it is answered.
+        jitter: Maximum random seconds added to ``latency``.
+        host: Interface to bind to.
+        port: Port to bind to, ``0`` picks a free port.
+        batch_latency: Seconds a batch stays in progress before it completes.
+        batch_errors: Number of requests at the start of every batch that are answered with
+            an error.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        batch_latency: float = 0.0,
+        batch_errors: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.batch_latency = batch_latency
+        self.batch_errors = batch_errors
+        self.files: dict[str, bytes] = {}
+        self.file_objects: dict[str, dict[str, Any]] = {}
+        self.batches: dict[str, dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self.requests = 0
+        self.request_bytes = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _create_file(
+        self, content: bytes, filename: str, purpose: str, expires_in: int | None = None
+    ) -> dict[str, Any]:
+        created_at = int(time.time())
+        with self._lock:
+            file_id = f"file-stub-{next(self._ids)}"
+            self.files[file_id] = content
+            self.file_objects[file_id] = {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(content),
+                "created_at": created_at,
+                "expires_at": created_at + expires_in if expires_in is not None else None,
+                "filename": filename,
+                "purpose": purpose,
+                "status": "processed",
+            }
+            return self.file_objects[file_id]
+
+    def _create_batch(self, body: dict[str, Any]) -> dict[str, Any]:
+        lines = self.files[body["input_file_id"]].decode("utf-8").splitlines()
+        output = []
+        for i, line in enumerate(filter(None, lines)):
+            request = json.loads(line)
+            result: dict[str, Any] = {"id": f"batch-req-{i}", "custom_id": request["custom_id"]}
+            if i < self.batch_errors:
+                result["response"] = None
+                result["error"] = {"code": "server_error", "message": "Stub error."}
+            else:
+                content = json.dumps(_structured_output(request["body"]))
+                result["response"] = {
+                    "status_code": 200,
+                    "request_id": f"req-{i}",
+                    "body": _completion(request["body"], content, i),
+                }
+                result["error"] = None
+            output.append(json.dumps(result))
+        output_file = self._create_file(
+            ("\n".join(output) + "\n").encode("utf-8"), "batch_output.jsonl", "batch_output"
+        )
+        with self._lock:
+            batch_id = f"batch-stub-{next(self._ids)}"
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": body["endpoint"],
+                "input_file_id": body["input_file_id"],
+                "completion_window": body["completion_window"],
+                "created_at": int(time.time()),
+                "status": "in_progress",
+                "request_counts": {"total": len(output), "completed": 0, "failed": 0},
+                "_output_file_id": output_file["id"],
+                "_completes_at": time.monotonic() + self.batch_latency,
+                "_failed": min(self.batch_errors, len(output)),
+            }
+        return self._batch(batch_id)
+
+    def _batch(self, batch_id: str) -> dict[str, Any]:
+        with self._lock:
+            batch = self.batches[batch_id]
+            if batch["status"] == "in_progress" and time.monotonic() >= batch["_completes_at"]:
+                total = batch["request_counts"]["total"]
+                batch["status"] = "completed"
+                batch["completed_at"] = int(time.time())
+                batch["output_file_id"] = batch["_output_file_id"]
+                batch["request_counts"] = {
+                    "total": total,
+                    "completed": total - batch["_failed"],
+                    "failed": batch["_failed"],
+                }
+            return {key: value for key, value in batch.items() if not key.startswith("_")}
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+            def _send(self, data: bytes, content_type: str = "application/json") -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                path = self.path.split("?")[0].rstrip("/")
+                batch_match = _BATCH_RE.search(path)
+                file_match = _FILE_RE.search(path)
+                content_match = _FILE_CONTENT_RE.search(path)
+                if batch_match and batch_match.group(1) in stub.batches:
+                    self._send(json.dumps(stub._batch(batch_match.group(1))).encode("utf-8"))
+                elif file_match and file_match.group(1) in stub.file_objects:
+                    self._send(json.dumps(stub.file_objects[file_match.group(1)]).encode("utf-8"))
+                elif content_match and content_match.group(1) in stub.files:
+                    self._send(stub.files[content_match.group(1)], "application/octet-stream")
+                else:
+                    self.send_error(404)
+
+            def do_POST(self) -> None:
+                path = self.path.split("?")[0].rstrip("/")
+                data = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if path.endswith("/files"):
+                    form = _multipart_form(self.headers["Content-Type"], data)
+                    expires_in = form.get("expires_after[seconds]")
+                    uploaded = stub._create_file(
+                        form["file"],
+                        form["filename"],
+                        form["purpose"],
+                        int(expires_in) if expires_in is not None else None,
+                    )
+                    self._send(json.dumps(uploaded).encode("utf-8"))
+                    return
+                if path.endswith("/batches"):
+                    self._send(json.dumps(stub._create_batch(json.loads(data))).encode("utf-8"))
+                    return
+                if not path.endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                body = json.loads(data)
+                with stub._lock:
+                    stub.requests += 1
+                    stub.request_bytes += len(data)
+                    stub._in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub._in_flight)
+                try:
+                    time.sleep(stub.latency + random.uniform(0, stub.jitter))
+                    content = json.dumps(_structured_output(body))
+                finally:
+                    with stub._lock:
+                        stub._in_flight -= 1
+                self._send(json.dumps(_completion(body, content, stub.requests)).encode("utf-8"))
+
+        return Handler
+
+    def __enter__(self) -> "StubLLMServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra seconds")
+    parser.add_argument("--batch-latency", type=float, default=5.0, help="Seconds per batch")
+    args = parser.parse_args()
+
+    with StubLLMServer(
+        args.latency, args.jitter, args.host, args.port, batch_latency=args.batch_latency
+    ) as stub:
+        print(f"Serving stub chat completions on {stub.base_url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Synthetic legal-style document pairs for benchmarks.
+
+The documents mimic cleaned contract markdown: numbered clauses interleaved with repeated
+boilerplate headings and table rows. The second version modifies, deletes or inserts a
+configurable fraction of the lines. Helpers turn the lines into raw, hard-wrapped markdown as
+extracted from a PDF, or into an actual PDF for end-to-end runs.
+"""
+
+import random
+import textwrap
+from pathlib import Path
+
+__all__ = ["BOILERPLATE", "make_document_pair", "to_raw_markdown", "write_pdf"]
+
+BOILERPLATE = [
+    "## Definitions",
+    "| Category | Description | Retention |",
+    "|---|---|---|",
+    "| Personal data | As defined in Art. 4 GDPR | 30 days |",
+    "The Processor shall process Personal Data only on documented instructions.",
+]
+
+_OBLIGATIONS = [
+    "The Processor shall notify the Controller of any personal data breach without undue delay.",
+    "The Controller shall be liable for damages up to an amount of EUR 100,000 per year.",
+    "Either party may terminate this Agreement with a notice period of 30 days.",
+    "The Processor shall not engage another processor without prior written authorisation.",
+    "Personal data shall be deleted within 90 days after the end of the provision of services.",
+]
+
+
+def make_document_pair(
+    n_lines: int, edit_ratio: float, seed: int = 0
+) -> tuple[list[str], list[str]]:
+    """Create two versions of a synthetic contract with repeated lines and random edits.
+
+    Args:
+        n_lines: Number of lines of the first version.
+        edit_ratio: Fraction of lines that are modified, deleted or followed by an insertion.
+        seed: Seed of the random number generator.
+
+    Returns:
+        The lines of both versions.
+    """
+    rng = random.Random(seed)
+    lines_a = [
+        rng.choice(BOILERPLATE)
+        if rng.random() < 0.3
+        else f"{i // 10 + 1}.{i % 10} Clause text {i}. {rng.choice(_OBLIGATIONS)}"
+        for i in range(n_lines)
+    ]
+    lines_b = []
+    for line in lines_a:
+        r = rng.random()
+        if r < edit_ratio / 3:
+            lines_b.append(line.replace("shall", "may") + " (amended)")
+        elif r < 2 * edit_ratio / 3:
+            continue
+        elif r < edit_ratio:
+            lines_b.extend([line, rng.choice(BOILERPLATE)])
+        else:
+            lines_b.append(line)
+    return lines_a, lines_b
+
+
+def to_raw_markdown(lines: list[str], width: int = 80) -> str:
+    """Render lines as raw markdown extracted from a PDF, the input of ``cleanup_markdown``.
+
+    Every line becomes a paragraph that is hard-wrapped at ``width`` characters with ragged
+    spacing, separated from the next by blank lines.
+
+    Args:
+        lines: Lines of a document, e.g. from ``make_document_pair``.
+        width: Maximum length of the wrapped lines.
+
+    Returns:
+        The raw markdown text.
+    """
+    paragraphs = []
+    for i, line in enumerate(lines):
+        wrapped = textwrap.wrap(line, width) or [""]
+        paragraphs.append("  \n".join(wrapped) + ("  " if i % 3 == 0 else ""))
+    return "\n\n\n".join(paragraphs) + "\n"
+
+
+def write_pdf(lines: list[str], path: str | Path, lines_per_page: int = 60) -> Path:
+    """Write lines of a document to a PDF with one paragraph per line.
+
+    Args:
+        lines: Lines of a document, e.g. from ``make_document_pair``.
+        path: Path of the PDF to write.
+        lines_per_page: Maximum number of wrapped text lines per page.
+
+    Returns:
+        The path of the written PDF.
+    """
+    import pymupdf
+
+    document = pymupdf.open()
+    wrapped = [text for line in lines for text in (textwrap.wrap(line, 95) or [""]) + [""]]
+    for start in range(0, len(wrapped), lines_per_page):
+        page = document.new_page()
+        page.insert_text((40, 50), "\n".join(wrapped[start : start + lines_per_page]), fontsize=9)
+    document.save(str(path))
+    document.close()
+    return Path(path)
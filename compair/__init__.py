@@ -1,10 +1,11 @@
 """compAIr CLI tool."""
 
-__all__ = ["__version__"]
+__all__ = ["__version__", "load_environment"]
 
 __version__ = "0.1.0"
 
 # Configure root logging similar to pytest CLI logging
+import functools
 import logging
 import sys
 
@@ -14,3 +15,15 @@ if not logging.getLogger().handlers:
         format="%(asctime)s %(levelname)s %(name)s: %(message)s",
         stream=sys.stdout,
     )
+
+
+@functools.cache
+def load_environment() -> None:
+    """Load variables such as ``OPENAI_API_KEY`` from a ``.env`` file, once per process.
+
+    Called by the CLI after parsing its arguments and by ``client.get_openai_client``, so
+    importing the package or printing the CLI help does not read the file.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
@@ -1,18 +1,449 @@
 import argparse
+import copy
+import functools
 import json
 import logging
+import os
+import sys
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, NoReturn
 
-from dotenv import load_dotenv
+from compair import load_environment
+from compair.defaults import (
+    DEFAULT_BATCH_TOKEN_BUDGET,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_TARGET_TOKENS,
+    DEFAULT_VIEWER_ORIGIN,
+)
+from compair.diffing import DIFF_ENGINES
 
-from compair import pipelines
+# The pipelines import openai, pymupdf and pydantic, which take most of the startup time, so
+# they and the modules using them are imported once a command runs; see bench_startup.py
+if TYPE_CHECKING:
+    from compair.compact import CompactEncoding
+    from compair.models import Change, DifferenceReportWithInputs
 
-load_dotenv()
+COMPACT_ENCODINGS: "dict[str, CompactEncoding]" = {
+    "compact": "json",
+    "compact-gzip": "gzip",
+    "compact-msgpack": "msgpack",
+}
+
+
+def write_ndjson(
+    path: str | Path, document_a: str, document_b: str, changes: "Iterable[Change]"
+) -> None:
+    """Write a report as newline-delimited JSON, flushing after every record.
+
+    The first record holds ``document_a`` and ``document_b``; every following record is one
+    ``Change``. Records are written as soon as ``changes`` yields them, so a partial file stays
+    valid if the run is interrupted.
+
+    Args:
+        path: Path to the output file.
+        document_a: Parsed markdown text of the first document.
+        document_b: Parsed markdown text of the second document.
+        changes: The changes to write, possibly produced lazily.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            json.dumps({"document_a": document_a, "document_b": document_b}, ensure_ascii=False)
+            + "\n"
+        )
+        f.flush()
+        for change in changes:
+            f.write(change.model_dump_json() + "\n")
+            f.flush()
+
+
+def _add_analysis_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-a",
+        "--analysis-type",
+        type=str,
+        default="llm-light",
+        help="Type of analysis to perform",
+        choices=["llm-light", "llm-heavy", "llm-only"],
+    )
+    parser.add_argument(
+        "-c",
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help="Maximum number of concurrent LLM requests (llm-light and chunked llm-heavy)",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Maximum number of diff hunks classified per LLM request (llm-light only)",
+    )
+    parser.add_argument(
+        "--batch-token-budget",
+        type=int,
+        default=DEFAULT_BATCH_TOKEN_BUDGET,
+        help="Maximum estimated number of diff tokens per batched request (llm-light only)",
+    )
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        default=None,
+        help="Compare aligned sections of at most this many estimated tokens concurrently "
+        "(llm-heavy only; default: whole documents in one request)",
+    )
+    parser.add_argument(
+        "--diff-engine",
+        type=str,
+        default="difflib",
+        help="Line diff engine (llm-light only)",
+        choices=list(DIFF_ENGINES),
+    )
+    parser.add_argument(
+        "--align-clauses",
+        action="store_true",
+        help="Diff within clauses aligned by clause number and set locations from the clause "
+        "index (llm-light only)",
+    )
+    parser.add_argument(
+        "--history",
+        type=str,
+        default=None,
+        help="Directory storing document versions and classifications for incremental "
+        "re-comparison (llm-light only)",
+    )
+    parser.add_argument(
+        "--offline",
+        type=str,
+        default=None,
+        metavar="STATE_DIR",
+        help="Classify all hunks in one OpenAI Batch API job at lower cost, keeping its "
+        "resumable state in this directory; waits up to 24h (llm-light only)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help="Seconds between status checks of the batch job (with --offline)",
+    )
+    parser.add_argument(
+        "--hunk-tokens",
+        type=int,
+        default=DEFAULT_TARGET_TOKENS,
+        help="Target estimated tokens per hunk when merging small hunks, splitting large ones "
+        "and adding context (llm-light only)",
+    )
+    parser.add_argument(
+        "--no-hunk-shaping",
+        action="store_true",
+        help="Classify the hunks of the line diff as they are, with one context line "
+        "(llm-light only)",
+    )
+    parser.add_argument(
+        "--no-move-detection",
+        action="store_true",
+        help="Report moved blocks as separate removals and additions (llm-light only)",
+    )
+    parser.add_argument(
+        "--no-formatting-rules",
+        action="store_true",
+        help="Send formatting-only hunks to the LLM instead of classifying them locally "
+        "(llm-light only)",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Classify every hunk on its own, also hunks that repeat the edit of an earlier "
+        "hunk (llm-light only)",
+    )
+    parser.add_argument(
+        "--upload-files",
+        action="store_true",
+        help="Upload the PDFs once through the Files API and reference the cached file ids "
+        "instead of inlining them in every request (llm-only only)",
+    )
+    parser.add_argument(
+        "-w",
+        "--parse-workers",
+        type=int,
+        default=None,
+        help="Maximum number of processes for PDF parsing (default: number of CPUs, divided "
+        "among concurrent jobs)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the on-disk caches (location set via COMPAIR_CACHE_DIR)",
+    )
+
+
+def _llm_light_options(args: argparse.Namespace) -> dict:
+    return dict(
+        max_concurrency=args.max_concurrency,
+        batch_size=args.batch_size,
+        batch_token_budget=args.batch_token_budget,
+        use_cache=not args.no_cache,
+        parse_workers=args.parse_workers,
+        diff_engine=args.diff_engine,
+        detect_moved=not args.no_move_detection,
+        formatting_rules=not args.no_formatting_rules,
+        align_clauses=args.align_clauses,
+        history=args.history,
+        hunk_tokens=None if args.no_hunk_shaping else args.hunk_tokens,
+        offline_dir=args.offline,
+        poll_interval=args.poll_interval,
+        deduplicate=not args.no_dedup,
+    )
+
+
+def _parse_workers_per_job(parse_workers: int | None, jobs: int) -> int | None:
+    # concurrent jobs each start their own parse processes, so they share the CPUs by default
+    if parse_workers is not None or jobs <= 1:
+        return parse_workers
+    return max(1, (os.cpu_count() or 1) // jobs)
+
+
+def run_analysis(args: argparse.Namespace, file1: str, file2: str) -> "DifferenceReportWithInputs":
+    """Run the pipeline selected by the parsed command line arguments on two files.
+
+    Args:
+        args: Parsed arguments holding the analysis options.
+        file1: Path to the first file to compare.
+        file2: Path to the second file to compare.
+
+    Returns:
+        The report produced by the selected pipeline.
+
+    Raises:
+        ValueError: If the analysis type is unknown.
+    """
+    from compair import pipelines
+
+    if args.analysis_type == "llm-light":
+        return pipelines.run_llm_light(file1, file2, **_llm_light_options(args))
+    elif args.analysis_type == "llm-heavy":
+        return pipelines.run_llm_heavy(
+            file1,
+            file2,
+            use_cache=not args.no_cache,
+            parse_workers=args.parse_workers,
+            chunk_token_budget=args.chunk_tokens,
+            max_concurrency=args.max_concurrency,
+        )
+    elif args.analysis_type == "llm-only":
+        return pipelines.run_llm_only(
+            file1, file2, upload_files=args.upload_files, use_cache=not args.no_cache
+        )
+    else:
+        raise ValueError(f"Invalid analysis type: {args.analysis_type}")
+
+
+def batch_app(argv: list[str]) -> None:
+    """Compare all document pairs listed in a manifest, resuming an interrupted run.
+
+    Args:
+        argv: Command line arguments following the ``batch`` subcommand.
+    """
+    parser = argparse.ArgumentParser(
+        prog="compair batch",
+        description="Compare many document pairs listed in a CSV or JSONL manifest.",
+    )
+    parser.add_argument(
+        "manifest", type=str, help="Path to a CSV or JSONL manifest with file1/file2 entries"
+    )
+    parser.add_argument(
+        "-d",
+        "--output-dir",
+        type=str,
+        default="comparison-results",
+        help="Directory for the output json files",
+    )
+    parser.add_argument(
+        "-s",
+        "--state",
+        type=str,
+        default=None,
+        help="Path to the job state file (default: <output-dir>/batch-state.json)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=4,
+        help="Number of document pairs compared concurrently",
+    )
+    _add_analysis_arguments(parser)
+    args = parser.parse_args(argv)
+    args.parse_workers = _parse_workers_per_job(args.parse_workers, args.jobs)
+    load_environment()
+    from compair import batch
+
+    jobs = batch.load_manifest(args.manifest)
+    state = batch.run_batch(
+        jobs,
+        functools.partial(run_analysis, args),
+        output_dir=args.output_dir,
+        state_path=args.state,
+        workers=args.jobs,
+    )
+    if any(job_state.status == "failed" for job_state in state.values()):
+        sys.exit(1)
+
+
+class _JobOptionsParser(argparse.ArgumentParser):
+    """Parser for per-job analysis options that raises instead of exiting the service."""
+
+    def error(self, message: str) -> NoReturn:
+        raise ValueError(message)
+
+
+def _parse_job_options(
+    parser: argparse.ArgumentParser, defaults: argparse.Namespace, options: list[str]
+) -> argparse.Namespace:
+    return parser.parse_args(options, namespace=copy.copy(defaults))
+
+
+def _validate_job_options(
+    parser: argparse.ArgumentParser, defaults: argparse.Namespace, options: list[str]
+) -> None:
+    _parse_job_options(parser, defaults, options)
+
+
+def _run_job(
+    parser: argparse.ArgumentParser,
+    defaults: argparse.Namespace,
+    file1: str,
+    file2: str,
+    options: list[str],
+) -> "tuple[str, str, Iterable[Change]]":
+    from compair import pipelines
+
+    args = _parse_job_options(parser, defaults, options)
+    if args.analysis_type == "llm-light":
+        return pipelines.stream_llm_light(file1, file2, **_llm_light_options(args))
+    report = run_analysis(args, file1, file2)
+    return report.document_a, report.document_b, report.difference_report.changes
+
+
+def serve_app(argv: list[str]) -> None:
+    """Run the local HTTP service that queues comparison jobs.
+
+    Args:
+        argv: Command line arguments following the ``serve`` subcommand.
+    """
+    parser = argparse.ArgumentParser(
+        prog="compair serve",
+        description="Serve comparisons as jobs over a local HTTP API. The analysis options set "
+        "the defaults for all jobs; each job may override them with its own 'options'.",
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to bind to")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument(
+        "-d",
+        "--results-dir",
+        type=str,
+        default="comparison-results",
+        help="Directory storing the reports and status of finished jobs",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=2, help="Number of jobs processed concurrently"
+    )
+    parser.add_argument(
+        "--root",
+        type=str,
+        default=".",
+        help="Directory containing all files that jobs may compare; relative paths in jobs are "
+        "resolved against it (default: current directory)",
+    )
+    parser.add_argument(
+        "--allow-origin",
+        type=str,
+        action="append",
+        default=None,
+        help="Browser origin allowed to use the service, repeatable; requests from other "
+        f"origins are rejected (default: {DEFAULT_VIEWER_ORIGIN}, the web viewer)",
+    )
+    _add_analysis_arguments(parser)
+    args = parser.parse_args(argv)
+    load_environment()
+    from compair import server
+
+    job_parser = _JobOptionsParser(prog="job options", add_help=False)
+    _add_analysis_arguments(job_parser)
+    service = server.JobService(
+        functools.partial(_run_job, job_parser, args),
+        args.results_dir,
+        workers=args.jobs,
+        validate_options=functools.partial(_validate_job_options, job_parser, args),
+        root_dir=args.root,
+    )
+    http_server = server.make_server(
+        service, args.host, args.port, allow_origins=args.allow_origin or [DEFAULT_VIEWER_ORIGIN]
+    )
+    logging.info(f"Serving compair on http://{args.host}:{http_server.server_port}")
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        service.shutdown()
+
+
+def compare(args: argparse.Namespace) -> None:
+    """Compare ``args.file1`` and ``args.file2`` and write the report to ``args.output``.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+    from compair import compact, pipelines
+
+    changes: Iterable[Change]
+    summary: str | None = None
+    if args.analysis_type == "llm-light" and args.output_format != "json":
+        document_a, document_b, changes = pipelines.stream_llm_light(
+            args.file1, args.file2, **_llm_light_options(args)
+        )
+    else:
+        report = run_analysis(args, args.file1, args.file2)
+        if args.output_format == "json":
+            Path(args.output).write_text(
+                json.dumps(report.model_dump(), indent=2, ensure_ascii=False), encoding="utf-8"
+            )
+            return
+        document_a, document_b = report.document_a, report.document_b
+        changes = report.difference_report.changes
+        summary = report.difference_report.summary
+
+    # Write result to output file
+    if args.output_format == "ndjson":
+        write_ndjson(args.output, document_a, document_b, changes)
+    else:
+        compact.write_compact(
+            args.output,
+            document_a,
+            document_b,
+            changes,
+            summary,
+            encoding=COMPACT_ENCODINGS[args.output_format],
+        )
 
 
 def app():
+    if sys.argv[1:2] == ["batch"]:
+        batch_app(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["serve"]:
+        serve_app(sys.argv[2:])
+        return
+
     # Create the parser
-    parser = argparse.ArgumentParser(description="CLI tool for AI-based legal document comparison.")
+    parser = argparse.ArgumentParser(
+        description="CLI tool for AI-based legal document comparison.",
+        epilog="Run 'compair batch --help' to compare many document pairs from a manifest, or "
+        "'compair serve --help' to run comparisons as jobs behind a local HTTP API.",
+    )
 
     # Add arguments
     parser.add_argument("file1", type=str, help="Path to the first file to compare")
@@ -25,35 +456,44 @@ def app():
         help="Path to the output json file",
     )
     parser.add_argument(
-        "-a",
-        "--analysis-type",
+        "-f",
+        "--output-format",
         type=str,
-        default="llm-light",
-        help="Type of analysis to perform",
-        choices=["llm-light", "llm-heavy", "llm-only"],
+        default="json",
+        help="Format of the output file; ndjson writes one change per line and the compact formats "
+        "reference the documents instead of copying them into every hunk, as JSON lines, gzip or "
+        "msgpack (all streamed for llm-light)",
+        choices=["json", "ndjson", *COMPACT_ENCODINGS],
+    )
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        default=None,
+        help="Write stage timings, request latencies, token usage and estimated cost as JSON",
     )
+    _add_analysis_arguments(parser)
 
     # Parse arguments
     args = parser.parse_args()
+    load_environment()
+    from compair import metrics
 
     # Print greeting
     logging.info(
         f"Processing {args.file1} and {args.file2} with {args.analysis_type} analysis type!"
     )
 
-    if args.analysis_type == "llm-light":
-        report = pipelines.run_llm_light(args.file1, args.file2)
-    elif args.analysis_type == "llm-heavy":
-        report = pipelines.run_llm_heavy(args.file1, args.file2)
-    elif args.analysis_type == "llm-only":
-        report = pipelines.run_llm_only(args.file1, args.file2)
-    else:
-        raise ValueError(f"Invalid analysis type: {args.analysis_type}")
-
-    # Write result to output file
-    Path(args.output).write_text(
-        json.dumps(report.model_dump(), indent=2, ensure_ascii=False), encoding="utf-8"
+    with metrics.collect_metrics() as collector:
+        compare(args)
+    summary = collector.summary()
+    cost = summary.estimated_cost_usd
+    logging.info(
+        f"Finished in {summary.wall_seconds:.1f}s with {summary.requests} requests, "
+        f"{summary.prompt_tokens + summary.completion_tokens} tokens and an estimated cost of "
+        + ("unknown" if cost is None else f"${cost:.4f}")
     )
+    if args.metrics:
+        Path(args.metrics).write_text(summary.model_dump_json(indent=2), encoding="utf-8")
 
 
 if __name__ == "__main__":
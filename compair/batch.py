@@ -0,0 +1,188 @@
+"""Module for comparing many document pairs from a manifest with resumable job state."""
+
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from compair.cache import make_key
+from compair.models import DifferenceReportWithInputs
+
+__all__ = ["BatchJob", "JobState", "load_manifest", "load_state", "run_batch"]
+
+JobStatus = Literal["done", "failed"]
+
+
+class BatchJob(BaseModel):
+    job_id: str = Field(description="Stable identifier of the job, used to resume runs.")
+    file1: str = Field(description="Path to the first file to compare.")
+    file2: str = Field(description="Path to the second file to compare.")
+    output: Optional[str] = Field(
+        default=None, description="Path to the output json file, defaults to <job_id>.json."
+    )
+
+
+class JobState(BaseModel):
+    status: JobStatus
+    output: Optional[str] = Field(default=None, description="Path of the written report.")
+    error: Optional[str] = Field(default=None, description="Error message of a failed job.")
+    duration_seconds: float = Field(description="Wall time of the last attempt.")
+
+
+def _default_job_id(file1: str, file2: str) -> str:
+    return f"{Path(file1).stem}__{Path(file2).stem}__{make_key(file1, file2)[:8]}"
+
+
+def load_manifest(manifest_path: str | Path) -> List[BatchJob]:
+    """Load the document pairs to compare from a CSV or JSONL manifest.
+
+    Every row or line needs ``file1`` and ``file2`` and may set ``job_id`` and ``output``.
+    Relative paths are resolved against the manifest's directory. Without ``job_id``, a
+    stable id is derived from both paths.
+
+    Args:
+        manifest_path: Path to a ``.csv`` file with header row or a ``.jsonl`` file.
+
+    Returns:
+        The jobs in manifest order.
+
+    Raises:
+        ValueError: If an entry misses a file or job ids are not unique.
+    """
+    manifest_path = Path(manifest_path)
+    text = manifest_path.read_text(encoding="utf-8")
+    if manifest_path.suffix.lower() == ".csv":
+        rows = list(csv.DictReader(text.splitlines()))
+    else:
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    jobs = []
+    for i, row in enumerate(rows):
+        if not row.get("file1") or not row.get("file2"):
+            raise ValueError(f"Manifest entry {i + 1} needs 'file1' and 'file2'")
+        file1, file2 = (str(manifest_path.parent / row[key]) for key in ("file1", "file2"))
+        jobs.append(
+            BatchJob(
+                job_id=row.get("job_id") or _default_job_id(file1, file2),
+                file1=file1,
+                file2=file2,
+                output=str(manifest_path.parent / row["output"]) if row.get("output") else None,
+            )
+        )
+
+    job_ids = [job.job_id for job in jobs]
+    if len(set(job_ids)) != len(job_ids):
+        raise ValueError("Job ids in the manifest must be unique")
+    logging.info(f"Loaded {len(jobs)} jobs from manifest '{manifest_path}'")
+    return jobs
+
+
+def load_state(state_path: str | Path) -> Dict[str, JobState]:
+    """Load the per-job state of a previous batch run.
+
+    Args:
+        state_path: Path to the state file.
+
+    Returns:
+        Mapping of job id to its recorded state, empty if the file does not exist.
+    """
+    state_path = Path(state_path)
+    if not state_path.exists():
+        return {}
+    data = json.loads(state_path.read_text(encoding="utf-8"))
+    return {job_id: JobState.model_validate(state) for job_id, state in data.items()}
+
+
+def _write_state(state_path: Path, state: Dict[str, JobState]) -> None:
+    tmp_path = state_path.with_name(state_path.name + ".tmp")
+    tmp_path.write_text(
+        json.dumps({job_id: s.model_dump() for job_id, s in state.items()}, indent=2),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, state_path)
+
+
+def run_batch(
+    jobs: List[BatchJob],
+    run: Callable[[str, str], DifferenceReportWithInputs],
+    output_dir: str | Path,
+    state_path: str | Path | None = None,
+    workers: int = 4,
+) -> Dict[str, JobState]:
+    """Run all jobs on a thread pool and record each job's outcome in a state file.
+
+    Jobs already recorded as done whose output still exists are skipped, so an interrupted run
+    resumes where it stopped. Failed jobs are retried on the next run. All jobs run in the same
+    process and therefore share the API client and the on-disk caches.
+
+    Args:
+        jobs: The jobs to run.
+        run: Callable comparing two files and returning the report, e.g. a configured pipeline.
+        output_dir: Directory for reports of jobs without an explicit ``output``.
+        state_path: Path to the state file, defaults to ``<output_dir>/batch-state.json``.
+        workers: Number of jobs processed concurrently.
+
+    Returns:
+        The final state of all jobs recorded in the state file.
+
+    Raises:
+        ValueError: If ``workers`` is smaller than 1.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    state_path = Path(state_path) if state_path is not None else output_dir / "batch-state.json"
+    state = load_state(state_path)
+    state_lock = threading.Lock()
+
+    pending = [
+        job
+        for job in jobs
+        if not (
+            job.job_id in state
+            and state[job.job_id].status == "done"
+            and Path(state[job.job_id].output or "").exists()
+        )
+    ]
+    logging.info(
+        f"Running {len(pending)} of {len(jobs)} jobs with {workers} workers "
+        f"({len(jobs) - len(pending)} already done)"
+    )
+
+    def _run_job(job: BatchJob) -> None:
+        output = Path(job.output) if job.output else output_dir / f"{job.job_id}.json"
+        start = time.perf_counter()
+        try:
+            report = run(job.file1, job.file2)
+            output.parent.mkdir(parents=True, exist_ok=True)
+            output.write_text(
+                json.dumps(report.model_dump(), indent=2, ensure_ascii=False), encoding="utf-8"
+            )
+            job_state = JobState(
+                status="done", output=str(output), duration_seconds=time.perf_counter() - start
+            )
+            logging.info(f"Job '{job.job_id}' finished")
+        except Exception as e:
+            logging.exception(f"Job '{job.job_id}' failed")
+            job_state = JobState(
+                status="failed", error=repr(e), duration_seconds=time.perf_counter() - start
+            )
+        with state_lock:
+            state[job.job_id] = job_state
+            _write_state(state_path, state)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(_run_job, pending))
+
+    failed = sum(1 for job in jobs if state[job.job_id].status == "failed")
+    logging.info(f"Batch finished: {len(jobs) - failed} done, {failed} failed")
+    return state
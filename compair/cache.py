@@ -0,0 +1,161 @@
+"""Module for on-disk caching of expensive intermediate results."""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+__all__ = ["DiskCache", "get_cache", "get_cache_dir", "hash_file", "make_key"]
+
+CACHE_DIR_ENV = "COMPAIR_CACHE_DIR"
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "compair"
+
+_caches: dict[Path, "DiskCache"] = {}
+_caches_lock = threading.Lock()
+
+
+class DiskCache:
+    """Size-capped key-value store on disk with least-recently-used eviction.
+
+    Every entry is stored as a single file named after its key. Reads refresh the file's
+    modification time, which serves as the recency for eviction. Writes are atomic, so
+    several threads or processes can share the same directory.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int) -> None:
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size: int | None = None
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        """Return the value stored under ``key`` and mark it as recently used.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            The stored bytes, or ``None`` if the key is not cached.
+        """
+        path = self.directory / key
+        try:
+            value = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store ``value`` under ``key`` and evict least recently used entries if needed.
+
+        Args:
+            key: The cache key.
+            value: The bytes to store.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, self.directory / key)
+        finally:
+            # no-op after a successful replace, cleans up after a failed write
+            Path(tmp_path).unlink(missing_ok=True)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += len(value)
+            if self._size is None or self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self.directory.iterdir():
+            if path.name.startswith(".tmp-"):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        evicted = 0
+        for _, entry_size, path in sorted(entries, key=lambda entry: entry[0]):
+            if size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+            evicted += 1
+        if evicted:
+            logging.info(f"Evicted {evicted} entries from cache '{self.directory}'")
+        self._size = size
+
+
+def get_cache_dir() -> Path:
+    """Return the root cache directory.
+
+    Returns:
+        The directory from ``COMPAIR_CACHE_DIR`` if set, otherwise ``~/.cache/compair``.
+    """
+    return Path(os.getenv(CACHE_DIR_ENV, "").strip() or DEFAULT_CACHE_DIR)
+
+
+def get_cache(name: str, max_bytes: int) -> DiskCache:
+    """Return the process-wide cache stored in the sub-directory ``name`` of the cache root.
+
+    Args:
+        name: Name of the cache, used as sub-directory of ``get_cache_dir()``.
+        max_bytes: Size cap of the cache, used when the cache is first created.
+
+    Returns:
+        The shared ``DiskCache`` instance for that directory.
+    """
+    directory = get_cache_dir() / name
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = DiskCache(directory, max_bytes)
+        return _caches[directory]
+
+
+def make_key(*parts: str) -> str:
+    """Build a cache key by hashing the given parts.
+
+    Args:
+        *parts: The strings that identify the cached value.
+
+    Returns:
+        The SHA-256 hex digest over all parts.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def hash_file(file_path: str | Path) -> str:
+    """Return the SHA-256 hex digest of a file's content.
+
+    Args:
+        file_path: Path to the file.
+
+    Returns:
+        The SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,179 @@
+"""Module for indexing clauses and diffing two documents clause by clause.
+
+``build_clause_index`` finds lines that start a clause, such as ``5.1.1``, ``## 7. Term``,
+``Appendix 3`` or ``§ 4``, and maps every clause identifier to the lines up to the next clause.
+``diff_clauses`` aligns the clause sequences of both documents by identifier and runs the line
+diff only within aligned clauses. Each diff problem is therefore only as large as a clause, and
+every hunk knows the clause it belongs to.
+"""
+
+import bisect
+import logging
+import re
+from difflib import SequenceMatcher
+from typing import List, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+from compair.diffing import DiffEngine, Opcode, format_unified_groups, get_opcodes, group_opcodes
+from compair.models import DiffHunk
+
+__all__ = ["Clause", "build_clause_index", "diff_clauses", "find_clause_id", "strip_clause_id"]
+
+_CLAUSE_RE = re.compile(
+    r"^\s*(?:#+\s*)?(?:[*_]+\s*)?"
+    r"(?:(?P<keyword>appendix|annex|schedule|exhibit|article|section|clause|§)\s*"
+    r"(?P<label>[0-9]+(?:\.[0-9]+)*|[IVXLC]+\b|[A-Z]\b)"
+    r"|(?P<number>[0-9]+(?:\.[0-9]+)+\.?|[0-9]+\.)(?=\s|[*_]|$))",
+    re.IGNORECASE,
+)
+
+
+class Clause(BaseModel):
+    clause_id: Optional[str] = Field(description="Clause identifier, None for the preamble.")
+    start_line: int = Field(description="0-based index of the first line of the clause.")
+    end_line: int = Field(description="0-based index after the last line of the clause.")
+
+
+def find_clause_id(line: str) -> Optional[str]:
+    """Return the identifier of the clause started by ``line``.
+
+    Args:
+        line: A line of cleaned markdown.
+
+    Returns:
+        The normalized identifier, e.g. ``"5.1.1"`` or ``"Appendix 3"``, or ``None`` if the line
+        does not start a clause.
+    """
+    match = _CLAUSE_RE.match(line)
+    if match is None:
+        return None
+    if match["number"]:
+        return match["number"].rstrip(".")
+    keyword = match["keyword"]
+    return f"{keyword if keyword == '§' else keyword.title()} {match['label']}"
+
+
+def strip_clause_id(line: str) -> str:
+    """Remove the identifier of the clause started by ``line``.
+
+    Args:
+        line: A line of cleaned markdown.
+
+    Returns:
+        The line without its leading clause identifier, or the unchanged line if it does not
+        start a clause.
+    """
+    match = _CLAUSE_RE.match(line)
+    return line if match is None else line[match.end() :]
+
+
+def build_clause_index(lines: Sequence[str]) -> List[Clause]:
+    """Split a document into clauses that start at lines with a clause identifier.
+
+    Args:
+        lines: Lines of the document.
+
+    Returns:
+        Consecutive clauses covering all lines. Lines before the first identifier form a
+        preamble clause without identifier.
+    """
+    clauses: List[Clause] = []
+    for i, line in enumerate(lines):
+        clause_id = find_clause_id(line)
+        if clause_id is None and clauses:
+            continue
+        if clauses:
+            clauses[-1].end_line = i
+        clauses.append(Clause(clause_id=clause_id, start_line=i, end_line=len(lines)))
+    return clauses
+
+
+def _clause_at(clauses: List[Clause], starts: List[int], line: int) -> Optional[str]:
+    index = bisect.bisect_right(starts, line) - 1
+    return clauses[index].clause_id if index >= 0 else None
+
+
+def _aligned_opcodes(
+    lines_a: Sequence[str],
+    lines_b: Sequence[str],
+    clauses_a: List[Clause],
+    clauses_b: List[Clause],
+    engine: DiffEngine,
+) -> List[Opcode]:
+    def bound(clauses: List[Clause], index: int, n_lines: int) -> int:
+        return clauses[index].start_line if index < len(clauses) else n_lines
+
+    # Pairs of line ranges to diff: aligned clauses, and the unaligned clauses in between
+    regions = []
+    ids_a = [clause.clause_id or "" for clause in clauses_a]
+    ids_b = [clause.clause_id or "" for clause in clauses_b]
+    matcher = SequenceMatcher(None, ids_a, ids_b, autojunk=False)
+    for clause_tag, c1, c2, d1, d2 in matcher.get_opcodes():
+        if clause_tag == "equal":
+            for ca, cb in zip(range(c1, c2), range(d1, d2)):
+                regions.append(
+                    (
+                        clauses_a[ca].start_line,
+                        clauses_a[ca].end_line,
+                        clauses_b[cb].start_line,
+                        clauses_b[cb].end_line,
+                    )
+                )
+        else:
+            regions.append(
+                (
+                    bound(clauses_a, c1, len(lines_a)),
+                    bound(clauses_a, c2, len(lines_a)),
+                    bound(clauses_b, d1, len(lines_b)),
+                    bound(clauses_b, d2, len(lines_b)),
+                )
+            )
+
+    opcodes: List[Opcode] = []
+    for a0, a1, b0, b1 in regions:
+        for tag, i1, i2, j1, j2 in get_opcodes(lines_a[a0:a1], lines_b[b0:b1], engine):
+            opcode = (tag, a0 + i1, a0 + i2, b0 + j1, b0 + j2)
+            if opcodes and tag == "equal" and opcodes[-1][0] == "equal":
+                opcode = ("equal", opcodes[-1][1], opcode[2], opcodes[-1][3], opcode[4])
+                opcodes.pop()
+            opcodes.append(opcode)
+    return opcodes
+
+
+def diff_clauses(
+    lines_a: Sequence[str], lines_b: Sequence[str], n: int = 3, engine: DiffEngine = "difflib"
+) -> List[DiffHunk]:
+    """Diff two documents within clauses aligned by their identifiers.
+
+    Clauses are aligned as sequences of identifiers, so renumbered, inserted or deleted clauses
+    are diffed together with their unaligned neighbours. Every hunk's ``location`` is set to the
+    clause of its first changed line in document A, or in document B for pure insertions.
+
+    Args:
+        lines_a: Lines of the first document.
+        lines_b: Lines of the second document.
+        n: Number of context lines.
+        engine: The line diff engine used within clauses.
+
+    Returns:
+        The hunks of the unified diff over the complete documents.
+    """
+    clauses_a, clauses_b = build_clause_index(lines_a), build_clause_index(lines_b)
+    logging.info(
+        f"Indexed {len(clauses_a)} clauses in A and {len(clauses_b)} clauses in B for alignment"
+    )
+    groups = list(
+        group_opcodes(_aligned_opcodes(lines_a, lines_b, clauses_a, clauses_b, engine), n)
+    )
+    hunks = DiffHunk.from_unified_diff_lines(list(format_unified_groups(lines_a, lines_b, groups)))
+
+    starts_a = [clause.start_line for clause in clauses_a]
+    starts_b = [clause.start_line for clause in clauses_b]
+    for hunk, group in zip(hunks, groups):
+        _, i1, i2, j1, _ = next(opcode for opcode in group if opcode[0] != "equal")
+        if i1 < i2:
+            hunk.location = _clause_at(clauses_a, starts_a, i1)
+        else:
+            hunk.location = _clause_at(clauses_b, starts_b, j1)
+    return hunks
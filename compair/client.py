@@ -0,0 +1,195 @@
+"""Module for the shared OpenAI client, request retries and prompt loading."""
+
+import email.utils
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Callable, TypeVar
+
+import httpx
+from openai import APIConnectionError, APIStatusError, OpenAI
+
+from compair import load_environment, metrics
+
+__all__ = ["call_with_retries", "get_openai_client", "load_prompt"]
+
+PROMPT_DIR = Path(__file__).parent / "prompts"
+
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_MAX_CONNECTIONS = 32
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+RETRYABLE_STATUS_CODES = {408, 429}
+
+T = TypeVar("T")
+
+_client: OpenAI | None = None
+_client_lock = threading.Lock()
+
+
+def _env_number(name: str, default: float) -> float:
+    value = os.getenv(name, "").strip()
+    return float(value) if value else default
+
+
+def get_openai_client() -> OpenAI:
+    """Return the process-wide OpenAI client, creating it on first use.
+
+    If ``AZURE_OPENAI_ENDPOINT`` and ``AZURE_OPENAI_API_KEY`` are present, the client is
+    configured for Azure OpenAI (chat completions endpoint style). Otherwise, it falls
+    back to standard OpenAI and uses the ``OPENAI_API_KEY`` from the environment, which
+    ``load_environment`` may fill from a ``.env`` file.
+
+    The client shares one keep-alive connection pool across all threads. The request timeout
+    and the pool size can be set with ``COMPAIR_OPENAI_TIMEOUT`` (seconds) and
+    ``COMPAIR_OPENAI_MAX_CONNECTIONS``. SDK-level retries are disabled in favour of
+    ``call_with_retries``.
+
+    Returns:
+        An initialized ``OpenAI`` client instance suitable for making API calls.
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            return _client
+
+        load_environment()
+        timeout = _env_number("COMPAIR_OPENAI_TIMEOUT", DEFAULT_TIMEOUT)
+        max_connections = int(
+            _env_number("COMPAIR_OPENAI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)
+        )
+        http_client = httpx.Client(
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 10.0)),
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ),
+        )
+
+        azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "").strip()
+        azure_key = os.getenv("AZURE_OPENAI_API_KEY", "").strip()
+        if azure_endpoint and azure_key:
+            logging.info("Creating shared Azure OpenAI client")
+            _client = OpenAI(
+                api_key=azure_key,
+                base_url=azure_endpoint.rstrip("/") + "/openai/v1/",
+                default_query={"api-version": "preview"},
+                http_client=http_client,
+                max_retries=0,
+            )
+        else:
+            # Default to public OpenAI
+            # OPENAI_API_KEY will be picked up from env by the SDK
+            logging.info("Creating shared OpenAI client")
+            _client = OpenAI(http_client=http_client, max_retries=0)
+        return _client
+
+
+def _retry_after_seconds(error: Exception) -> float | None:
+    if not isinstance(error, APIStatusError):
+        return None
+    headers = error.response.headers
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, APIConnectionError):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def call_with_retries(
+    request: Callable[[], T], kind: str = "request", completion: bool = True
+) -> T:
+    """Run an API request, retrying on rate limits, server errors and connection failures.
+
+    Retries use exponential backoff with jitter. If the server sends ``Retry-After`` (or
+    ``retry-after-ms``), that delay is used instead, capped at ``BACKOFF_MAX``. The number of retries defaults to
+    ``DEFAULT_MAX_RETRIES`` and can be set with ``COMPAIR_OPENAI_MAX_RETRIES``. The latency,
+    retries and token usage of the request are reported to ``compair.metrics``.
+
+    Args:
+        request: Zero-argument callable performing the API request.
+        kind: What the request does, reported with its metrics, e.g. ``"classify"``.
+        completion: Whether the request asks a model for a completion, see
+            ``metrics.record_request``.
+
+    Returns:
+        The result of ``request``.
+
+    Raises:
+        Exception: The last error if it is not retryable or all retries are used up.
+    """
+    max_retries = int(_env_number("COMPAIR_OPENAI_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+    attempt = 0
+    start = time.perf_counter()
+    while True:
+        try:
+            result = request()
+        except Exception as e:
+            if attempt >= max_retries or not _is_retryable(e):
+                metrics.record_request(
+                    kind,
+                    time.perf_counter() - start,
+                    retries=attempt,
+                    failed=True,
+                    completion=completion,
+                )
+                raise
+            delay = _retry_after_seconds(e)
+            if delay is None:
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt) * random.uniform(0.5, 1.0)
+            else:
+                # a huge, negative or NaN server delay must not stall the worker
+                delay = min(BACKOFF_MAX, max(0.0, delay))
+            attempt += 1
+            logging.warning(
+                f"Request failed with {type(e).__name__}, retry {attempt}/{max_retries} "
+                f"in {delay:.1f}s"
+            )
+            time.sleep(delay)
+        else:
+            metrics.record_request(
+                kind,
+                time.perf_counter() - start,
+                retries=attempt,
+                response=result,
+                completion=completion,
+            )
+            return result
+
+
+@functools.cache
+def load_prompt(name: str) -> str:
+    """Read a prompt file from the prompts directory once and keep it in memory.
+
+    Args:
+        name: File name of the prompt, e.g. ``"system_prompt_llm_light.md"``.
+
+    Returns:
+        The prompt text.
+    """
+    return (PROMPT_DIR / name).read_text(encoding="utf-8")
@@ -0,0 +1,332 @@
+"""Module for the compact report format, which references the documents instead of copying them.
+
+A ``DifferenceReportWithInputs`` repeats every changed and context line of the documents in the
+``unified_diff``, ``old_excerpt`` and ``new_excerpt`` of each hunk. A compact report stores the
+documents once and describes each hunk by offsets into their lines, as split by
+``str.splitlines``. It is a sequence of records:
+
+1. ``{"format": "compair-compact", "version": 1, "document_a": ..., "document_b": ...}``
+2. one record per change with its ``change_id`` and ``change_classification``, and either a
+   ``hunk`` or, if the hunk does not match the documents line by line (e.g. hunks written by
+   the LLM in llm-heavy mode), the full ``diff_hunk``
+3. ``{"summary": ...}`` if the report has a summary
+
+A ``hunk`` holds ``blocks`` of ``[header, line_a, line_b, ops]``: the ``@@`` header line of one
+unified diff block, the 0-based indices of its first lines in both documents and its lines as
+runs such as ``"=2-1+1=2"``, where ``=`` is a context line of both documents, ``-`` a line of
+document A and ``+`` a line of document B. It also holds the ``hunk_header`` as a list of
+``[start_line_old, end_line_old, start_line_new, end_line_new]``, the ``location`` and the
+``word_spans`` as lists of ``[old_start, old_end, new_start, new_end]``.
+
+Records are written one at a time as JSON lines, gzip-compressed JSON lines or, with the
+optional ``msgpack`` package, consecutive msgpack objects.
+"""
+
+import gzip
+import json
+import logging
+import re
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, List, Literal, Optional, Sequence
+
+from compair.models import (
+    Change,
+    DifferenceReport,
+    DifferenceReportWithInputs,
+    DiffHunk,
+    HunkHeader,
+    WordSpan,
+)
+
+__all__ = [
+    "COMPACT_FORMAT",
+    "COMPACT_VERSION",
+    "CompactEncoding",
+    "decode_hunk",
+    "encode_hunk",
+    "read_compact",
+    "write_compact",
+]
+
+COMPACT_FORMAT = "compair-compact"
+COMPACT_VERSION = 1
+
+CompactEncoding = Literal["json", "gzip", "msgpack"]
+
+_HEADER_RE = re.compile(r"^@@ -([0-9]+)(?:,([0-9]+))? \+([0-9]+)(?:,([0-9]+))? @@")
+_OPS_RE = re.compile(r"([=+-])([0-9]+)")
+_TAGS = {" ": "=", "-": "-", "+": "+"}
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _encode_block(
+    lines: List[str], lines_a: Sequence[str], lines_b: Sequence[str]
+) -> Optional[List[Any]]:
+    match = _HEADER_RE.match(lines[0])
+    if match is None:
+        return None
+    start_old, len_old, start_new, len_new = (
+        int(group) if group is not None else 1 for group in match.groups()
+    )
+    # an empty range starts after the line given in the header, see ``diffing._format_range``
+    i = start_old - 1 if len_old else start_old
+    j = start_new - 1 if len_new else start_new
+    line_a, line_b = i, j
+    runs: List[List[Any]] = []
+    for line in lines[1:]:
+        tag = _TAGS.get(line[:1])
+        text = line[1:]
+        if tag is None:
+            return None
+        if tag != "+":
+            if i >= len(lines_a) or lines_a[i] != text:
+                return None
+            i += 1
+        if tag != "-":
+            if j >= len(lines_b) or lines_b[j] != text:
+                return None
+            j += 1
+        if runs and runs[-1][0] == tag:
+            runs[-1][1] += 1
+        else:
+            runs.append([tag, 1])
+    return [lines[0], line_a, line_b, "".join(f"{tag}{count}" for tag, count in runs)]
+
+
+def encode_hunk(
+    diff_hunk: DiffHunk, lines_a: Sequence[str], lines_b: Sequence[str]
+) -> Optional[Dict[str, Any]]:
+    """Describe a hunk by offsets into the lines of both documents.
+
+    Args:
+        diff_hunk: The hunk to encode.
+        lines_a: Lines of the first document, as split by ``str.splitlines``.
+        lines_b: Lines of the second document, as split by ``str.splitlines``.
+
+    Returns:
+        The compact hunk, or ``None`` if ``decode_hunk`` could not reproduce ``diff_hunk``
+        exactly from the documents.
+    """
+    blocks: List[List[str]] = []
+    for line in diff_hunk.unified_diff.split("\n"):
+        if _HEADER_RE.match(line) or not blocks:
+            blocks.append([line])
+        else:
+            blocks[-1].append(line)
+    encoded_blocks = []
+    for block in blocks:
+        encoded = _encode_block(block, lines_a, lines_b)
+        if encoded is None:
+            return None
+        encoded_blocks.append(encoded)
+
+    header = diff_hunk.hunk_header
+    compact: Dict[str, Any] = {
+        "blocks": encoded_blocks,
+        "hunk_header": [
+            header.start_line_old,
+            header.end_line_old,
+            header.start_line_new,
+            header.end_line_new,
+        ],
+    }
+    if diff_hunk.location is not None:
+        compact["location"] = diff_hunk.location
+    if diff_hunk.word_spans is not None:
+        compact["word_spans"] = [
+            [span.old_start, span.old_end, span.new_start, span.new_end]
+            for span in diff_hunk.word_spans
+        ]
+    if decode_hunk(compact, lines_a, lines_b) != diff_hunk:
+        return None
+    return compact
+
+
+def decode_hunk(
+    compact: Dict[str, Any], lines_a: Sequence[str], lines_b: Sequence[str]
+) -> DiffHunk:
+    """Rebuild a hunk from its compact description.
+
+    Args:
+        compact: The hunk as returned by ``encode_hunk``.
+        lines_a: Lines of the first document, as split by ``str.splitlines``.
+        lines_b: Lines of the second document, as split by ``str.splitlines``.
+
+    Returns:
+        The ``DiffHunk`` with its unified diff and excerpts taken from the documents.
+    """
+    diff_lines: List[str] = []
+    old_excerpt: List[str] = []
+    new_excerpt: List[str] = []
+    for header, i, j, ops in compact["blocks"]:
+        diff_lines.append(header)
+        for tag, count in _OPS_RE.findall(ops):
+            for _ in range(int(count)):
+                if tag == "=":
+                    diff_lines.append(" " + lines_a[i])
+                    i += 1
+                    j += 1
+                elif tag == "-":
+                    diff_lines.append("-" + lines_a[i])
+                    old_excerpt.append(lines_a[i])
+                    i += 1
+                else:
+                    diff_lines.append("+" + lines_b[j])
+                    new_excerpt.append(lines_b[j])
+                    j += 1
+    start_line_old, end_line_old, start_line_new, end_line_new = compact["hunk_header"]
+    word_spans = compact.get("word_spans")
+    return DiffHunk(
+        unified_diff="\n".join(diff_lines),
+        old_excerpt="\n".join(old_excerpt) if old_excerpt else None,
+        new_excerpt="\n".join(new_excerpt) if new_excerpt else None,
+        hunk_header=HunkHeader(
+            start_line_old=start_line_old,
+            end_line_old=end_line_old,
+            start_line_new=start_line_new,
+            end_line_new=end_line_new,
+        ),
+        location=compact.get("location"),
+        word_spans=[
+            WordSpan(old_start=old_start, old_end=old_end, new_start=new_start, new_end=new_end)
+            for old_start, old_end, new_start, new_end in word_spans
+        ]
+        if word_spans is not None
+        else None,
+    )
+
+
+def _import_msgpack() -> Any:
+    try:
+        import msgpack
+    except ImportError as e:
+        raise ImportError(
+            "The msgpack encoding requires the optional 'msgpack' package, install it with "
+            "'uv pip install msgpack'"
+        ) from e
+    return msgpack
+
+
+def _records(
+    document_a: str,
+    document_b: str,
+    changes: Iterable[Change],
+    summary: Optional[str],
+) -> Iterator[Dict[str, Any]]:
+    yield {
+        "format": COMPACT_FORMAT,
+        "version": COMPACT_VERSION,
+        "document_a": document_a,
+        "document_b": document_b,
+    }
+    lines_a = document_a.splitlines()
+    lines_b = document_b.splitlines()
+    inline = 0
+    for change in changes:
+        record = change.model_dump(exclude={"diff_hunk"}, exclude_none=True)
+        hunk = encode_hunk(change.diff_hunk, lines_a, lines_b)
+        if hunk is None:
+            inline += 1
+            record["diff_hunk"] = change.diff_hunk.model_dump(exclude_none=True)
+        else:
+            record["hunk"] = hunk
+        yield record
+    if inline:
+        logging.info(f"Stored {inline} hunks that do not match the documents inline")
+    if summary is not None:
+        yield {"summary": summary}
+
+
+def write_compact(
+    path: str | Path,
+    document_a: str,
+    document_b: str,
+    changes: Iterable[Change],
+    summary: Optional[str] = None,
+    encoding: CompactEncoding = "json",
+) -> None:
+    """Write a report in the compact format, one record at a time.
+
+    Args:
+        path: Path to the output file.
+        document_a: Parsed markdown text of the first document.
+        document_b: Parsed markdown text of the second document.
+        changes: The changes to write, possibly produced lazily.
+        summary: Optional summary of the report, written after the changes.
+        encoding: ``"json"`` for JSON lines, ``"gzip"`` for gzip-compressed JSON lines or
+            ``"msgpack"`` for consecutive msgpack objects.
+
+    Raises:
+        ValueError: If ``encoding`` is not supported.
+    """
+    records = _records(document_a, document_b, changes, summary)
+    if encoding == "msgpack":
+        packer = _import_msgpack().Packer()
+        with open(path, "wb") as f:
+            for record in records:
+                f.write(packer.pack(record))
+    elif encoding in ("json", "gzip"):
+        f_text: IO[str]
+        with (
+            gzip.open(path, "wt", encoding="utf-8")
+            if encoding == "gzip"
+            else open(path, "w", encoding="utf-8")
+        ) as f_text:
+            for record in records:
+                f_text.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+    else:
+        raise ValueError(f"Invalid compact encoding: {encoding}")
+    logging.info(f"Wrote compact report with {encoding} encoding to '{path}'")
+
+
+def _read_records(path: str | Path) -> Iterator[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        start = f.read(2)
+    if start == _GZIP_MAGIC or start[:1] == b"{":
+        opener = gzip.open if start == _GZIP_MAGIC else open
+        with opener(path, "rt", encoding="utf-8") as f_text:
+            for line in f_text:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, "rb") as f:
+            yield from _import_msgpack().Unpacker(f, raw=False)
+
+
+def read_compact(path: str | Path) -> DifferenceReportWithInputs:
+    """Read a report written by ``write_compact``, detecting its encoding.
+
+    Args:
+        path: Path to the compact report.
+
+    Returns:
+        The report with all hunks rebuilt from the documents.
+
+    Raises:
+        ValueError: If the file is not a compact report of a supported version.
+    """
+    records = _read_records(path)
+    head = next(records, None)
+    if not isinstance(head, dict) or head.get("format") != COMPACT_FORMAT:
+        raise ValueError(f"Not a compact report: {path}")
+    if head.get("version") != COMPACT_VERSION:
+        raise ValueError(f"Unsupported compact report version: {head.get('version')}")
+
+    document_a, document_b = head["document_a"], head["document_b"]
+    lines_a = document_a.splitlines()
+    lines_b = document_b.splitlines()
+    changes = []
+    summary = None
+    for record in records:
+        if "summary" in record:
+            summary = record["summary"]
+            continue
+        hunk = record.pop("hunk", None)
+        if hunk is not None:
+            record["diff_hunk"] = decode_hunk(hunk, lines_a, lines_b)
+        changes.append(Change.model_validate(record))
+    return DifferenceReportWithInputs(
+        document_a=document_a,
+        document_b=document_b,
+        difference_report=DifferenceReport(changes=changes, summary=summary),
+    )
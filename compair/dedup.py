@@ -0,0 +1,112 @@
+"""Module for grouping repeated edits among diff hunks, so that each edit is classified once.
+
+Contracts repeat the same edit many times: a defined term is renamed throughout the document,
+or a template update replaces the same phrase in every clause. Every occurrence becomes a hunk
+of its own, which differs from the others only in the unchanged text around the edit.
+``edit_signature`` describes a hunk by what it changes: both sides are normalized like in
+``compair.moves``, split into word tokens and diffed, and the signature is the set of replaced,
+removed and inserted token runs together with the ``CONTEXT_TOKENS`` tokens around each of them.
+The context keeps the same words edited in clauses of different meaning apart, e.g. "shall"
+replaced by "may" in an obligation to notify and in an obligation to pay. Hunks with the same
+signature make the same edit in the same wording, so ``group_duplicates`` groups them and only
+the first hunk of each group, its representative, needs to be classified.
+``shared_classification`` turns its classification into the one of the other hunks of the
+group, without the text that describes the representative.
+"""
+
+import hashlib
+import logging
+import re
+from difflib import SequenceMatcher
+from typing import Collection, Dict, List, Optional, Sequence
+
+from compair.models import ChangeClassification, DiffHunk
+from compair.moves import normalize_block
+
+__all__ = ["CONTEXT_TOKENS", "edit_signature", "group_duplicates", "shared_classification"]
+
+# Tokens before and after every edit that must match as well
+CONTEXT_TOKENS = 2
+SHARED_SUMMARY = "Same edit as an earlier change, classified once for all of its occurrences."
+
+# Words, including hyphenated and possessive compounds such as "sub-processor's", and single
+# punctuation marks
+_TOKEN_RE = re.compile(r"\w+(?:[-'’]\w+)*|[^\w\s]")
+_WORD_RE = re.compile(r"\w")
+
+
+def edit_signature(diff_hunk: DiffHunk) -> Optional[str]:
+    """Describe the edit of a hunk independently of its position and the text further away.
+
+    Args:
+        diff_hunk: The hunk to describe.
+
+    Returns:
+        A hash of the distinct token edits of the hunk and their surrounding tokens, or
+        ``None`` if the hunk changes no words after normalization, e.g. because it only changes
+        punctuation or formatting.
+    """
+    old_tokens = _TOKEN_RE.findall(normalize_block(diff_hunk.old_excerpt or ""))
+    new_tokens = _TOKEN_RE.findall(normalize_block(diff_hunk.new_excerpt or ""))
+    matcher = SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    edits = {
+        (
+            " ".join(old_tokens[max(0, i1 - CONTEXT_TOKENS) : i1]),
+            " ".join(old_tokens[i1:i2]),
+            " ".join(new_tokens[j1:j2]),
+            " ".join(old_tokens[i2 : i2 + CONTEXT_TOKENS]),
+        )
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    }
+    if not any(_WORD_RE.search(old + new) for _, old, new, _ in edits):
+        return None
+    signature = "\n".join("\t".join(edit) for edit in sorted(edits))
+    return hashlib.sha256(signature.encode("utf-8")).hexdigest()
+
+
+def group_duplicates(
+    diff_hunks: Sequence[DiffHunk], skip: Collection[int] = ()
+) -> Dict[int, List[int]]:
+    """Group hunks that make the same edit.
+
+    Args:
+        diff_hunks: The hunks of a comparison, in report order.
+        skip: Indices of hunks that are classified otherwise and are not grouped.
+
+    Returns:
+        Mapping of the index of the first hunk of each group to the indices of the other hunks
+        of the group. Hunks without duplicates are left out.
+    """
+    groups: Dict[str, List[int]] = {}
+    for i, diff_hunk in enumerate(diff_hunks):
+        if i in skip:
+            continue
+        signature = edit_signature(diff_hunk)
+        if signature is not None:
+            groups.setdefault(signature, []).append(i)
+    duplicates = {members[0]: members[1:] for members in groups.values() if len(members) > 1}
+    if duplicates:
+        n_duplicates = sum(len(members) for members in duplicates.values())
+        logging.info(
+            f"Grouped {n_duplicates + len(duplicates)} hunks into {len(duplicates)} repeated "
+            f"edits, saving {n_duplicates} classifications"
+        )
+    return duplicates
+
+
+def shared_classification(classification: ChangeClassification) -> ChangeClassification:
+    """Reuse the classification of a group's representative for another hunk of the group.
+
+    The change type, category and confidence are shared. The location, summary and impact
+    analysis written by the LLM describe the representative, so they are not copied.
+
+    Args:
+        classification: The classification of the representative.
+
+    Returns:
+        The classification of the duplicate.
+    """
+    return classification.model_copy(
+        update={"location": None, "impact_analysis": None, "summary": SHARED_SUMMARY}
+    )
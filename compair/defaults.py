@@ -0,0 +1,22 @@
+"""Default settings shared by the pipelines and the CLI.
+
+The CLI builds its argument parsers from these values, so this module must not import anything
+beyond the standard library; ``compair --help`` would otherwise pay for loading the pipelines.
+"""
+
+__all__ = [
+    "DEFAULT_BATCH_TOKEN_BUDGET",
+    "DEFAULT_MAX_CONCURRENCY",
+    "DEFAULT_MAX_HUNK_TOKENS",
+    "DEFAULT_POLL_INTERVAL",
+    "DEFAULT_TARGET_TOKENS",
+    "DEFAULT_VIEWER_ORIGIN",
+]
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_BATCH_TOKEN_BUDGET = 4000
+DEFAULT_TARGET_TOKENS = 200
+DEFAULT_MAX_HUNK_TOKENS = 1000
+DEFAULT_POLL_INTERVAL = 60.0
+# Origin of the web viewer's development server, see web-viewer/vite.config.ts
+DEFAULT_VIEWER_ORIGIN = "http://localhost:3000"
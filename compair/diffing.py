@@ -0,0 +1,321 @@
+"""Module for line-based diff engines producing unified diff output.
+
+Besides ``difflib`` this module provides two engines that operate on interned line ids:
+
+- ``myers``: Myers' O((N+M)D) algorithm with linear space (divide and conquer on the middle
+  snake). Runtime depends on the number of differences, not on repeated lines.
+- ``histogram``: the histogram diff known from git. It anchors on the least frequent common
+  lines, which keeps boilerplate headings and table rows from being matched across clauses,
+  and falls back to Myers for regions without rare lines.
+
+All engines produce the same unified diff format as ``difflib.unified_diff`` (without file
+headers), so the output can be parsed with ``DiffHunk.from_unified_diff_lines``.
+"""
+
+from difflib import SequenceMatcher
+from typing import Iterable, Iterator, List, Literal, Sequence, Tuple
+
+__all__ = [
+    "DIFF_ENGINES",
+    "DiffEngine",
+    "Opcode",
+    "format_unified_groups",
+    "get_opcodes",
+    "group_opcodes",
+    "unified_diff_lines",
+]
+
+DiffEngine = Literal["difflib", "myers", "histogram"]
+DIFF_ENGINES: Tuple[DiffEngine, ...] = ("difflib", "myers", "histogram")
+
+Opcode = Tuple[str, int, int, int, int]
+Match = Tuple[int, int, int]
+
+# Lines occurring more often than this in a region are never used as histogram anchors
+HISTOGRAM_MAX_CHAIN = 64
+
+
+def _intern_lines(lines_a: Sequence[str], lines_b: Sequence[str]) -> Tuple[List[int], List[int]]:
+    ids: dict[str, int] = {}
+    a = [ids.setdefault(line, len(ids)) for line in lines_a]
+    b = [ids.setdefault(line, len(ids)) for line in lines_b]
+    return a, b
+
+
+# Strip the common prefix and suffix of a region and record them as matches
+def _trim(
+    a: Sequence[int], b: Sequence[int], alo: int, ahi: int, blo: int, bhi: int, matches: List[Match]
+) -> Tuple[int, int, int, int]:
+    start = 0
+    while alo + start < ahi and blo + start < bhi and a[alo + start] == b[blo + start]:
+        start += 1
+    if start:
+        matches.append((alo, blo, start))
+    alo, blo = alo + start, blo + start
+
+    end = 0
+    while alo < ahi - end and blo < bhi - end and a[ahi - end - 1] == b[bhi - end - 1]:
+        end += 1
+    if end:
+        matches.append((ahi - end, bhi - end, end))
+    return alo, ahi - end, blo, bhi - end
+
+
+# Find the middle snake of an optimal edit path (Myers 1986, section 4b) and return it as
+# region-relative start and end points (x0, y0, x1, y1)
+def _middle_snake(
+    a: Sequence[int], alo: int, ahi: int, b: Sequence[int], blo: int, bhi: int
+) -> Tuple[int, int, int, int]:
+    n, m = ahi - alo, bhi - blo
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    vf = [0] * (2 * offset + 1)
+    vb = [0] * (2 * offset + 1)
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[offset + k - 1] < vf[offset + k + 1]):
+                x = vf[offset + k + 1]
+            else:
+                x = vf[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            vf[offset + k] = x
+            if odd and delta - (d - 1) <= k <= delta + (d - 1):
+                if x + vb[offset + delta - k] >= n:
+                    return x0, y0, x, y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vb[offset + k - 1] < vb[offset + k + 1]):
+                x = vb[offset + k + 1]
+            else:
+                x = vb[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            vb[offset + k] = x
+            if not odd and -d <= delta - k <= d:
+                if x + vf[offset + delta - k] >= n:
+                    return n - x, m - y, n - x0, m - y0
+    raise AssertionError("no middle snake found")
+
+
+def _myers_matches(
+    a: Sequence[int], b: Sequence[int], alo: int, ahi: int, blo: int, bhi: int
+) -> List[Match]:
+    matches: List[Match] = []
+    stack = [(alo, ahi, blo, bhi)]
+    while stack:
+        alo, ahi, blo, bhi = _trim(a, b, *stack.pop(), matches)
+        if alo == ahi or blo == bhi:
+            continue
+        x0, y0, x1, y1 = _middle_snake(a, alo, ahi, b, blo, bhi)
+        if x1 > x0:
+            matches.append((alo + x0, blo + y0, x1 - x0))
+        stack.append((alo, alo + x0, blo, blo + y0))
+        stack.append((alo + x1, ahi, blo + y1, bhi))
+    return matches
+
+
+def _histogram_matches(
+    a: Sequence[int], b: Sequence[int], alo: int, ahi: int, blo: int, bhi: int
+) -> List[Match]:
+    matches: List[Match] = []
+    stack = [(alo, ahi, blo, bhi)]
+    while stack:
+        alo, ahi, blo, bhi = _trim(a, b, *stack.pop(), matches)
+        if alo == ahi or blo == bhi:
+            continue
+
+        occurrences: dict[int, List[int]] = {}
+        for i in range(alo, ahi):
+            occurrences.setdefault(a[i], []).append(i)
+        # A line that is rare in A but frequent in B is no reliable anchor either
+        b_counts: dict[int, int] = {}
+        for j in range(blo, bhi):
+            b_counts[b[j]] = b_counts.get(b[j], 0) + 1
+        counts = {
+            line: max(len(positions), b_counts.get(line, 0))
+            for line, positions in occurrences.items()
+        }
+
+        best: Tuple[int, int, int, int] | None = None  # (count, -length, start_a, start_b)
+        j = blo
+        while j < bhi:
+            positions = occurrences.get(b[j])
+            next_j = j + 1
+            if positions and counts[b[j]] <= HISTOGRAM_MAX_CHAIN:
+                if best is None or counts[b[j]] <= best[0]:
+                    for i in positions:
+                        # A run is as rare as its rarest line, as in jgit's HistogramDiff
+                        run_count = counts[b[j]]
+                        start_a, start_b = i, j
+                        while start_a > alo and start_b > blo and a[start_a - 1] == b[start_b - 1]:
+                            start_a -= 1
+                            start_b -= 1
+                            run_count = min(run_count, counts[a[start_a]])
+                        end_a, end_b = i + 1, j + 1
+                        while end_a < ahi and end_b < bhi and a[end_a] == b[end_b]:
+                            run_count = min(run_count, counts[a[end_a]])
+                            end_a += 1
+                            end_b += 1
+                        candidate = (run_count, start_a - end_a, start_a, start_b)
+                        if best is None or candidate < best:
+                            best = candidate
+                        next_j = max(next_j, end_b)
+            j = next_j
+
+        if best is None:
+            matches.extend(_myers_matches(a, b, alo, ahi, blo, bhi))
+            continue
+        _, negative_length, start_a, start_b = best
+        length = -negative_length
+        matches.append((start_a, start_b, length))
+        stack.append((alo, start_a, blo, start_b))
+        stack.append((start_a + length, ahi, start_b + length, bhi))
+    return matches
+
+
+def _opcodes_from_matches(matches: List[Match], len_a: int, len_b: int) -> List[Opcode]:
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for start_a, start_b, size in sorted(matches) + [(len_a, len_b, 0)]:
+        tag = ""
+        if i < start_a and j < start_b:
+            tag = "replace"
+        elif i < start_a:
+            tag = "delete"
+        elif j < start_b:
+            tag = "insert"
+        if tag:
+            opcodes.append((tag, i, start_a, j, start_b))
+        if size:
+            if opcodes and opcodes[-1][0] == "equal":
+                _, i1, _, j1, _ = opcodes.pop()
+                opcodes.append(("equal", i1, start_a + size, j1, start_b + size))
+            else:
+                opcodes.append(("equal", start_a, start_a + size, start_b, start_b + size))
+        i, j = start_a + size, start_b + size
+    return opcodes
+
+
+def get_opcodes(
+    lines_a: Sequence[str], lines_b: Sequence[str], engine: DiffEngine = "difflib"
+) -> List[Opcode]:
+    """Compute the edit script between two lists of lines.
+
+    Args:
+        lines_a: Lines of the first text.
+        lines_b: Lines of the second text.
+        engine: The diff engine to use.
+
+    Returns:
+        Opcodes in the format of ``difflib.SequenceMatcher.get_opcodes``.
+
+    Raises:
+        ValueError: If ``engine`` is unknown.
+    """
+    if engine == "difflib":
+        return list(SequenceMatcher(None, lines_a, lines_b).get_opcodes())
+    if engine not in DIFF_ENGINES:
+        raise ValueError(f"Unknown diff engine: {engine}")
+
+    a, b = _intern_lines(lines_a, lines_b)
+    find_matches = _myers_matches if engine == "myers" else _histogram_matches
+    matches = find_matches(a, b, 0, len(a), 0, len(b))
+    return _opcodes_from_matches(matches, len(a), len(b))
+
+
+def group_opcodes(opcodes: List[Opcode], n: int = 3) -> Iterator[List[Opcode]]:
+    """Isolate change clusters with up to ``n`` lines of context.
+
+    Mirrors ``difflib.SequenceMatcher.get_grouped_opcodes`` for precomputed opcodes.
+
+    Args:
+        opcodes: Opcodes as returned by ``get_opcodes``.
+        n: Number of context lines around each change.
+
+    Yields:
+        Groups of opcodes, one per unified diff hunk.
+    """
+    codes = list(opcodes) or [("equal", 0, 1, 0, 1)]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+
+    group: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in codes:
+        # End the current group and start a new one whenever there is a large range with no changes
+        if tag == "equal" and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _format_range(start: int, stop: int) -> str:
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def format_unified_groups(
+    lines_a: Sequence[str], lines_b: Sequence[str], groups: Iterable[List[Opcode]]
+) -> Iterator[str]:
+    """Render opcode groups as unified diff lines without file headers.
+
+    Args:
+        lines_a: Lines of the first text.
+        lines_b: Lines of the second text.
+        groups: Opcode groups, e.g. from ``group_opcodes``.
+
+    Yields:
+        The ``@@`` header and `` ``/``-``/``+`` prefixed lines of every hunk.
+    """
+    for group in groups:
+        first, last = group[0], group[-1]
+        yield f"@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in lines_a[i1:i2]:
+                    yield " " + line
+                continue
+            if tag in {"replace", "delete"}:
+                for line in lines_a[i1:i2]:
+                    yield "-" + line
+            if tag in {"replace", "insert"}:
+                for line in lines_b[j1:j2]:
+                    yield "+" + line
+
+
+def unified_diff_lines(
+    lines_a: Sequence[str], lines_b: Sequence[str], n: int = 3, engine: DiffEngine = "difflib"
+) -> List[str]:
+    """Compute a unified diff between two lists of lines with the selected engine.
+
+    Args:
+        lines_a: Lines of the first text.
+        lines_b: Lines of the second text.
+        n: Number of context lines.
+        engine: The diff engine to use.
+
+    Returns:
+        The unified diff lines without the ``---``/``+++`` file headers.
+    """
+    groups = group_opcodes(get_opcodes(lines_a, lines_b, engine), n)
+    return list(format_unified_groups(lines_a, lines_b, groups))
@@ -0,0 +1,306 @@
+"""Module for incremental re-comparison along chains of document versions.
+
+A ``VersionStore`` is a directory that keeps the artifacts of every compared document version
+(cleaned markdown and line hashes) and every hunk classification. When the next version of a
+document arrives, its line hashes are aligned with the stored ones of the previous version,
+only the regions between runs of equal lines are diffed, and hunks whose changed lines were
+classified in an earlier round are taken from the store. Negotiation rounds with small deltas
+therefore cost time proportional to the size of the change rather than the size of the document.
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from compair.clauses import find_clause_id
+from compair.diffing import DiffEngine
+from compair.models import ChangeClassification, DiffHunk, HunkHeader
+from compair.preprocessing import diff_texts
+
+__all__ = ["DocumentArtifacts", "VersionStore", "diff_changed_region", "hunk_body"]
+
+_HEADER_RE = re.compile(r"^@@ -([0-9]+)(,[0-9]+)? \+([0-9]+)(,[0-9]+)? @@", re.MULTILINE)
+
+
+class DocumentArtifacts(BaseModel):
+    markdown: str = Field(description="Cleaned markdown of the document version.")
+    line_hashes: List[str] = Field(description="Hash of every markdown line.")
+
+
+def _hash_lines(lines: List[str]) -> List[str]:
+    return [hashlib.sha256(line.encode("utf-8")).hexdigest()[:16] for line in lines]
+
+
+def hunk_body(unified_diff: str) -> str:
+    """Return the unified diff of a hunk without its ``@@`` header lines.
+
+    The body identifies a hunk independently of where it is located, so a hunk that only moved
+    because lines were inserted or deleted above it is recognized as the same hunk.
+
+    Args:
+        unified_diff: The unified diff text of the hunk.
+
+    Returns:
+        The context and changed lines of the hunk.
+    """
+    return "\n".join(line for line in unified_diff.splitlines() if not line.startswith("@@"))
+
+
+class VersionStore:
+    """Directory of document version artifacts and hunk classifications.
+
+    Entries are never evicted, so the store keeps a complete record of a negotiation. Writes
+    are atomic, so several comparisons can share the same store.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def _write(self, path: Path, data: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".tmp-{os.getpid()}-{path.name}")
+        tmp_path.write_text(data, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def load_document(self, key: str) -> Optional[DocumentArtifacts]:
+        """Load the artifacts of a document version.
+
+        Args:
+            key: The markdown key of the document, see ``preprocessing.markdown_key``.
+
+        Returns:
+            The stored artifacts, or ``None`` if the version was never stored.
+        """
+        path = self.directory / "documents" / f"{key}.json"
+        if not path.exists():
+            return None
+        return DocumentArtifacts.model_validate_json(path.read_text(encoding="utf-8"))
+
+    def save_document(self, key: str, markdown: str) -> DocumentArtifacts:
+        """Store the artifacts of a document version.
+
+        Args:
+            key: The markdown key of the document, see ``preprocessing.markdown_key``.
+            markdown: The cleaned markdown of the document.
+
+        Returns:
+            The stored artifacts.
+        """
+        artifacts = DocumentArtifacts(
+            markdown=markdown, line_hashes=_hash_lines(markdown.splitlines())
+        )
+        self._write(self.directory / "documents" / f"{key}.json", artifacts.model_dump_json())
+        return artifacts
+
+    def load_classification(self, key: str) -> Optional[ChangeClassification]:
+        """Load the classification of a hunk from an earlier round.
+
+        Args:
+            key: The classification key, built from the hunk body and the model configuration.
+
+        Returns:
+            The stored classification, or ``None`` if the hunk was never classified.
+        """
+        path = self.directory / "classifications" / f"{key}.json"
+        if not path.exists():
+            return None
+        return ChangeClassification.model_validate_json(path.read_text(encoding="utf-8"))
+
+    def save_classification(self, key: str, classification: ChangeClassification) -> None:
+        """Store the classification of a hunk for later rounds.
+
+        Args:
+            key: The classification key, built from the hunk body and the model configuration.
+            classification: The classification to store.
+        """
+        self._write(
+            self.directory / "classifications" / f"{key}.json",
+            json.dumps(classification.model_dump(), ensure_ascii=False),
+        )
+
+
+def _longest_increasing(anchors: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    # anchors are sorted by their line in A; keep the longest chain that is also sorted in B
+    tails: List[int] = []
+    tail_indices: List[int] = []
+    previous: List[int] = []
+    for k, (_, j) in enumerate(anchors):
+        position = bisect.bisect_left(tails, j)
+        if position == len(tails):
+            tails.append(j)
+            tail_indices.append(k)
+        else:
+            tails[position] = j
+            tail_indices[position] = k
+        previous.append(tail_indices[position - 1] if position else -1)
+    chain = []
+    k = tail_indices[-1] if tail_indices else -1
+    while k >= 0:
+        chain.append(anchors[k])
+        k = previous[k]
+    return chain[::-1]
+
+
+def _equal_runs(hashes_a: List[str], hashes_b: List[str]) -> List[Tuple[int, int, int]]:
+    # (start in A, start in B, length) of the runs of equal lines in document order, anchored on
+    # lines that occur exactly once in both versions
+    counts_a = Counter(hashes_a)
+    counts_b = Counter(hashes_b)
+    lines_b = {line_hash: j for j, line_hash in enumerate(hashes_b) if counts_b[line_hash] == 1}
+    anchors = [
+        (i, lines_b[line_hash])
+        for i, line_hash in enumerate(hashes_a)
+        if counts_a[line_hash] == 1 and line_hash in lines_b
+    ]
+    runs: List[Tuple[int, int, int]] = []
+    end_a = end_b = 0
+    for i, j in _longest_increasing(anchors):
+        if i < end_a:
+            # already inside the run extended from an earlier anchor
+            continue
+        start_a, start_b = i, j
+        while (
+            start_a > end_a and start_b > end_b and hashes_a[start_a - 1] == hashes_b[start_b - 1]
+        ):
+            start_a -= 1
+            start_b -= 1
+        end_a, end_b = i + 1, j + 1
+        while (
+            end_a < len(hashes_a) and end_b < len(hashes_b) and hashes_a[end_a] == hashes_b[end_b]
+        ):
+            end_a += 1
+            end_b += 1
+        runs.append((start_a, start_b, end_a - start_a))
+    return runs
+
+
+def _changed_regions(
+    hashes_a: List[str], hashes_b: List[str], n_context_lines: int
+) -> List[List[int]]:
+    # [start in A, end in A, start in B, end in B] of the regions between runs of equal lines,
+    # widened by n_context_lines; regions whose hunks would share context lines are merged
+    regions: List[List[int]] = []
+    previous_a = previous_b = 0
+    runs = _equal_runs(hashes_a, hashes_b) + [(len(hashes_a), len(hashes_b), 0)]
+    for start_a, start_b, length in runs:
+        if start_a > previous_a or start_b > previous_b:
+            before = min(n_context_lines, previous_a, previous_b)
+            if regions and previous_a - before <= regions[-1][1]:
+                regions[-1][1], regions[-1][3] = start_a, start_b
+            else:
+                regions.append([previous_a - before, start_a, previous_b - before, start_b])
+            after = min(n_context_lines, length)
+            regions[-1][1] += after
+            regions[-1][3] += after
+        previous_a, previous_b = start_a + length, start_b + length
+    return regions
+
+
+def _shift_hunk(hunk: DiffHunk, offset_old: int, offset_new: int) -> DiffHunk:
+    def shift(match: re.Match) -> str:
+        old_start, old_length, new_start, new_length = match.groups()
+        return (
+            f"@@ -{int(old_start) + offset_old}{old_length or ''} "
+            f"+{int(new_start) + offset_new}{new_length or ''} @@"
+        )
+
+    header = hunk.hunk_header
+    return hunk.model_copy(
+        update={
+            "unified_diff": _HEADER_RE.sub(shift, hunk.unified_diff),
+            "hunk_header": HunkHeader(
+                start_line_old=header.start_line_old + offset_old,
+                end_line_old=header.end_line_old + offset_old,
+                start_line_new=header.start_line_new + offset_new,
+                end_line_new=header.end_line_new + offset_new,
+            ),
+        }
+    )
+
+
+def diff_changed_region(
+    document_a: DocumentArtifacts,
+    document_b: DocumentArtifacts,
+    n_context_lines: int = 3,
+    engine: DiffEngine = "difflib",
+    align_clauses: bool = False,
+) -> List[DiffHunk]:
+    """Diff only the changed regions of two document versions.
+
+    The stored line hashes are aligned on lines that occur exactly once in both versions, and
+    the runs of equal lines around these anchors are skipped, so only the regions between them
+    are diffed, each widened by ``n_context_lines`` so its hunks keep their context. With
+    ``align_clauses`` every region starts at a clause heading and ends after one, so clauses are
+    aligned as in the whole documents.
+    Hunk headers are shifted to document line numbers. The hunks equal those of diffing the
+    whole documents unless the anchors align repeated lines differently than the diff engine
+    would.
+
+    Args:
+        document_a: Artifacts of the first document version.
+        document_b: Artifacts of the second document version.
+        n_context_lines: Number of context lines to include in the diff.
+        engine: The diff engine to use, see ``compair.diffing``.
+        align_clauses: Whether to diff within aligned clauses, see ``compair.clauses``.
+
+    Returns:
+        The hunks of the unified diff between both versions.
+    """
+    lines_a = document_a.markdown.splitlines()
+    lines_b = document_b.markdown.splitlines()
+    # with aligned clauses, a region starts at a heading before its first changed line
+    regions = _changed_regions(
+        document_a.line_hashes,
+        document_b.line_hashes,
+        max(n_context_lines, 1) if align_clauses else n_context_lines,
+    )
+    if align_clauses:
+        # the lines around a region are equal in both versions, so both bounds move together
+        aligned: List[List[int]] = []
+        for k, region in enumerate(regions):
+            previous_end = aligned[-1][1] if aligned else 0
+            while region[0] > previous_end and find_clause_id(lines_a[region[0]]) is None:
+                region[0] -= 1
+                region[2] -= 1
+            if aligned and (
+                region[0] <= previous_end or find_clause_id(lines_a[region[0]]) is None
+            ):
+                aligned[-1][1], aligned[-1][3] = region[1], region[3]
+            else:
+                aligned.append(region)
+            # end after the next clause heading, which is context if the clause changed, and
+            # stop at the next region, which is then merged
+            last = aligned[-1]
+            limit = regions[k + 1][0] if k + 1 < len(regions) else len(lines_a)
+            while last[1] < limit and find_clause_id(lines_a[last[1]]) is None:
+                last[1] += 1
+                last[3] += 1
+            context = min(n_context_lines, limit - last[1])
+            last[1] += context
+            last[3] += context
+        regions = aligned
+    logging.info(
+        f"Diffing {len(regions)} changed regions of {sum(r[1] - r[0] for r in regions)} of "
+        f"{len(lines_a)} lines in A and {sum(r[3] - r[2] for r in regions)} of {len(lines_b)} "
+        "lines in B"
+    )
+
+    hunks: List[DiffHunk] = []
+    for start_a, end_a, start_b, end_b in regions:
+        region_hunks = diff_texts(
+            "\n".join(lines_a[start_a:end_a]),
+            "\n".join(lines_b[start_b:end_b]),
+            n_context_lines=n_context_lines,
+            engine=engine,
+            align_clauses=align_clauses,
+        )
+        hunks.extend(_shift_hunk(hunk, start_a, start_b) for hunk in region_hunks)
+    return hunks
@@ -0,0 +1,314 @@
+"""Module for structured timing, token usage and cost metrics of comparison runs.
+
+Instrumented code reports two kinds of events: ``stage`` measures the wall time of a pipeline
+stage (parse, cleanup, diff, classify, compare) and ``record_request`` reports one API request
+with its latency, retries and the token ``usage`` of the response. Events are passed to every
+registered hook. ``collect_metrics`` registers a ``MetricsCollector`` that aggregates them into
+a ``RunMetrics`` summary, which the CLI writes with ``--metrics``.
+
+Hooks are process-wide, so comparisons running concurrently in one process report into the
+same hooks.
+"""
+
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+__all__ = [
+    "BATCH_DISCOUNT",
+    "MODEL_PRICES",
+    "MetricsCollector",
+    "MetricsEvent",
+    "MetricsHook",
+    "RequestEvent",
+    "RunMetrics",
+    "StageEvent",
+    "add_hook",
+    "collect_metrics",
+    "estimate_cost",
+    "record_request",
+    "remove_hook",
+    "stage",
+]
+
+# USD per million tokens: input, cached input, output. Longer prefixes match first, so dated
+# snapshots such as "gpt-4.1-2025-04-14" use the price of their model.
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+# Batch API requests are billed at this fraction of the prices above.
+BATCH_DISCOUNT = 0.5
+
+
+class StageEvent(BaseModel):
+    stage: str = Field(description="Name of the pipeline stage, e.g. 'parse' or 'classify'.")
+    seconds: float = Field(description="Wall time of the stage.")
+
+
+class RequestEvent(BaseModel):
+    kind: str = Field(description="What the request does, e.g. 'classify' or 'compare'.")
+    model: Optional[str] = Field(default=None, description="Model that answered the request.")
+    latency_seconds: float = Field(description="Wall time of the request including retries.")
+    retries: int = Field(default=0, description="Number of retried attempts.")
+    failed: bool = Field(default=False, description="Whether the request failed in the end.")
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = Field(default=0, description="Prompt tokens served from the cache.")
+    batch: bool = Field(default=False, description="Whether the request ran in a Batch API job.")
+    completion: bool = Field(
+        default=True,
+        description="Whether the request asks a model for a completion. File and batch "
+        "management requests are not billed per token.",
+    )
+
+
+MetricsEvent = StageEvent | RequestEvent
+MetricsHook = Callable[[MetricsEvent], None]
+
+_hooks: List[MetricsHook] = []
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook: MetricsHook) -> None:
+    """Register a callable that receives every metrics event.
+
+    Hooks are called on the thread that produced the event and must be thread-safe. Errors
+    raised by a hook are logged and do not affect the comparison.
+
+    Args:
+        hook: The callable to register.
+    """
+    with _hooks_lock:
+        _hooks.append(hook)
+
+
+def remove_hook(hook: MetricsHook) -> None:
+    """Unregister a hook registered with ``add_hook``.
+
+    Args:
+        hook: The callable to unregister.
+    """
+    with _hooks_lock:
+        _hooks.remove(hook)
+
+
+def _emit(event: MetricsEvent) -> None:
+    with _hooks_lock:
+        hooks = list(_hooks)
+    for hook in hooks:
+        try:
+            hook(event)
+        except Exception:
+            logging.exception("Metrics hook failed")
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Measure the wall time of a pipeline stage, also if it raises.
+
+    Args:
+        name: Name of the stage.
+
+    Yields:
+        Nothing; the stage runs inside the ``with`` block.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _emit(StageEvent(stage=name, seconds=time.perf_counter() - start))
+
+
+def record_request(
+    kind: str,
+    latency_seconds: float,
+    retries: int = 0,
+    response: Any = None,
+    failed: bool = False,
+    batch: bool = False,
+    completion: bool = True,
+) -> None:
+    """Report one API request, reading the model and token usage from its response.
+
+    Args:
+        kind: What the request does, e.g. ``"classify"``.
+        latency_seconds: Wall time of the request including retries.
+        retries: Number of retried attempts.
+        response: The API response; its ``model`` and ``usage`` are read if present.
+        failed: Whether the request failed in the end.
+        batch: Whether the request ran in a Batch API job, which is billed at
+            ``BATCH_DISCOUNT``.
+        completion: Whether the request asks a model for a completion. Other requests, e.g.
+            uploading a file or polling a batch, are left out of the request, latency and cost
+            figures of ``RunMetrics``.
+    """
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    _emit(
+        RequestEvent(
+            kind=kind,
+            model=getattr(response, "model", None),
+            latency_seconds=latency_seconds,
+            retries=retries,
+            failed=failed,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+            batch=batch,
+            completion=completion,
+        )
+    )
+
+
+def estimate_cost(
+    model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0
+) -> Optional[float]:
+    """Estimate the cost of a request from ``MODEL_PRICES``.
+
+    Args:
+        model: Name of the model, dated snapshots are matched by prefix.
+        prompt_tokens: Number of prompt tokens, including cached ones.
+        completion_tokens: Number of completion tokens.
+        cached_tokens: Number of prompt tokens served from the cache.
+
+    Returns:
+        The estimated cost in USD, or ``None`` if the model has no known price.
+    """
+    prefixes = sorted((p for p in MODEL_PRICES if model.startswith(p)), key=len, reverse=True)
+    if not prefixes:
+        return None
+    input_price, cached_price, output_price = MODEL_PRICES[prefixes[0]]
+    return (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
+
+
+def _request_cost(request: RequestEvent) -> Optional[float]:
+    cost = estimate_cost(
+        request.model or "", request.prompt_tokens, request.completion_tokens, request.cached_tokens
+    )
+    if cost is None or not request.batch:
+        return cost
+    return cost * BATCH_DISCOUNT
+
+
+class StageMetrics(BaseModel):
+    calls: int = Field(default=0, description="Number of times the stage ran.")
+    seconds: float = Field(default=0.0, description="Summed wall time of all runs.")
+
+
+class LatencyMetrics(BaseModel):
+    mean: float
+    p50: float
+    p95: float
+    max: float
+
+
+class RunMetrics(BaseModel):
+    wall_seconds: float = Field(description="Wall time from the start of the collection.")
+    stages: Dict[str, StageMetrics] = Field(default_factory=dict)
+    requests: int = Field(default=0, description="Number of completion requests.")
+    other_requests: int = Field(
+        default=0, description="Number of file and batch management requests."
+    )
+    failed_requests: int = 0
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    latency_seconds: Optional[LatencyMetrics] = Field(
+        default=None, description="Request latency statistics, None without requests."
+    )
+    estimated_cost_usd: Optional[float] = Field(
+        default=None, description="Estimated cost, None if a model has no known price."
+    )
+    request_log: List[RequestEvent] = Field(default_factory=list)
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class MetricsCollector:
+    """Hook that aggregates metrics events into a ``RunMetrics`` summary."""
+
+    def __init__(self) -> None:
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageMetrics] = {}
+        self._requests: List[RequestEvent] = []
+
+    def __call__(self, event: MetricsEvent) -> None:
+        with self._lock:
+            if isinstance(event, StageEvent):
+                metrics = self._stages.setdefault(event.stage, StageMetrics())
+                metrics.calls += 1
+                metrics.seconds += event.seconds
+            else:
+                self._requests.append(event)
+
+    def summary(self) -> RunMetrics:
+        """Aggregate the events collected so far.
+
+        Returns:
+            The summary of stage timings, requests, tokens and cost. Requests, latency and
+            cost only cover completion requests; other requests are only counted.
+        """
+        with self._lock:
+            stages = {name: metrics.model_copy() for name, metrics in self._stages.items()}
+            requests = list(self._requests)
+
+        # file and batch management requests have no token cost and would skew the latencies
+        completions = [request for request in requests if request.completion]
+        latencies = sorted(request.latency_seconds for request in completions)
+        costs = [_request_cost(request) for request in completions if not request.failed]
+        return RunMetrics(
+            wall_seconds=time.perf_counter() - self._start,
+            stages=stages,
+            requests=len(completions),
+            other_requests=len(requests) - len(completions),
+            failed_requests=sum(request.failed for request in completions),
+            retries=sum(request.retries for request in completions),
+            prompt_tokens=sum(request.prompt_tokens for request in completions),
+            completion_tokens=sum(request.completion_tokens for request in completions),
+            cached_tokens=sum(request.cached_tokens for request in completions),
+            latency_seconds=LatencyMetrics(
+                mean=sum(latencies) / len(latencies),
+                p50=_percentile(latencies, 50),
+                p95=_percentile(latencies, 95),
+                max=latencies[-1],
+            )
+            if latencies
+            else None,
+            estimated_cost_usd=None
+            if any(cost is None for cost in costs)
+            else sum(cost or 0.0 for cost in costs),
+            request_log=requests,
+        )
+
+
+@contextmanager
+def collect_metrics() -> Iterator[MetricsCollector]:
+    """Collect the metrics of everything that runs inside the ``with`` block.
+
+    Yields:
+        The registered collector; call ``summary`` for the aggregated metrics.
+    """
+    collector = MetricsCollector()
+    add_hook(collector)
+    try:
+        yield collector
+    finally:
+        remove_hook(collector)
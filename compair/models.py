@@ -3,6 +3,7 @@ import re
 from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
 
 ChangeType = Literal["added", "removed", "modified", "moved"]
 Category = Literal["Critical", "Minor", "Formatting"]
@@ -17,17 +18,34 @@ class HunkHeader(BaseModel):
     end_line_new: int = Field(description="The end line of the change.")
 
 
+class WordSpan(BaseModel):
+    old_start: int = Field(description="Start offset of the changed words in the old excerpt.")
+    old_end: int = Field(description="End offset of the changed words in the old excerpt.")
+    new_start: int = Field(description="Start offset of the changed words in the new excerpt.")
+    new_end: int = Field(description="End offset of the changed words in the new excerpt.")
+
+
 class DiffHunk(BaseModel):
     unified_diff: str = Field(description="The unified diff of the two documents.")
     old_excerpt: Optional[str] = Field(default=None, description="The old excerpt of the change.")
     new_excerpt: Optional[str] = Field(default=None, description="The new excerpt of the change.")
     hunk_header: HunkHeader = Field(description="The hunk header of the change.")
+    # Hidden from the JSON schema, so the LLM is never asked to fill it
+    location: SkipJsonSchema[Optional[str]] = Field(
+        default=None,
+        description="Clause identifier of the changed lines, set by clause alignment.",
+    )
+    word_spans: SkipJsonSchema[Optional[List[WordSpan]]] = Field(
+        default=None,
+        description="Changed words as character offsets into both excerpts, see compair.words.",
+    )
 
     @classmethod
     def from_unified_diff_lines(cls, diff_lines: List[str]) -> List["DiffHunk"]:
         """Convert unified diff lines into a list of ``DiffHunk`` models.
 
         Expects header lines in the form: ``@@ -<start_old>,<len_old> +<start_new>,<len_new> @@``.
+        A length of 1 may be omitted, as done by ``difflib.unified_diff``.
 
         Args:
             diff_lines: Lines from a unified diff (including header and +/- context lines).
@@ -41,13 +59,15 @@ class DiffHunk(BaseModel):
         current_new_excerpt: List[str] = []
         current_old_excerpt: List[str] = []
 
-        header_re = re.compile(r"^@@ -([0-9]+),([0-9]+) \+([0-9]+),([0-9]+) @@")
+        header_re = re.compile(r"^@@ -([0-9]+)(?:,([0-9]+))? \+([0-9]+)(?:,([0-9]+))? @@")
 
-        def flush_block(match_groups: Optional[List[str]]) -> None:
+        def flush_block(match_groups: Optional[List[Optional[str]]]) -> None:
             nonlocal current_diff_lines, current_new_excerpt, current_old_excerpt, result
             if not current_diff_lines or match_groups is None:
                 return
-            start_old, len_old, start_new, len_new = map(int, match_groups)
+            start_old, len_old, start_new, len_new = (
+                int(group) if group is not None else 1 for group in match_groups
+            )
             result.append(
                 cls(
                     unified_diff="\n".join(current_diff_lines),
@@ -62,7 +82,7 @@ class DiffHunk(BaseModel):
                 )
             )
 
-        last_header_groups: Optional[List[str]] = None
+        last_header_groups: Optional[List[Optional[str]]] = None
 
         for line in diff_lines:
             m = header_re.match(line)
@@ -116,6 +136,24 @@ class ChangeClassification(BaseModel):
         default=None,
         description="Optional high-level summary as single sentence.",
     )
+    # Hidden from the JSON schema, so the LLM is never asked to fill it
+    locally_decided: SkipJsonSchema[bool] = Field(
+        default=False,
+        description="Whether the classification was decided by local rules without the LLM.",
+    )
+
+
+class HunkClassification(BaseModel):
+    hunk_id: str = Field(description="The id of the classified hunk as given in the request.")
+    change_classification: ChangeClassification = Field(
+        description="The change classification of the hunk."
+    )
+
+
+class ChangeClassificationBatch(BaseModel):
+    classifications: List[HunkClassification] = Field(
+        description="One classification per hunk id provided in the request."
+    )
 
 
 class Change(BaseModel):
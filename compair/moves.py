@@ -0,0 +1,213 @@
+"""Module for detecting relocated text blocks among diff hunks without the LLM.
+
+A line diff reports a moved clause as one hunk that removes it and another hunk that adds it
+elsewhere. ``detect_moves`` pairs such pure removal and pure addition hunks and merges each pair
+into a single hunk whose header spans the old location in document A and the new location in
+document B. Blocks are compared after normalization (case, whitespace, markdown markers and
+leading clause identifiers), first by exact hash and then by the Jaccard similarity of word
+shingles, looked up through an inverted index instead of comparing all pairs. Only blocks whose
+text is identical apart from clause identifiers and whitespace count as moved unchanged, see
+``moved_unchanged``; all other moves still need a classification.
+"""
+
+import hashlib
+import logging
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from compair.clauses import strip_clause_id
+from compair.models import ChangeClassification, DiffHunk, HunkHeader
+
+__all__ = ["detect_moves", "moved_classification", "moved_unchanged", "normalize_block"]
+
+DEFAULT_MOVE_SIMILARITY = 0.8
+SHINGLE_SIZE = 3
+MIN_MOVE_WORDS = 4
+
+# Markdown list, quote and heading markers
+_LINE_PREFIX_RE = re.compile(r"^\s*(?:[#>*+-]+\s+)*")
+_MARKUP_RE = re.compile(r"[*_`|]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_block(text: str) -> str:
+    """Normalize a text block so that relocated copies compare equal.
+
+    Leading list markers and clause identifiers such as "5.1" or "Section 3" are dropped from
+    every line, since moved clauses are usually renumbered. Other numbers are kept. Markdown
+    emphasis and table pipes are removed, whitespace is collapsed and the text is case-folded.
+
+    Args:
+        text: The text block, e.g. the excerpt of a diff hunk.
+
+    Returns:
+        The normalized text.
+    """
+    lines = (strip_clause_id(_LINE_PREFIX_RE.sub("", line)) for line in text.splitlines())
+    return _WHITESPACE_RE.sub(" ", _MARKUP_RE.sub(" ", " ".join(lines))).strip().casefold()
+
+
+def _shingles(words: List[str]) -> Set[Tuple[str, ...]]:
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _find_pairs(
+    removed: Dict[int, str], added: Dict[int, str], min_similarity: float
+) -> List[Tuple[int, int, float]]:
+    pairs: List[Tuple[int, int, float]] = []
+
+    # Exact matches of the normalized text, paired in document order
+    added_by_hash: Dict[str, List[int]] = {}
+    for i, text in added.items():
+        added_by_hash.setdefault(hashlib.sha256(text.encode("utf-8")).hexdigest(), []).append(i)
+    unmatched_removed = {}
+    for i, text in removed.items():
+        candidates = added_by_hash.get(hashlib.sha256(text.encode("utf-8")).hexdigest())
+        if candidates:
+            pairs.append((i, candidates.pop(0), 1.0))
+        else:
+            unmatched_removed[i] = text
+    matched_added = {j for _, j, _ in pairs}
+
+    # Fuzzy matches by shingle Jaccard similarity, best pairs first
+    added_shingles = {
+        j: _shingles(text.split()) for j, text in added.items() if j not in matched_added
+    }
+    index: Dict[Tuple[str, ...], List[int]] = {}
+    for j, shingles in added_shingles.items():
+        for shingle in shingles:
+            index.setdefault(shingle, []).append(j)
+    candidates_by_similarity = []
+    for i, text in unmatched_removed.items():
+        shingles = _shingles(text.split())
+        shared = Counter(j for shingle in shingles for j in index.get(shingle, []))
+        for j, count in shared.items():
+            similarity = count / (len(shingles) + len(added_shingles[j]) - count)
+            if similarity >= min_similarity:
+                candidates_by_similarity.append((-similarity, i, j))
+
+    used_removed: Set[int] = set()
+    for negative_similarity, i, j in sorted(candidates_by_similarity):
+        if i in used_removed or j in matched_added:
+            continue
+        pairs.append((i, j, -negative_similarity))
+        used_removed.add(i)
+        matched_added.add(j)
+    return pairs
+
+
+def _merge_pair(removed: DiffHunk, added: DiffHunk) -> DiffHunk:
+    return DiffHunk(
+        unified_diff=f"{removed.unified_diff}\n{added.unified_diff}",
+        old_excerpt=removed.old_excerpt,
+        new_excerpt=added.new_excerpt,
+        hunk_header=HunkHeader(
+            start_line_old=removed.hunk_header.start_line_old,
+            end_line_old=removed.hunk_header.end_line_old,
+            start_line_new=added.hunk_header.start_line_new,
+            end_line_new=added.hunk_header.end_line_new,
+        ),
+        location=added.location or removed.location,
+    )
+
+
+def detect_moves(
+    diff_hunks: List[DiffHunk], min_similarity: float = DEFAULT_MOVE_SIMILARITY
+) -> Tuple[List[DiffHunk], Dict[int, float]]:
+    """Pair removed and added blocks with the same or similar text into moved hunks.
+
+    Only hunks that purely remove or purely add lines are considered, and blocks shorter than
+    ``MIN_MOVE_WORDS`` words are ignored. Each pair is replaced by one merged hunk at the
+    position of whichever of the two hunks comes first; all other hunks keep their order.
+
+    Args:
+        diff_hunks: The hunks of the line diff, in document order.
+        min_similarity: Minimum Jaccard similarity of the word shingles of two blocks.
+
+    Returns:
+        The new list of hunks and a mapping of the index of each merged hunk in that list to
+        the similarity of its blocks, where ``1.0`` means the normalized texts are identical.
+
+    Raises:
+        ValueError: If ``min_similarity`` is not in ``(0, 1]``.
+    """
+    if not 0 < min_similarity <= 1:
+        raise ValueError("min_similarity must be in (0, 1]")
+
+    removed: Dict[int, str] = {}
+    added: Dict[int, str] = {}
+    for i, hunk in enumerate(diff_hunks):
+        if hunk.old_excerpt and not hunk.new_excerpt:
+            removed[i] = normalize_block(hunk.old_excerpt)
+        elif hunk.new_excerpt and not hunk.old_excerpt:
+            added[i] = normalize_block(hunk.new_excerpt)
+    removed = {i: text for i, text in removed.items() if len(text.split()) >= MIN_MOVE_WORDS}
+    added = {i: text for i, text in added.items() if len(text.split()) >= MIN_MOVE_WORDS}
+
+    merged: Dict[int, Tuple[DiffHunk, float]] = {}
+    dropped: Set[int] = set()
+    for i, j, similarity in _find_pairs(removed, added, min_similarity):
+        merged[min(i, j)] = (_merge_pair(diff_hunks[i], diff_hunks[j]), similarity)
+        dropped.add(max(i, j))
+
+    result: List[DiffHunk] = []
+    similarities: Dict[int, float] = {}
+    for i, hunk in enumerate(diff_hunks):
+        if i in dropped:
+            continue
+        if i in merged:
+            hunk, similarities[len(result)] = merged[i]
+        result.append(hunk)
+    unchanged = sum(1 for i in similarities if moved_unchanged(result[i]))
+    logging.info(f"Detected {len(merged)} moved blocks ({unchanged} moved unchanged)")
+    return result, similarities
+
+
+def _without_clause_ids(text: str) -> List[str]:
+    return " ".join(strip_clause_id(line) for line in text.splitlines()).split()
+
+
+def moved_unchanged(diff_hunk: DiffHunk) -> bool:
+    """Check whether a moved hunk relocates its text without changing it.
+
+    Args:
+        diff_hunk: The merged hunk returned by ``detect_moves``.
+
+    Returns:
+        Whether both excerpts are identical apart from clause identifiers and whitespace.
+    """
+    return _without_clause_ids(diff_hunk.old_excerpt or "") == _without_clause_ids(
+        diff_hunk.new_excerpt or ""
+    )
+
+
+def moved_classification(
+    diff_hunk: DiffHunk, classification: Optional[ChangeClassification] = None
+) -> ChangeClassification:
+    """Return the classification of a moved hunk.
+
+    Args:
+        diff_hunk: The merged hunk returned by ``detect_moves``.
+        classification: The LLM classification of a block that was edited while moved. If
+            ``None``, the block moved unchanged, see ``moved_unchanged``, and is classified
+            locally.
+
+    Returns:
+        The classification with ``change_type`` set to ``"moved"``.
+    """
+    if classification is not None:
+        return classification.model_copy(update={"change_type": "moved"})
+    header = diff_hunk.hunk_header
+    return ChangeClassification(
+        change_type="moved",
+        category="Minor",
+        confidence=1.0,
+        locally_decided=True,
+        summary=(
+            f"Text moved from line {header.start_line_old} in document A to line "
+            f"{header.start_line_new} in document B without changes."
+        ),
+    )
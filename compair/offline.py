@@ -0,0 +1,256 @@
+"""Module for classifying hunks offline through the OpenAI Batch API.
+
+Nightly runs do not need an answer per request within seconds. The Batch API accepts all
+requests of a run as one JSONL file, processes them within a completion window of 24 hours
+under separate, much higher rate limits and bills them at a discount. ``run_batch`` works in
+three steps:
+
+1. write one chat completion request per hunk to ``requests.jsonl``, with the hunk id as its
+   ``custom_id``
+2. upload the file, create the batch and poll it until it ends
+3. download the output and map each result back to its ``custom_id``
+
+Every step is recorded in a state directory below ``state_dir``, named by a hash of the
+requests. ``batch.json`` holds the ids of the uploaded file, the batch and its output, so a run
+that is interrupted, or started again later with the same inputs, resumes polling the saved
+batch instead of submitting it again. A batch that failed, expired or was cancelled is cleared
+from ``batch.json``, so the next run submits a new one.
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from openai.types import Batch
+from openai.types.chat import ChatCompletion
+from pydantic import BaseModel, Field, ValidationError
+
+from compair import metrics
+from compair.cache import make_key
+from compair.client import call_with_retries, get_openai_client
+from compair.defaults import DEFAULT_POLL_INTERVAL
+
+__all__ = [
+    "BATCH_ENDPOINT",
+    "COMPLETION_WINDOW",
+    "DEFAULT_POLL_INTERVAL",
+    "BatchState",
+    "read_batch_results",
+    "response_format",
+    "run_batch",
+]
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Batches that ended without running all requests; their state is reset so that the next run
+# submits a fresh batch instead of resuming the dead one
+UNFINISHED_STATUSES = {"failed", "expired", "cancelled"}
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class BatchState(BaseModel):
+    requests_hash: str = Field(description="Hash of the requests file the batch was created for.")
+    input_file_id: Optional[str] = Field(default=None, description="Id of the uploaded requests.")
+    batch_id: Optional[str] = Field(default=None, description="Id of the submitted batch.")
+    status: Optional[str] = Field(default=None, description="Last polled status of the batch.")
+    output_file_id: Optional[str] = Field(default=None, description="Id of the results file.")
+
+
+def response_format(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Build the strict JSON schema response format for a structured output model.
+
+    This is the ``response_format`` that ``client.beta.chat.completions.parse`` sends for
+    ``model``, which batch requests have to spell out.
+
+    Args:
+        model: The pydantic model the response has to conform to.
+
+    Returns:
+        The ``json_schema`` response format of the request body.
+    """
+    from openai.lib._parsing._completions import type_to_response_format_param
+
+    return dict(type_to_response_format_param(model))  # type: ignore[arg-type]
+
+
+def _requests_jsonl(bodies: Dict[str, Dict[str, Any]]) -> str:
+    lines = [
+        json.dumps(
+            {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        for custom_id, body in bodies.items()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def read_batch_results(
+    text: str, response_model: Type[T], latency_seconds: float = 0.0
+) -> Dict[str, T]:
+    """Parse the output file of a batch into structured outputs by custom id.
+
+    Every successful result is reported to ``compair.metrics`` as a batch request.
+
+    Args:
+        text: Content of the batch output file.
+        response_model: The pydantic model of the structured output.
+        latency_seconds: Wall time of the batch, reported as the latency of each result.
+
+    Returns:
+        Mapping of custom id to the parsed output. Failed, refused or malformed results are
+        missing from it.
+    """
+    results: Dict[str, T] = {}
+    failed = 0
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            failed += 1
+            continue
+        try:
+            completion = ChatCompletion.model_validate(response["body"])
+            content = completion.choices[0].message.content or ""
+            results[record["custom_id"]] = response_model.model_validate_json(content)
+        except (KeyError, IndexError, ValidationError) as e:
+            logging.warning(f"Discarding malformed batch result {record.get('custom_id')}: {e}")
+            failed += 1
+            continue
+        metrics.record_request("classify_offline", latency_seconds, response=completion, batch=True)
+    if failed:
+        logging.warning(f"{failed} batch requests failed")
+    return results
+
+
+def _load_state(path: Path, requests_hash: str) -> BatchState:
+    if path.exists():
+        state = BatchState.model_validate_json(path.read_text(encoding="utf-8"))
+        if state.requests_hash == requests_hash:
+            return state
+        logging.warning(f"Ignoring batch state '{path}' saved for different requests")
+    return BatchState(requests_hash=requests_hash)
+
+
+def _save_state(path: Path, state: BatchState) -> None:
+    path.write_text(state.model_dump_json(indent=2), encoding="utf-8")
+
+
+def _poll(batch_id: str, poll_interval: float, state: BatchState, state_path: Path) -> Batch:
+    client = get_openai_client()
+    while True:
+        batch = call_with_retries(
+            lambda: client.batches.retrieve(batch_id), kind="batch_poll", completion=False
+        )
+        if batch.status != state.status:
+            state.status = batch.status
+            _save_state(state_path, state)
+        counts = batch.request_counts
+        progress = f", {counts.completed + counts.failed}/{counts.total} done" if counts else ""
+        logging.info(f"Batch {batch_id} is {batch.status}{progress}")
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        time.sleep(poll_interval)
+
+
+def run_batch(
+    bodies: Dict[str, Dict[str, Any]],
+    state_dir: str | Path,
+    response_model: Type[T],
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+) -> Dict[str, T]:
+    """Run chat completion requests as one batch and wait for their structured outputs.
+
+    Args:
+        bodies: Mapping of custom id to the body of its chat completion request.
+        state_dir: Directory for the requests, the batch state and the results, which makes
+            the run resumable.
+        response_model: The pydantic model of the structured output.
+        poll_interval: Seconds between two status checks of the batch.
+
+    Returns:
+        Mapping of custom id to the parsed output. Requests that failed, or were not run
+        because the batch expired or was cancelled, are missing from it. The results of an
+        expired or cancelled batch are not saved, and the next run submits a new batch.
+
+    Raises:
+        RuntimeError: If the batch failed validation as a whole. The batch state is reset
+            first, so the next run submits a new batch.
+    """
+    if not bodies:
+        return {}
+    requests = _requests_jsonl(bodies)
+    requests_hash = make_key(requests)
+    run_dir = Path(state_dir) / requests_hash[:16]
+    run_dir.mkdir(parents=True, exist_ok=True)
+    requests_path = run_dir / "requests.jsonl"
+    if not requests_path.exists():
+        requests_path.write_text(requests, encoding="utf-8")
+    state_path = run_dir / "batch.json"
+    results_path = run_dir / "results.jsonl"
+    state = _load_state(state_path, requests_hash)
+
+    client = get_openai_client()
+    if state.batch_id is None:
+        if state.input_file_id is None:
+            uploaded = call_with_retries(
+                lambda: client.files.create(file=requests_path, purpose="batch"),
+                kind="batch_upload",
+                completion=False,
+            )
+            state.input_file_id = uploaded.id
+            _save_state(state_path, state)
+        input_file_id = state.input_file_id
+        batch = call_with_retries(
+            lambda: client.batches.create(
+                input_file_id=input_file_id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window=COMPLETION_WINDOW,
+            ),
+            kind="batch_create",
+            completion=False,
+        )
+        state.batch_id, state.status = batch.id, batch.status
+        _save_state(state_path, state)
+        logging.info(f"Submitted batch {batch.id} with {len(bodies)} requests")
+    else:
+        logging.info(f"Resuming batch {state.batch_id} from '{state_path}'")
+
+    latency_seconds = 0.0
+    if not results_path.exists():
+        batch = _poll(state.batch_id, poll_interval, state, state_path)
+        finished = batch.status not in UNFINISHED_STATUSES
+        if not finished:
+            logging.warning(f"Batch {batch.id} is {batch.status}, the next run submits a new one")
+            _save_state(state_path, BatchState(requests_hash=requests_hash))
+        if batch.status == "failed":
+            errors = batch.errors.data if batch.errors and batch.errors.data else []
+            details = "; ".join(error.message or error.code or "" for error in errors)
+            raise RuntimeError(f"Batch {batch.id} failed: {details or 'no details'}")
+        latency_seconds = max(0.0, time.time() - batch.created_at)
+        if finished:
+            state.output_file_id = batch.output_file_id
+            _save_state(state_path, state)
+        text = ""
+        output_file_id = batch.output_file_id
+        if output_file_id is not None:
+            output = call_with_retries(
+                lambda: client.files.content(output_file_id),
+                kind="batch_download",
+                completion=False,
+            )
+            text = output.text
+        if finished:
+            results_path.write_text(text, encoding="utf-8")
+    else:
+        text = results_path.read_text(encoding="utf-8")
+
+    results = read_batch_results(text, response_model, latency_seconds=latency_seconds)
+    logging.info(f"Read {len(results)} of {len(bodies)} results of batch {state.batch_id}")
+    return results
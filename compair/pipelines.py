@@ -2,103 +2,601 @@
 
 import base64
 import logging
-import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-
-from dotenv import load_dotenv
-from openai import OpenAI
-
+from typing import Iterator
+
+from openai import LengthFinishReasonError
+from pydantic import ValidationError
+
+from compair import metrics
+from compair.cache import get_cache, make_key
+from compair.client import call_with_retries, get_openai_client, load_prompt
+from compair.dedup import group_duplicates, shared_classification
+from compair.defaults import (
+    DEFAULT_BATCH_TOKEN_BUDGET,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_MAX_HUNK_TOKENS,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_TARGET_TOKENS,
+)
+from compair.diffing import DiffEngine
+from compair.incremental import VersionStore, diff_changed_region, hunk_body
 from compair.models import (
     Change,
     ChangeClassification,
+    ChangeClassificationBatch,
     DifferenceReport,
     DifferenceReportWithInputs,
+    DiffHunk,
 )
-from compair.preprocessing import diff_texts, get_markdown_from_pdf
+from compair.moves import detect_moves, moved_classification, moved_unchanged
+from compair.preprocessing import (
+    diff_texts,
+    estimate_tokens,
+    get_markdown_from_pdfs,
+    markdown_key,
+)
+from compair.rules import classify_formatting
+from compair.sections import SectionPair, split_aligned_sections
+from compair.shaping import shape_hunks
+from compair.uploads import upload_file
+from compair.words import add_word_spans
 
 MODEL = "gpt-4.1"
-PROMPT_DIR = Path(__file__).parent / "prompts"
+TEMPERATURE = 0
+CLASSIFICATION_CACHE_MAX_BYTES = 64 * 1024 * 1024
 
 
-load_dotenv()  # load OPENAI_API_KEY
+def _classification_messages(unified_diff: str) -> list[dict]:
+    return [
+        {
+            "role": "system",
+            "content": load_prompt("system_prompt_llm_light.md"),
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": (
+                        "Classify the diff lines provided as unified diff and return ONLY a JSON object conforming to the "
+                        "ChangeClassification schema."
+                    ),
+                },
+                {"type": "text", "text": f"Unified diff:\n{unified_diff}"},
+            ],
+        },
+    ]
 
 
-def get_openai_client() -> OpenAI:
-    """Return a configured OpenAI client.
+def _classify_diff(unified_diff: str) -> ChangeClassification:
+    """Classify a single unified diff hunk with the llm-light system prompt.
 
-    If ``AZURE_OPENAI_ENDPOINT`` and ``AZURE_OPENAI_API_KEY`` are present, the client is
-    configured for Azure OpenAI (chat completions endpoint style). Otherwise, it falls
-    back to standard OpenAI and uses the ``OPENAI_API_KEY`` from the environment.
+    Args:
+        unified_diff: The unified diff text of the hunk, including its ``@@`` header.
 
     Returns:
-        An initialized ``OpenAI`` client instance suitable for making API calls.
+        The ``ChangeClassification`` parsed from the model response.
     """
-    azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "").strip()
-    azure_key = os.getenv("AZURE_OPENAI_API_KEY", "").strip()
-    if azure_endpoint and azure_key:
-        return OpenAI(
-            api_key=azure_key,
-            base_url=azure_endpoint.rstrip("/") + "/openai/v1/",
-            default_query={"api-version": "preview"},
-        )
-    # Default to public OpenAI
-    # OPENAI_API_KEY will be picked up from env by the SDK
-    return OpenAI()
-
-
-def run_llm_light(
-    pdf_path_a: str | Path,
-    pdf_path_b: str | Path,
-) -> DifferenceReportWithInputs:
-    def _classify_diff(diff_lines: str) -> ChangeClassification:
-        messages = [
-            {
-                "role": "system",
-                "content": (PROMPT_DIR / "system_prompt_llm_light.md").read_text(encoding="utf-8"),
-            },
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": (
-                            "Classify the diff lines provided as unified diff and return ONLY a JSON object conforming to the "
-                            "ChangeClassification schema."
-                        ),
-                    },
-                    {"type": "text", "text": f"Unified diff:\n{diff_lines}"},
-                ],
-            },
-        ]
+    messages = _classification_messages(unified_diff)
 
-        client = get_openai_client()
-        logging.info("Classifying unified diff hunk with llm-light")
-        completion = client.beta.chat.completions.parse(
+    client = get_openai_client()
+    logging.info("Classifying unified diff hunk with llm-light")
+    completion = call_with_retries(
+        lambda: client.beta.chat.completions.parse(
             model=MODEL,
-            temperature=0,
+            temperature=TEMPERATURE,
             messages=messages,
             response_format=ChangeClassification,
+        ),
+        kind="classify",
+    )
+    return completion.choices[0].message.parsed
+
+
+def _classify_diff_batch(unified_diffs: dict[str, str]) -> dict[str, ChangeClassification]:
+    """Classify several unified diff hunks with a single structured-output request.
+
+    Args:
+        unified_diffs: Mapping of hunk id to the unified diff text of the hunk.
+
+    Returns:
+        Mapping of hunk id to its ``ChangeClassification``. Hunks the model left out, returned
+        more than once or answered with an unknown id are missing from the result. If the
+        response cannot be parsed at all, the result is empty.
+    """
+    hunk_parts = [
+        {"type": "text", "text": f"Hunk id: {hunk_id}\nUnified diff:\n{unified_diff}"}
+        for hunk_id, unified_diff in unified_diffs.items()
+    ]
+    messages = [
+        {
+            "role": "system",
+            "content": load_prompt("system_prompt_llm_light.md"),
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": (
+                        "Classify each of the following unified diff hunks independently and return "
+                        "ONLY a JSON object conforming to the ChangeClassificationBatch schema with "
+                        "exactly one entry per hunk id."
+                    ),
+                },
+                *hunk_parts,
+            ],
+        },
+    ]
+
+    client = get_openai_client()
+    logging.info(f"Classifying batch of {len(unified_diffs)} unified diff hunks with llm-light")
+    try:
+        completion = call_with_retries(
+            lambda: client.beta.chat.completions.parse(
+                model=MODEL,
+                temperature=TEMPERATURE,
+                messages=messages,
+                response_format=ChangeClassificationBatch,
+            ),
+            kind="classify_batch",
         )
-        return completion.choices[0].message.parsed
+    except (LengthFinishReasonError, ValidationError) as e:
+        logging.warning(f"Discarding malformed batch response: {e}")
+        return {}
 
-    logging.info("Running llm-light pipeline")
-    document_a_markdown = get_markdown_from_pdf(str(pdf_path_a))
-    document_b_markdown = get_markdown_from_pdf(str(pdf_path_b))
-    diff_hunks = diff_texts(document_a_markdown, document_b_markdown, n_context_lines=1)
+    batch: ChangeClassificationBatch | None = completion.choices[0].message.parsed
+    if batch is None:
+        return {}
+
+    counts = Counter(item.hunk_id for item in batch.classifications)
+    return {
+        item.hunk_id: item.change_classification
+        for item in batch.classifications
+        if item.hunk_id in unified_diffs and counts[item.hunk_id] == 1
+    }
+
+
+def _classify_diff_group(unified_diffs: dict[str, str]) -> list[ChangeClassification]:
+    """Classify a group of hunks, batching them when there is more than one.
+
+    Hunks that are missing or malformed in the batch response are retried on their own.
 
-    changes = []
+    Args:
+        unified_diffs: Mapping of hunk id to the unified diff text of the hunk.
+
+    Returns:
+        The classifications in the order of ``unified_diffs``.
+    """
+    if len(unified_diffs) == 1:
+        return [_classify_diff(unified_diff) for unified_diff in unified_diffs.values()]
+
+    classified = _classify_diff_batch(unified_diffs)
+    missing = [hunk_id for hunk_id in unified_diffs if hunk_id not in classified]
+    if missing:
+        logging.warning(f"Retrying {len(missing)} hunks missing from batch response individually")
+    for hunk_id in missing:
+        classified[hunk_id] = _classify_diff(unified_diffs[hunk_id])
+    return [classified[hunk_id] for hunk_id in unified_diffs]
+
+
+def _pack_batches(
+    unified_diffs: dict[str, str], batch_size: int, batch_token_budget: int
+) -> list[dict[str, str]]:
+    """Pack consecutive hunks into batches bounded by hunk count and estimated tokens.
+
+    A hunk that exceeds ``batch_token_budget`` on its own is placed in a batch of one.
+
+    Args:
+        unified_diffs: Mapping of hunk id to unified diff text, in report order.
+        batch_size: Maximum number of hunks per batch.
+        batch_token_budget: Maximum estimated number of diff tokens per batch.
+
+    Returns:
+        Batches as mappings of hunk id to unified diff text.
+    """
+    batches: list[dict[str, str]] = []
+    current: dict[str, str] = {}
+    current_tokens = 0
+    for hunk_id, unified_diff in unified_diffs.items():
+        tokens = estimate_tokens(unified_diff)
+        if current and (len(current) >= batch_size or current_tokens + tokens > batch_token_budget):
+            batches.append(current)
+            current, current_tokens = {}, 0
+        current[hunk_id] = unified_diff
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _classify_offline(
+    unified_diffs: dict[str, str], offline_dir: str | Path, poll_interval: float
+) -> dict[str, ChangeClassification]:
+    """Classify hunks in one Batch API job, see ``compair.offline``.
+
+    Hunks without a valid result in the batch output are classified online on their own.
+
+    Args:
+        unified_diffs: Mapping of hunk id to the unified diff text of the hunk.
+        offline_dir: Directory for the resumable state of the batch.
+        poll_interval: Seconds between two status checks of the batch.
+
+    Returns:
+        Mapping of hunk id to its ``ChangeClassification``.
+    """
+    from compair import offline
+
+    response_format = offline.response_format(ChangeClassification)
+    bodies = {
+        hunk_id: {
+            "model": MODEL,
+            "temperature": TEMPERATURE,
+            "messages": _classification_messages(unified_diff),
+            "response_format": response_format,
+        }
+        for hunk_id, unified_diff in unified_diffs.items()
+    }
+    classified = offline.run_batch(bodies, offline_dir, ChangeClassification, poll_interval)
+    missing = [hunk_id for hunk_id in unified_diffs if hunk_id not in classified]
+    if missing:
+        logging.warning(f"Classifying {len(missing)} hunks missing from batch output online")
+    for hunk_id in missing:
+        classified[hunk_id] = _classify_diff(unified_diffs[hunk_id])
+    return classified
+
+
+def _iter_classifications(
+    diff_hunks: list[DiffHunk],
+    max_concurrency: int,
+    batch_size: int,
+    batch_token_budget: int,
+    use_cache: bool,
+    skip: set[int] | None = None,
+    offline_dir: str | Path | None = None,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+) -> Iterator[tuple[int, ChangeClassification]]:
+    """Classify diff hunks and yield each classification as soon as it is available.
+
+    Repeated hunks are served from the persistent classification cache first. Cache keys hash
+    the unified diff, the system prompt, ``MODEL`` and ``TEMPERATURE``, so only hunks that were
+    never classified under the current configuration reach the API. Fresh classifications are
+    written to the cache as they arrive. With ``offline_dir``, the remaining hunks are
+    classified in a single Batch API job instead of concurrent requests.
+
+    Args:
+        diff_hunks: The hunks to classify, in report order.
+        max_concurrency: Maximum number of classification requests in flight at once.
+        batch_size: Maximum number of hunks classified per request.
+        batch_token_budget: Maximum estimated number of diff tokens per batched request.
+        use_cache: Whether to read from and write to the classification cache.
+        skip: Indices of hunks that were already classified locally.
+        offline_dir: Directory for the resumable state of a Batch API job, see
+            ``compair.offline``. ``None`` classifies online.
+        poll_interval: Seconds between two status checks of the batch.
+
+    Yields:
+        Tuples of hunk index into ``diff_hunks`` and its classification, in completion order.
+    """
+    cache = get_cache("classifications", CLASSIFICATION_CACHE_MAX_BYTES) if use_cache else None
+    system_prompt = load_prompt("system_prompt_llm_light.md")
+
+    hits: list[tuple[int, ChangeClassification]] = []
+    cache_keys: dict[str, str] = {}
+    pending: dict[str, str] = {}
     for i, diff_hunk in enumerate(diff_hunks):
-        change_classification = _classify_diff(diff_hunk.unified_diff)
-        changes.append(
-            Change(
-                change_id=str(i + 1),
-                diff_hunk=diff_hunk,
-                change_classification=change_classification,
+        if skip and i in skip:
+            continue
+        hunk_id = str(i + 1)
+        if cache is not None:
+            cache_keys[hunk_id] = make_key(
+                diff_hunk.unified_diff, system_prompt, MODEL, str(TEMPERATURE)
+            )
+            cached = cache.get(cache_keys[hunk_id])
+            if cached is not None:
+                hits.append((i, ChangeClassification.model_validate_json(cached)))
+                continue
+        pending[hunk_id] = diff_hunk.unified_diff
+    if cache is not None:
+        logging.info(f"Classification cache: {len(hits)} hits, {len(pending)} misses")
+    yield from hits
+
+    if offline_dir is not None:
+        logging.info(f"Classifying {len(pending)} hunks offline in a batch job")
+        with metrics.stage("classify"):
+            classified = _classify_offline(pending, offline_dir, poll_interval)
+        for hunk_id, classification in classified.items():
+            if cache is not None:
+                cache.set(cache_keys[hunk_id], classification.model_dump_json().encode("utf-8"))
+            yield int(hunk_id) - 1, classification
+        return
+
+    batches = _pack_batches(pending, batch_size, batch_token_budget)
+    logging.info(
+        f"Classifying {len(pending)} hunks in {len(batches)} requests with up to "
+        f"{max_concurrency} concurrent requests"
+    )
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    # measured until the last classification is consumed, which includes consumer time
+    try:
+        with metrics.stage("classify"):
+            futures = {executor.submit(_classify_diff_group, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                for hunk_id, classification in zip(futures[future], future.result()):
+                    if cache is not None:
+                        cache.set(
+                            cache_keys[hunk_id], classification.model_dump_json().encode("utf-8")
+                        )
+                    yield int(hunk_id) - 1, classification
+    finally:
+        # stop queued requests if the consumer stops early or a request fails
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def stream_llm_light(
+    pdf_path_a: str | Path,
+    pdf_path_b: str | Path,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    batch_size: int = 1,
+    batch_token_budget: int = DEFAULT_BATCH_TOKEN_BUDGET,
+    use_cache: bool = True,
+    parse_workers: int | None = None,
+    diff_engine: DiffEngine = "difflib",
+    detect_moved: bool = True,
+    formatting_rules: bool = True,
+    align_clauses: bool = False,
+    history: str | Path | None = None,
+    hunk_tokens: int | None = DEFAULT_TARGET_TOKENS,
+    offline_dir: str | Path | None = None,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    deduplicate: bool = True,
+) -> tuple[str, str, Iterator[Change]]:
+    """Diff both documents locally and stream each change as soon as it is classified.
+
+    Parsing and diffing happen eagerly; classification starts when the returned iterator is
+    first consumed. Changes are yielded in completion order and carry the same ``change_id``
+    they get in ``run_llm_light``.
+
+    Args:
+        pdf_path_a: Path to the first PDF file.
+        pdf_path_b: Path to the second PDF file.
+        max_concurrency: Maximum number of classification requests in flight at once.
+        batch_size: Maximum number of hunks classified per request.
+        batch_token_budget: Maximum estimated number of diff tokens per batched request.
+        use_cache: Whether to use the on-disk markdown and classification caches.
+        parse_workers: Maximum number of processes for PDF parsing, defaults to the CPU count.
+        diff_engine: The line diff engine, see ``compair.diffing``.
+        detect_moved: Whether to merge removed and re-added blocks into moved changes, see
+            ``compair.moves``.
+        formatting_rules: Whether to classify formatting-only hunks locally, see
+            ``compair.rules``.
+        align_clauses: Whether to diff within clauses aligned by identifier and fill
+            ``location`` from the clause index instead of the LLM, see ``compair.clauses``.
+        history: Directory of a ``VersionStore`` for incremental comparison of document
+            versions, see ``compair.incremental``.
+        hunk_tokens: Target estimated tokens per hunk for merging small hunks, splitting large
+            ones and sizing their context, see ``compair.shaping``. ``None`` keeps the hunks of
+            the line diff with one context line.
+        offline_dir: Directory for the resumable state of a Batch API job that classifies
+            all hunks at once, see ``compair.offline``. ``None`` classifies online.
+        poll_interval: Seconds between two status checks of the batch.
+        deduplicate: Whether hunks that repeat the edit of an earlier hunk share its
+            classification instead of being classified again, see ``compair.dedup``.
+
+    Returns:
+        The markdown of both documents and a lazy iterator over the classified changes.
+
+    Raises:
+        ValueError: If ``max_concurrency`` or ``batch_size`` is smaller than 1.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    logging.info("Running llm-light pipeline")
+    store = VersionStore(history) if history is not None else None
+    if store is None:
+        document_a_markdown, document_b_markdown = get_markdown_from_pdfs(
+            [str(pdf_path_a), str(pdf_path_b)], use_cache=use_cache, max_workers=parse_workers
+        )
+        diff_hunks = diff_texts(
+            document_a_markdown,
+            document_b_markdown,
+            n_context_lines=1,
+            engine=diff_engine,
+            align_clauses=align_clauses,
+        )
+    else:
+        pdf_paths = [str(pdf_path_a), str(pdf_path_b)]
+        keys = [markdown_key(pdf_path) for pdf_path in pdf_paths]
+        stored = [store.load_document(key) for key in keys]
+        missing = [i for i, artifacts in enumerate(stored) if artifacts is None]
+        logging.info(f"Loaded {2 - len(missing)} of 2 document versions from history")
+        markdowns = get_markdown_from_pdfs(
+            [pdf_paths[i] for i in missing], use_cache=use_cache, max_workers=parse_workers
+        )
+        for i, markdown in zip(missing, markdowns):
+            stored[i] = store.save_document(keys[i], markdown)
+        document_a, document_b = (artifacts for artifacts in stored if artifacts is not None)
+        document_a_markdown, document_b_markdown = document_a.markdown, document_b.markdown
+        diff_hunks = diff_changed_region(
+            document_a,
+            document_b,
+            n_context_lines=1,
+            engine=diff_engine,
+            align_clauses=align_clauses,
+        )
+    if hunk_tokens is not None:
+        diff_hunks = shape_hunks(
+            document_a_markdown.splitlines(),
+            document_b_markdown.splitlines(),
+            diff_hunks,
+            target_tokens=hunk_tokens,
+            max_tokens=max(DEFAULT_MAX_HUNK_TOKENS, hunk_tokens),
+        )
+    moved: dict[int, float] = {}
+    if detect_moved:
+        diff_hunks, moved = detect_moves(diff_hunks)
+    diff_hunks = add_word_spans(diff_hunks)
+    # blocks that moved unchanged and formatting-only hunks need no LLM call
+    local_classifications = {
+        i: moved_classification(diff_hunks[i]) for i in moved if moved_unchanged(diff_hunks[i])
+    }
+    if formatting_rules:
+        for i, diff_hunk in enumerate(diff_hunks):
+            if i in moved:
+                continue
+            classification = classify_formatting(diff_hunk)
+            if classification is not None:
+                local_classifications[i] = classification
+    logging.info(f"Classified {len(local_classifications)} of {len(diff_hunks)} hunks locally")
+
+    # hunks with the same changed lines as in an earlier round keep their classification
+    history_keys: dict[int, str] = {}
+    if store is not None:
+        system_prompt = load_prompt("system_prompt_llm_light.md")
+        carried = 0
+        for i, diff_hunk in enumerate(diff_hunks):
+            if i in local_classifications:
+                continue
+            history_keys[i] = make_key(
+                hunk_body(diff_hunk.unified_diff), system_prompt, MODEL, str(TEMPERATURE)
             )
+            classification = store.load_classification(history_keys[i])
+            if classification is not None:
+                local_classifications[i] = classification
+                carried += 1
+        logging.info(f"Carried forward {carried} classifications from history")
+
+    # hunks that repeat the edit of an earlier hunk share its classification
+    duplicates = group_duplicates(diff_hunks, skip=local_classifications) if deduplicate else {}
+    skip = set(local_classifications).union(*duplicates.values())
+
+    def _change(i: int, change_classification: ChangeClassification) -> Change:
+        if i in moved:
+            change_classification = moved_classification(diff_hunks[i], change_classification)
+        if diff_hunks[i].location:
+            # the clause index is authoritative over the location inferred by the LLM
+            change_classification = change_classification.model_copy(
+                update={"location": diff_hunks[i].location}
+            )
+        return Change(
+            change_id=str(i + 1),
+            diff_hunk=diff_hunks[i],
+            change_classification=change_classification,
         )
 
+    def _changes() -> Iterator[Change]:
+        for i in sorted(local_classifications):
+            yield _change(i, local_classifications[i])
+        for i, change_classification in _iter_classifications(
+            diff_hunks,
+            max_concurrency=max_concurrency,
+            batch_size=batch_size,
+            batch_token_budget=batch_token_budget,
+            use_cache=use_cache,
+            skip=skip,
+            offline_dir=offline_dir,
+            poll_interval=poll_interval,
+        ):
+            if store is not None:
+                store.save_classification(history_keys[i], change_classification)
+            yield _change(i, change_classification)
+            for j in duplicates.get(i, []):
+                duplicate_classification = shared_classification(change_classification)
+                if store is not None:
+                    store.save_classification(history_keys[j], duplicate_classification)
+                yield _change(j, duplicate_classification)
+
+    return document_a_markdown, document_b_markdown, _changes()
+
+
+def run_llm_light(
+    pdf_path_a: str | Path,
+    pdf_path_b: str | Path,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    batch_size: int = 1,
+    batch_token_budget: int = DEFAULT_BATCH_TOKEN_BUDGET,
+    use_cache: bool = True,
+    parse_workers: int | None = None,
+    diff_engine: DiffEngine = "difflib",
+    detect_moved: bool = True,
+    formatting_rules: bool = True,
+    align_clauses: bool = False,
+    history: str | Path | None = None,
+    hunk_tokens: int | None = DEFAULT_TARGET_TOKENS,
+    offline_dir: str | Path | None = None,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    deduplicate: bool = True,
+) -> DifferenceReportWithInputs:
+    """Diff both documents locally and classify each diff hunk with the LLM.
+
+    Hunks are classified concurrently on a thread pool with at most ``max_concurrency``
+    requests in flight. With ``batch_size`` greater than 1, consecutive hunks are packed into
+    a single request of up to ``batch_size`` hunks and ``batch_token_budget`` estimated tokens.
+    The resulting changes keep the order of the diff hunks, so ``change_id`` values are stable
+    regardless of the order in which requests finish.
+
+    Args:
+        pdf_path_a: Path to the first PDF file.
+        pdf_path_b: Path to the second PDF file.
+        max_concurrency: Maximum number of classification requests in flight at once.
+        batch_size: Maximum number of hunks classified per request.
+        batch_token_budget: Maximum estimated number of diff tokens per batched request.
+        use_cache: Whether to use the on-disk markdown and classification caches.
+        parse_workers: Maximum number of processes for PDF parsing, defaults to the CPU count.
+        diff_engine: The line diff engine, see ``compair.diffing``.
+        detect_moved: Whether to merge removed and re-added blocks into moved changes, see
+            ``compair.moves``.
+        formatting_rules: Whether to classify formatting-only hunks locally, see
+            ``compair.rules``.
+        align_clauses: Whether to diff within clauses aligned by identifier and fill
+            ``location`` from the clause index instead of the LLM, see ``compair.clauses``.
+        history: Directory of a ``VersionStore`` for incremental comparison of document
+            versions, see ``compair.incremental``.
+        hunk_tokens: Target estimated tokens per hunk for merging small hunks, splitting large
+            ones and sizing their context, see ``compair.shaping``. ``None`` keeps the hunks of
+            the line diff with one context line.
+        offline_dir: Directory for the resumable state of a Batch API job that classifies
+            all hunks at once, see ``compair.offline``. ``None`` classifies online.
+        poll_interval: Seconds between two status checks of the batch.
+        deduplicate: Whether hunks that repeat the edit of an earlier hunk share its
+            classification instead of being classified again, see ``compair.dedup``.
+
+    Returns:
+        A ``DifferenceReportWithInputs`` containing both inputs and the classified changes.
+
+    Raises:
+        ValueError: If a PDF path is invalid, or ``max_concurrency`` or ``batch_size`` is
+            smaller than 1.
+
+    # noqa: DAR402 ValueError
+    """
+    document_a_markdown, document_b_markdown, changes = stream_llm_light(
+        pdf_path_a,
+        pdf_path_b,
+        max_concurrency=max_concurrency,
+        batch_size=batch_size,
+        batch_token_budget=batch_token_budget,
+        use_cache=use_cache,
+        parse_workers=parse_workers,
+        diff_engine=diff_engine,
+        detect_moved=detect_moved,
+        formatting_rules=formatting_rules,
+        align_clauses=align_clauses,
+        history=history,
+        hunk_tokens=hunk_tokens,
+        offline_dir=offline_dir,
+        poll_interval=poll_interval,
+        deduplicate=deduplicate,
+    )
+
     diff_report = DifferenceReport(
-        changes=changes,
+        changes=sorted(changes, key=lambda change: int(change.change_id or 0)),
         summary=None,
     )
 
@@ -111,42 +609,35 @@ def run_llm_light(
     return result
 
 
-def run_llm_heavy(
-    pdf_path_a: str | Path,
-    pdf_path_b: str | Path,
-) -> DifferenceReportWithInputs:
-    """Use Chat Completions structured parsing to return a ``DifferenceReport``.
-
-    The model is instructed via a system message; both documents are provided as text parts in
-    the user message. The SDK parses the response directly into the Pydantic model.
+def _compare_documents(
+    document_a_markdown: str, document_b_markdown: str, excerpt_note: str | None = None
+) -> DifferenceReport:
+    """Compare two markdown texts with the llm-heavy system prompt in a single request.
 
     Args:
-        pdf_path_a: Path to the first PDF file.
-        pdf_path_b: Path to the second PDF file.
+        document_a_markdown: Markdown text of the first document or section.
+        document_b_markdown: Markdown text of the second document or section.
+        excerpt_note: Optional instruction appended to the request, e.g. that the texts are
+            aligned excerpts of longer documents.
 
     Returns:
-        A ``DifferenceReportWithInputs`` containing both inputs and the parsed report.
+        The ``DifferenceReport`` parsed from the model response.
     """
-
-    logging.info("Running llm-heavy pipeline")
-    document_a_markdown = get_markdown_from_pdf(str(pdf_path_a))
-    document_b_markdown = get_markdown_from_pdf(str(pdf_path_b))
-
+    instruction = (
+        "Compare the two documents and return ONLY a JSON object conforming to the "
+        "DifferenceReport schema."
+    )
+    if excerpt_note:
+        instruction = f"{instruction} {excerpt_note}"
     messages = [
         {
             "role": "system",
-            "content": (PROMPT_DIR / "system_prompt_llm_heavy.md").read_text(encoding="utf-8"),
+            "content": load_prompt("system_prompt_llm_heavy.md"),
         },
         {
             "role": "user",
             "content": [
-                {
-                    "type": "text",
-                    "text": (
-                        "Compare the two documents and return ONLY a JSON object conforming to the "
-                        "DifferenceReport schema."
-                    ),
-                },
+                {"type": "text", "text": instruction},
                 {"type": "text", "text": f"Document A:\n{document_a_markdown}"},
                 {"type": "text", "text": f"Document B:\n{document_b_markdown}"},
             ],
@@ -154,15 +645,137 @@ def run_llm_heavy(
     ]
 
     client = get_openai_client()
-    completion = client.beta.chat.completions.parse(
-        model=MODEL,
-        temperature=0,
-        messages=messages,
-        response_format=DifferenceReport,
+    completion = call_with_retries(
+        lambda: client.beta.chat.completions.parse(
+            model=MODEL,
+            temperature=TEMPERATURE,
+            messages=messages,
+            response_format=DifferenceReport,
+        ),
+        kind="compare",
     )
+    return completion.choices[0].message.parsed
 
-    msg = completion.choices[0].message
-    diff_report: DifferenceReport = msg.parsed
+
+def _compare_sections(
+    document_a_markdown: str,
+    document_b_markdown: str,
+    chunk_token_budget: int,
+    max_concurrency: int,
+) -> DifferenceReport:
+    """Compare aligned section pairs concurrently and merge the partial reports.
+
+    Section pairs with identical text are skipped. Hunk header line numbers returned for a
+    section are shifted to document line numbers, and ``change_id`` values are renumbered in
+    document order.
+
+    Args:
+        document_a_markdown: Markdown text of the first document.
+        document_b_markdown: Markdown text of the second document.
+        chunk_token_budget: Maximum estimated number of tokens of both sides of a section pair.
+        max_concurrency: Maximum number of section requests in flight at once.
+
+    Returns:
+        The merged ``DifferenceReport``.
+    """
+    lines_a = document_a_markdown.splitlines()
+    lines_b = document_b_markdown.splitlines()
+    with metrics.stage("diff"):
+        sections = [
+            section
+            for section in split_aligned_sections(lines_a, lines_b, chunk_token_budget)
+            if not section.identical
+        ]
+    logging.info(
+        f"Comparing {len(sections)} section pairs with up to {max_concurrency} concurrent requests"
+    )
+
+    def _compare(section: SectionPair) -> DifferenceReport:
+        return _compare_documents(
+            "\n".join(lines_a[section.start_line_a : section.end_line_a]),
+            "\n".join(lines_b[section.start_line_b : section.end_line_b]),
+            excerpt_note=(
+                "The documents are aligned excerpts of longer documents; number hunk header "
+                "lines relative to the excerpts, starting at 1."
+            ),
+        )
+
+    with metrics.stage("compare"), ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        section_reports = list(executor.map(_compare, sections))
+
+    changes: list[Change] = []
+    for section, section_report in zip(sections, section_reports):
+        for change in section_report.changes:
+            header = change.diff_hunk.hunk_header
+            shifted_header = header.model_copy(
+                update={
+                    "start_line_old": header.start_line_old + section.start_line_a,
+                    "end_line_old": header.end_line_old + section.start_line_a,
+                    "start_line_new": header.start_line_new + section.start_line_b,
+                    "end_line_new": header.end_line_new + section.start_line_b,
+                }
+            )
+            changes.append(
+                change.model_copy(
+                    update={
+                        "change_id": str(len(changes) + 1),
+                        "diff_hunk": change.diff_hunk.model_copy(
+                            update={"hunk_header": shifted_header}
+                        ),
+                    }
+                )
+            )
+    summaries = [report.summary for report in section_reports if report.summary]
+    return DifferenceReport(changes=changes, summary=" ".join(summaries) or None)
+
+
+def run_llm_heavy(
+    pdf_path_a: str | Path,
+    pdf_path_b: str | Path,
+    use_cache: bool = True,
+    parse_workers: int | None = None,
+    chunk_token_budget: int | None = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> DifferenceReportWithInputs:
+    """Use Chat Completions structured parsing to return a ``DifferenceReport``.
+
+    The model is instructed via a system message; both documents are provided as text parts in
+    the user message. The SDK parses the response directly into the Pydantic model.
+
+    With ``chunk_token_budget``, both documents are split into aligned section pairs (see
+    ``compair.sections``) that are compared concurrently, so documents larger than the context
+    window can be analyzed and latency depends on the largest section.
+
+    Args:
+        pdf_path_a: Path to the first PDF file.
+        pdf_path_b: Path to the second PDF file.
+        use_cache: Whether to use the on-disk markdown cache.
+        parse_workers: Maximum number of processes for PDF parsing, defaults to the CPU count.
+        chunk_token_budget: Maximum estimated number of tokens of both sides of a section pair.
+            ``None`` compares the complete documents in a single request.
+        max_concurrency: Maximum number of section requests in flight at once.
+
+    Returns:
+        A ``DifferenceReportWithInputs`` containing both inputs and the parsed report.
+
+    Raises:
+        ValueError: If ``max_concurrency`` is smaller than 1.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    logging.info("Running llm-heavy pipeline")
+    document_a_markdown, document_b_markdown = get_markdown_from_pdfs(
+        [str(pdf_path_a), str(pdf_path_b)], use_cache=use_cache, max_workers=parse_workers
+    )
+
+    if chunk_token_budget is None:
+        with metrics.stage("compare"):
+            diff_report = _compare_documents(document_a_markdown, document_b_markdown)
+    else:
+        diff_report = _compare_sections(
+            document_a_markdown, document_b_markdown, chunk_token_budget, max_concurrency
+        )
     result = DifferenceReportWithInputs(
         document_a=document_a_markdown,
         document_b=document_b_markdown,
@@ -175,15 +788,21 @@ def run_llm_heavy(
 def run_llm_only(
     pdf_path_a: str | Path,
     pdf_path_b: str | Path,
+    upload_files: bool = False,
+    use_cache: bool = True,
 ) -> DifferenceReportWithInputs:
     """Use Chat Completions structured parsing with two PDF uploads.
 
-    Attaches both PDFs as file parts (data URLs) in a single user message. The response is parsed
-    directly into a DifferenceReportWithInputs instance.
+    Attaches both PDFs as file parts in a single user message, inlined as base64 data URLs or,
+    with ``upload_files``, as ids of files uploaded once through the Files API. The response is
+    parsed directly into a DifferenceReportWithInputs instance.
 
     Args:
         pdf_path_a: Path to the first PDF file.
         pdf_path_b: Path to the second PDF file.
+        upload_files: Whether to reference the PDFs by the ids of uploaded files instead of
+            inlining them, see ``compair.uploads``.
+        use_cache: Whether to reuse file ids from the on-disk upload cache.
 
     Returns:
         A ``DifferenceReportWithInputs`` parsed directly from the model response.
@@ -194,10 +813,18 @@ def run_llm_only(
         encoded = base64.b64encode(file_path.read_bytes()).decode("utf-8")
         return f"data:application/pdf;base64,{encoded}"
 
+    def _file_part(path: str | Path) -> dict:
+        if upload_files:
+            return {"type": "file", "file": {"file_id": upload_file(path, use_cache=use_cache)}}
+        return {
+            "type": "file",
+            "file": {"file_data": _pdf_to_data_url(path), "filename": Path(path).name},
+        }
+
     messages = [
         {
             "role": "system",
-            "content": (PROMPT_DIR / "system_prompt_llm_only.md").read_text(encoding="utf-8"),
+            "content": load_prompt("system_prompt_llm_only.md"),
         },
         {
             "role": "user",
@@ -209,32 +836,24 @@ def run_llm_only(
                         "to the DifferenceReport schema."
                     ),
                 },
-                {
-                    "type": "file",
-                    "file": {
-                        "file_data": _pdf_to_data_url(pdf_path_a),
-                        "filename": Path(pdf_path_a).name,
-                    },
-                },
-                {
-                    "type": "file",
-                    "file": {
-                        "file_data": _pdf_to_data_url(pdf_path_b),
-                        "filename": Path(pdf_path_b).name,
-                    },
-                },
+                _file_part(pdf_path_a),
+                _file_part(pdf_path_b),
             ],
         },
     ]
 
     logging.info("Running llm-only pipeline")
     client = get_openai_client()
-    completion = client.beta.chat.completions.parse(
-        model=MODEL,
-        temperature=0,
-        messages=messages,
-        response_format=DifferenceReportWithInputs,
-    )
+    with metrics.stage("compare"):
+        completion = call_with_retries(
+            lambda: client.beta.chat.completions.parse(
+                model=MODEL,
+                temperature=TEMPERATURE,
+                messages=messages,
+                response_format=DifferenceReportWithInputs,
+            ),
+            kind="compare_pdfs",
+        )
 
     msg = completion.choices[0].message
     diff_report: DifferenceReportWithInputs = msg.parsed
@@ -1,14 +1,43 @@
 """Module for preprocessing PDF files for LLM-based analysis."""
 
+import importlib.metadata
 import logging
+import os
 import re
-from difflib import unified_diff
-
-from pymupdf4llm import to_markdown
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Iterator
 
+from compair import metrics
+from compair.cache import get_cache, hash_file, make_key
+from compair.clauses import diff_clauses
+from compair.diffing import DiffEngine, unified_diff_lines
 from compair.models import DiffHunk
 
-__all__ = ["cleanup_markdown", "diff_texts", "get_markdown_from_pdf", "parse_pdf_to_markdown"]
+# pymupdf and pymupdf4llm are imported where PDFs are parsed, so cached markdown and diffing
+# of text do not pay for loading them
+if TYPE_CHECKING:
+    from pymupdf4llm import IdentifyHeaders
+
+__all__ = [
+    "MarkdownNormalizer",
+    "cleanup_markdown",
+    "diff_texts",
+    "estimate_tokens",
+    "get_markdown_from_pdf",
+    "get_markdown_from_pdfs",
+    "markdown_key",
+    "parse_pdf_to_markdown",
+    "parse_pdfs_to_markdown",
+]
+
+CHARS_PER_TOKEN = 4
+
+# Bump whenever ``cleanup_markdown`` changes its output, to invalidate cached markdown
+CLEANUP_VERSION = "1"
+MARKDOWN_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Smallest page range worth handing to a separate worker process
+MIN_PAGES_PER_TASK = 8
 
 
 def parse_pdf_to_markdown(file_path: str) -> str:
@@ -26,12 +55,136 @@ def parse_pdf_to_markdown(file_path: str) -> str:
     if not isinstance(file_path, str) or not file_path.strip():
         raise ValueError("file_path must be a non-empty string")
 
+    from pymupdf4llm import to_markdown
+
     logging.info(f"Parsing PDF to markdown: {file_path}")
     markdown_text = to_markdown(file_path)
     logging.info(f"Parsed PDF '{file_path}' to markdown with {len(markdown_text)} characters")
     return markdown_text
 
 
+def _parse_pages_to_markdown(file_path: str, pages: list[int], hdr_info: "IdentifyHeaders") -> str:
+    from pymupdf4llm import to_markdown
+
+    return to_markdown(file_path, pages=pages, hdr_info=hdr_info)
+
+
+def _worker_count(max_workers: int | None) -> int:
+    if max_workers is None:
+        return os.cpu_count() or 1
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+    return max_workers
+
+
+def _iter_markdown_chunks(file_paths: list[str], max_workers: int) -> Iterator[tuple[int, str]]:
+    # yields (index of the file, markdown of the next page range of that file) in document and
+    # page order; arguments are validated by the callers, as a generator would raise late
+    if max_workers == 1 or not file_paths:
+        for i, file_path in enumerate(file_paths):
+            yield i, parse_pdf_to_markdown(file_path)
+        return
+
+    import pymupdf
+    from pymupdf4llm import IdentifyHeaders
+
+    page_counts = []
+    hdr_infos = []
+    for file_path in file_paths:
+        with pymupdf.open(file_path) as doc:
+            page_counts.append(doc.page_count)
+            # as in ``to_markdown``, form fields and annotations become page content first
+            if doc.is_form_pdf or (doc.is_pdf and doc.has_annots()):
+                doc.bake()
+            hdr_infos.append(IdentifyHeaders(doc))
+
+    pages_per_task = max(MIN_PAGES_PER_TASK, -(-sum(page_counts) // max_workers))
+    tasks = [
+        (i, list(range(start, min(start + pages_per_task, page_count))))
+        for i, page_count in enumerate(page_counts)
+        for start in range(0, page_count, pages_per_task)
+    ]
+    logging.info(
+        f"Parsing {len(file_paths)} PDFs ({sum(page_counts)} pages) to markdown in "
+        f"{len(tasks)} tasks with up to {max_workers} worker processes"
+    )
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks) or 1)) as executor:
+        futures = [
+            executor.submit(_parse_pages_to_markdown, file_paths[i], pages, hdr_infos[i])
+            for i, pages in tasks
+        ]
+        # chunks are handed out while later page ranges are still being parsed
+        for (i, _), future in zip(tasks, futures):
+            yield i, future.result()
+
+
+def parse_pdfs_to_markdown(file_paths: list[str], max_workers: int | None = None) -> list[str]:
+    """Parse several PDF files to markdown in parallel worker processes.
+
+    All documents are parsed at the same time, and documents with many pages are split into
+    page ranges that are extracted by separate workers and stitched back together in page
+    order. Header levels are detected once per document over all pages, after baking form
+    fields and annotations into the pages like ``to_markdown`` does, and shared with the
+    workers, so the result is identical to ``parse_pdf_to_markdown`` for every file.
+
+    Args:
+        file_paths: Paths to the PDF files on disk.
+        max_workers: Maximum number of worker processes. Defaults to the number of CPUs;
+            ``1`` parses all files sequentially in the current process.
+
+    Returns:
+        The extracted markdown texts in the order of ``file_paths``.
+
+    Raises:
+        ValueError: If any path is not a non-empty string or ``max_workers`` is smaller than 1.
+    """
+    if any(not isinstance(file_path, str) or not file_path.strip() for file_path in file_paths):
+        raise ValueError("file_path must be a non-empty string")
+
+    chunks: list[list[str]] = [[] for _ in file_paths]
+    for i, chunk in _iter_markdown_chunks(file_paths, _worker_count(max_workers)):
+        chunks[i].append(chunk)
+    markdown_texts = ["".join(doc_chunks) for doc_chunks in chunks]
+    for file_path, markdown_text in zip(file_paths, markdown_texts):
+        logging.info(f"Parsed PDF '{file_path}' to markdown with {len(markdown_text)} characters")
+    return markdown_texts
+
+
+# Compiled once, as ``cleanup_markdown`` runs on whole documents
+_LINE_ENDING_RE = re.compile(r"\r\n?")
+_PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+_WHITESPACE_RE = re.compile(r"\s{2,}|\n")
+_TRAILING_BLANKS_RE = re.compile(r"[ \t]+$", re.MULTILINE)
+_UNUSUAL_WHITESPACE_RE = re.compile(r"[^\S \n]")
+_UNUSUAL_ASCII_WHITESPACE = "\t\x0b\x0c\x1c\x1d\x1e\x1f"
+CODE_FENCE = "```"
+
+
+def _has_plain_whitespace(text: str) -> bool:
+    if text.isascii():
+        return not any(char in text for char in _UNUSUAL_ASCII_WHITESPACE)
+    return _UNUSUAL_WHITESPACE_RE.search(text) is None
+
+
+def _normalize_paragraphs(text: str) -> str:
+    # ``text`` only has "\n" line endings
+    paragraphs = _PARAGRAPH_BREAK_RE.split(text)
+    if CODE_FENCE not in text and _has_plain_whitespace(text):
+        # with only spaces and newlines, every whitespace run collapses to one space
+        return "\n".join(filter(None, (" ".join(para.split()) for para in paragraphs)))
+
+    # paragraphs fenced as code keep their line breaks and spacing, and a single whitespace
+    # character other than a space or newline is kept within a paragraph
+    normalized_paragraphs = []
+    for para in paragraphs:
+        stripped = para.strip()
+        if stripped.startswith(CODE_FENCE) and stripped.endswith(CODE_FENCE):
+            normalized_paragraphs.append(_TRAILING_BLANKS_RE.sub("", para))
+        elif stripped:
+            normalized_paragraphs.append(_WHITESPACE_RE.sub(" ", stripped))
+    return "\n".join(normalized_paragraphs)
+
+
 def cleanup_markdown(markdown_text: str) -> str:
     """Clean-up markdown extracted from PDFs to reduce spurious diffs.
 
@@ -40,6 +193,11 @@ def cleanup_markdown(markdown_text: str) -> str:
     - Collapse multiple spaces to a single space within lines
     - Trim trailing whitespace on lines
 
+    Paragraphs that start and end with a code fence are kept as they are, apart from trailing
+    whitespace. Paragraphs are split with precompiled patterns, and text with only spaces and
+    newlines as whitespace, which is typical for PDF extractions, is collapsed with
+    ``str.split`` instead of regular expressions.
+
     Args:
         markdown_text: Markdown string extracted from a PDF.
 
@@ -53,38 +211,92 @@ def cleanup_markdown(markdown_text: str) -> str:
         raise ValueError("markdown_text must be a string")
 
     logging.info(f"Normalizing markdown: input length={len(markdown_text)} characters")
-    text = markdown_text.replace("\r\n", "\n").replace("\r", "\n")
-
-    # Split into paragraphs separated by blank lines, normalize each paragraph by
-    # replacing internal single newlines with spaces, preserving code fences heuristically.
-
-    paragraphs = re.split(r"\n\s*\n", text)
-
-    normalized_paragraphs = []
-    for para in paragraphs:
-        if para.strip().startswith("```") and para.strip().endswith("```"):
-            normalized_paragraphs.append(para)
-            continue
-
-        collapsed = re.sub(r"\n+", " ", para)
-        collapsed = re.sub(r"\s{2,}", " ", collapsed)
-        collapsed = collapsed.strip()
-        normalized_paragraphs.append(collapsed)
-
-    non_empty_paragraphs = [p for p in normalized_paragraphs if p]
-    normalized = "\n".join(non_empty_paragraphs)
-    normalized = re.sub(r"[ \t]+$", "", normalized, flags=re.MULTILINE)
+    text = _LINE_ENDING_RE.sub("\n", markdown_text) if "\r" in markdown_text else markdown_text
+    normalized = _normalize_paragraphs(text)
     logging.info(f"Cleaned-up markdown: output length={len(normalized)} characters")
     return normalized
 
 
-def diff_texts(text_a: str, text_b: str, n_context_lines: int = 3) -> list[DiffHunk]:
+class MarkdownNormalizer:
+    """Incremental ``cleanup_markdown`` over consecutive chunks of one document.
+
+    Chunks can be split anywhere, e.g. at page boundaries as pages are parsed. Every paragraph
+    that a chunk completes is normalized right away, so only the unfinished last paragraph is
+    buffered, and ``finish`` returns the same text as ``cleanup_markdown`` on all chunks joined.
+    """
+
+    def __init__(self) -> None:
+        self._pending = ""
+        self._carriage_return = False
+        self._parts: list[str] = []
+
+    def feed(self, chunk: str) -> None:
+        """Add the next chunk of the document.
+
+        Args:
+            chunk: Markdown text continuing the chunks fed before.
+
+        Raises:
+            ValueError: If ``chunk`` is not a string.
+        """
+        if not isinstance(chunk, str):
+            raise ValueError("chunk must be a string")
+        if self._carriage_return:
+            chunk = "\r" + chunk
+        # a trailing "\r" may be the first half of a "\r\n" split across chunks
+        self._carriage_return = chunk.endswith("\r")
+        if self._carriage_return:
+            chunk = chunk[:-1]
+        if "\r" in chunk:
+            chunk = _LINE_ENDING_RE.sub("\n", chunk)
+
+        text = self._pending + chunk
+        # the buffered paragraph has no break before its trailing whitespace
+        cut = None
+        for match in _PARAGRAPH_BREAK_RE.finditer(text, len(self._pending.rstrip())):
+            cut = match.start()
+        if not cut:
+            self._pending = text
+            return
+        self._add(text[:cut])
+        self._pending = text[cut:]
+
+    def finish(self) -> str:
+        """Normalize the buffered rest of the document.
+
+        Returns:
+            The cleaned-up markdown of all chunks.
+        """
+        self._add(self._pending + "\n" * self._carriage_return)
+        self._pending = ""
+        self._carriage_return = False
+        normalized = "\n".join(self._parts)
+        self._parts = []
+        logging.info(f"Cleaned-up markdown: output length={len(normalized)} characters")
+        return normalized
+
+    def _add(self, text: str) -> None:
+        normalized = _normalize_paragraphs(text)
+        if normalized:
+            self._parts.append(normalized)
+
+
+def diff_texts(
+    text_a: str,
+    text_b: str,
+    n_context_lines: int = 3,
+    engine: DiffEngine = "difflib",
+    align_clauses: bool = False,
+) -> list[DiffHunk]:
     """Compute a unified diff between two markdown strings.
 
     Args:
         text_a: Text parsed from the first PDF.
         text_b: Text parsed from the second PDF.
         n_context_lines: Number of context lines to include in the diff.
+        engine: The diff engine to use, see ``compair.diffing``.
+        align_clauses: Whether to diff within clauses aligned by their identifiers and set each
+            hunk's ``location``, see ``compair.clauses``.
 
     Returns:
         A list of ``DiffHunk`` objects representing the differences between ``text_a`` and ``text_b``.
@@ -99,31 +311,118 @@ def diff_texts(text_a: str, text_b: str, n_context_lines: int = 3) -> list[DiffH
     lines_b = text_b.splitlines()
 
     logging.info(
-        f"Computing unified diff: len(A)={len(lines_a)} lines, len(B)={len(lines_b)} lines, context={n_context_lines}"
+        f"Computing unified diff: len(A)={len(lines_a)} lines, len(B)={len(lines_b)} lines, context={n_context_lines}, engine={engine}, align_clauses={align_clauses}"
     )
-    diff_lines = list(unified_diff(lines_a, lines_b, lineterm="", n=n_context_lines))
-    hunks = DiffHunk.from_unified_diff_lines(diff_lines[2:])
+    with metrics.stage("diff"):
+        if align_clauses:
+            hunks = diff_clauses(lines_a, lines_b, n=n_context_lines, engine=engine)
+        else:
+            diff_lines = unified_diff_lines(lines_a, lines_b, n=n_context_lines, engine=engine)
+            hunks = DiffHunk.from_unified_diff_lines(diff_lines)
     logging.info(f"Unified diff produced {len(hunks)} hunks")
     return hunks
 
 
-def get_markdown_from_pdf(pdf_path: str) -> str:
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in ``text`` without calling a tokenizer.
+
+    Uses the common rule of thumb of roughly four characters per token for English text,
+    which is accurate enough for budgeting request sizes.
+
+    Args:
+        text: The text to estimate.
+
+    Returns:
+        The estimated number of tokens, at least 1 for non-empty text.
+    """
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def markdown_key(pdf_path: str) -> str:
+    """Return the key identifying the cleaned markdown of a PDF file.
+
+    Args:
+        pdf_path: Path to the PDF file.
+
+    Returns:
+        A hash over the PDF content, the ``pymupdf4llm`` version and ``CLEANUP_VERSION``.
+    """
+    # read from the package metadata, which does not import pymupdf4llm
+    pymupdf4llm_version = importlib.metadata.version("pymupdf4llm")
+    return make_key(hash_file(pdf_path), pymupdf4llm_version, CLEANUP_VERSION)
+
+
+def get_markdown_from_pdf(pdf_path: str, use_cache: bool = True) -> str:
     """Get the markdown text from a PDF file.
 
+    Results are cached on disk, keyed by the PDF content hash, the ``pymupdf4llm`` version and
+    ``CLEANUP_VERSION``, so a cache hit skips parsing and clean-up entirely.
+
     Args:
         pdf_path: Path to the PDF file.
+        use_cache: Whether to read from and write to the markdown cache.
 
     Returns:
         Cleaned markdown extracted from the PDF file.
+    """
+    return get_markdown_from_pdfs([pdf_path], use_cache=use_cache, max_workers=1)[0]
+
+
+def get_markdown_from_pdfs(
+    pdf_paths: list[str], use_cache: bool = True, max_workers: int | None = 1
+) -> list[str]:
+    """Get the markdown texts from several PDF files, parsing cache misses in parallel.
+
+    Parsed page ranges are fed to a ``MarkdownNormalizer`` per document as they arrive, so
+    clean-up overlaps with parsing instead of running on the whole documents at the end.
+
+    Args:
+        pdf_paths: Paths to the PDF files.
+        use_cache: Whether to read from and write to the markdown cache.
+        max_workers: Maximum number of worker processes for parsing, see
+            ``parse_pdfs_to_markdown``.
+
+    Returns:
+        Cleaned markdown extracted from each PDF file, in the order of ``pdf_paths``.
 
     Raises:
-        ValueError: If the provided path is invalid.
+        ValueError: If any of the provided paths is invalid or ``max_workers`` is smaller than 1.
     """
-    if not isinstance(pdf_path, str) or not pdf_path.strip():
+    if any(not isinstance(pdf_path, str) or not pdf_path.strip() for pdf_path in pdf_paths):
         raise ValueError("pdf_path must be a non-empty string")
-
-    logging.info(f"Extracting markdown from PDF: {pdf_path}")
-    text = parse_pdf_to_markdown(str(pdf_path))
-    cleaned = cleanup_markdown(text)
-    logging.info(f"Extracted and cleaned markdown from '{pdf_path}': {len(cleaned)} characters")
-    return cleaned
+    workers = _worker_count(max_workers)
+
+    cache = get_cache("markdown", MARKDOWN_CACHE_MAX_BYTES) if use_cache else None
+    results: dict[int, str] = {}
+    cache_keys: dict[int, str] = {}
+    if cache is not None:
+        for i, pdf_path in enumerate(pdf_paths):
+            cache_keys[i] = markdown_key(pdf_path)
+            cached = cache.get(cache_keys[i])
+            if cached is not None:
+                logging.info(f"Loaded cached markdown for '{pdf_path}'")
+                results[i] = cached.decode("utf-8")
+
+    pending = [i for i in range(len(pdf_paths)) if i not in results]
+    for pdf_path in (pdf_paths[i] for i in pending):
+        logging.info(f"Extracting markdown from PDF: {pdf_path}")
+    # page ranges are cleaned up as they arrive, while the workers parse the next ones
+    normalizers = [MarkdownNormalizer() for _ in pending]
+    chunks = _iter_markdown_chunks([pdf_paths[i] for i in pending], workers)
+    while True:
+        with metrics.stage("parse"):
+            item = next(chunks, None)
+        if item is None:
+            break
+        with metrics.stage("cleanup"):
+            normalizers[item[0]].feed(item[1])
+    for i, normalizer in zip(pending, normalizers):
+        with metrics.stage("cleanup"):
+            cleaned = normalizer.finish()
+        if cache is not None:
+            cache.set(cache_keys[i], cleaned.encode("utf-8"))
+        logging.info(
+            f"Extracted and cleaned markdown from '{pdf_paths[i]}': {len(cleaned)} characters"
+        )
+        results[i] = cleaned
+    return [results[i] for i in range(len(pdf_paths))]
@@ -0,0 +1,87 @@
+"""Module for classifying formatting-only diff hunks with local rules instead of the LLM.
+
+PDF extraction and re-typesetting produce many hunks whose text differs only in whitespace,
+markdown markup, hyphenation at line breaks, casing or punctuation. ``classify_formatting``
+compares both sides of a hunk after increasingly lenient normalizations and returns a
+"Formatting" classification as soon as they agree. Later stages ignore more, so they come with
+a lower confidence.
+"""
+
+import re
+import unicodedata
+from typing import Callable, List, Optional, Tuple
+
+from compair.models import ChangeClassification, ChangeType, DiffHunk
+
+__all__ = ["classify_formatting"]
+
+# Words split at a line break, which clean-up joins to "pro- cessing", and soft hyphens inserted
+# by the PDF layout
+_HYPHENATION_RE = re.compile(r"(?<=[^\W\d_])[-\u00ad]\s+(?=[^\W\d_])|\u00ad")
+# Markdown emphasis, code, heading, quote, list and table markup, and horizontal rules
+_MARKUP_RE = re.compile(r"[*_`~|#>]+|^\s*[-+]\s+|^\s*-{3,}\s*$", re.MULTILINE)
+# Punctuation that does not touch a digit; "1.000", "3,5" or "10:00" keep theirs. Apostrophes
+# ("Controller's") and brackets ("(excluding backups)") can change the meaning and are kept.
+_PUNCTUATION_RE = re.compile(r"(?<![0-9])[.,;:!?\"“”–—-](?![0-9])")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _without_whitespace(text: str) -> str:
+    # runs collapse to a single space, so joining words ("a part", "apart") is not ignored
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def _without_markup(text: str) -> str:
+    return _without_whitespace(_MARKUP_RE.sub("", _HYPHENATION_RE.sub("", text)))
+
+
+def _without_case(text: str) -> str:
+    return _without_markup(text).casefold()
+
+
+def _without_punctuation(text: str) -> str:
+    return _without_whitespace(_PUNCTUATION_RE.sub("", _without_case(text)))
+
+
+# Normalization stages from strict to lenient with the confidence of a match at that stage
+_STAGES: List[Tuple[Callable[[str], str], float, str]] = [
+    (_without_whitespace, 0.99, "Only whitespace or line breaks changed."),
+    (_without_markup, 0.95, "Only markdown formatting or hyphenation at line breaks changed."),
+    (_without_case, 0.9, "Only letter casing changed."),
+    (_without_punctuation, 0.8, "Only punctuation changed."),
+]
+
+
+def classify_formatting(diff_hunk: DiffHunk) -> Optional[ChangeClassification]:
+    """Classify a hunk as "Formatting" if its text only differs in presentation.
+
+    Both sides of the hunk are compared after ignoring, in this order, the amount of whitespace
+    and line breaks, markdown markup and hyphenation, letter casing, and punctuation that is not
+    adjacent to a digit, apart from apostrophes and brackets. Numbers, currency and percent
+    signs and all words, including where words are split, must be unchanged.
+
+    Args:
+        diff_hunk: The hunk to classify.
+
+    Returns:
+        A locally decided "Formatting" classification whose confidence depends on how much had
+        to be ignored, or ``None`` if the hunk changes the text and needs the LLM.
+    """
+    old_text = diff_hunk.old_excerpt or ""
+    new_text = diff_hunk.new_excerpt or ""
+    change_type: ChangeType = "modified"
+    if not old_text:
+        change_type = "added"
+    elif not new_text:
+        change_type = "removed"
+
+    for normalize, confidence, summary in _STAGES:
+        if normalize(old_text) == normalize(new_text):
+            return ChangeClassification(
+                change_type=change_type,
+                category="Formatting",
+                confidence=confidence,
+                summary=summary,
+                locally_decided=True,
+            )
+    return None
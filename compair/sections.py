@@ -0,0 +1,89 @@
+"""Module for splitting two documents into aligned section pairs of bounded size.
+
+Long documents are compared section by section in chunked llm-heavy mode. Sections are cut only
+at lines that the line diff matched between both documents, so every change falls completely
+inside one section pair and the sections of A and B cover the same content.
+"""
+
+import logging
+from itertools import accumulate
+from typing import List, Sequence
+
+from pydantic import BaseModel, Field
+
+from compair.diffing import DiffEngine, get_opcodes
+from compair.preprocessing import CHARS_PER_TOKEN
+
+__all__ = ["SectionPair", "split_aligned_sections"]
+
+
+class SectionPair(BaseModel):
+    start_line_a: int = Field(description="0-based index of the first line in document A.")
+    end_line_a: int = Field(description="0-based index after the last line in document A.")
+    start_line_b: int = Field(description="0-based index of the first line in document B.")
+    end_line_b: int = Field(description="0-based index after the last line in document B.")
+    identical: bool = Field(description="Whether both sections have the same text.")
+
+
+def split_aligned_sections(
+    lines_a: Sequence[str],
+    lines_b: Sequence[str],
+    token_budget: int,
+    engine: DiffEngine = "difflib",
+) -> List[SectionPair]:
+    """Split two documents into consecutive section pairs at lines matched by the line diff.
+
+    Sections are grown greedily and cut at the last matched line boundary before the estimated
+    tokens of both sides together exceed ``token_budget``. A section only exceeds the budget if
+    a single changed region is larger than the budget on its own.
+
+    Args:
+        lines_a: Lines of the first document.
+        lines_b: Lines of the second document.
+        token_budget: Maximum estimated number of tokens of both sides of a section pair.
+        engine: The line diff engine used to find matched lines.
+
+    Returns:
+        Section pairs covering both documents in order.
+
+    Raises:
+        ValueError: If ``token_budget`` is smaller than 1.
+    """
+    if token_budget < 1:
+        raise ValueError("token_budget must be at least 1")
+
+    # Prefix sums of characters, counting the newline of every line
+    chars_a = [0, *accumulate(len(line) + 1 for line in lines_a)]
+    chars_b = [0, *accumulate(len(line) + 1 for line in lines_b)]
+    max_chars = token_budget * CHARS_PER_TOKEN
+
+    cuts = [(0, 0)]
+    last_boundary = (0, 0)
+    for tag, i1, i2, j1, j2 in get_opcodes(lines_a, lines_b, engine):
+        if tag != "equal":
+            continue
+        for offset in range(i2 - i1 + 1):
+            i, j = i1 + offset, j1 + offset
+            cut_i, cut_j = cuts[-1]
+            size = chars_a[i] - chars_a[cut_i] + chars_b[j] - chars_b[cut_j]
+            if size > max_chars and last_boundary != cuts[-1]:
+                cuts.append(last_boundary)
+            last_boundary = (i, j)
+    if cuts[-1] != (len(lines_a), len(lines_b)):
+        cuts.append((len(lines_a), len(lines_b)))
+
+    sections = [
+        SectionPair(
+            start_line_a=start_a,
+            end_line_a=end_a,
+            start_line_b=start_b,
+            end_line_b=end_b,
+            identical=lines_a[start_a:end_a] == lines_b[start_b:end_b],
+        )
+        for (start_a, start_b), (end_a, end_b) in zip(cuts, cuts[1:])
+    ]
+    logging.info(
+        f"Split documents into {len(sections)} aligned sections "
+        f"({sum(not section.identical for section in sections)} with changes)"
+    )
+    return sections
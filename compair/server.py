@@ -0,0 +1,395 @@
+"""Module for running comparisons as jobs behind a local HTTP service.
+
+The service keeps one process alive, so parsed documents, caches and the pooled API client stay
+warm across requests. Comparisons are submitted as jobs, run on a worker pool and their reports
+are written to a result directory. Endpoints (all JSON):
+
+- ``POST /jobs`` with ``{"file1": ..., "file2": ..., "options": [...]}`` queues a job and
+  returns its status immediately. ``options`` are CLI analysis options, e.g.
+  ``["-a", "llm-heavy"]``; missing files, files outside the root directory and invalid options
+  are rejected with status 400.
+- ``GET /jobs`` lists all jobs, ``GET /jobs/<id>`` returns the status of one job.
+- ``GET /jobs/<id>/result`` returns the finished report.
+- ``GET /jobs/<id>/stream`` streams the report as NDJSON while the job runs, in the format
+  written by ``compair -f ndjson``.
+
+Reports contain the text of the compared files, so browsers may only talk to the service from
+the origins passed to ``make_server``, e.g. the web viewer. Requests with any other ``Origin``
+header are rejected with status 403; clients without one, such as ``curl``, are not affected.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+
+from compair.models import Change, DifferenceReport, DifferenceReportWithInputs
+
+__all__ = ["JobInfo", "JobRequest", "JobService", "make_server"]
+
+JobStatus = Literal["queued", "running", "done", "failed"]
+JobRunner = Callable[[str, str, List[str]], Tuple[str, str, Iterable[Change]]]
+# Checks the options of a job when it is submitted and raises ``ValueError`` if they are invalid
+OptionsValidator = Callable[[List[str]], None]
+
+
+class JobRequest(BaseModel):
+    file1: str = Field(description="Path to the first file to compare, on the server.")
+    file2: str = Field(description="Path to the second file to compare, on the server.")
+    options: List[str] = Field(
+        default_factory=list, description="CLI analysis options, e.g. ['-a', 'llm-heavy']."
+    )
+
+
+class JobInfo(BaseModel):
+    job_id: str
+    status: JobStatus
+    file1: str
+    file2: str
+    options: List[str] = Field(default_factory=list)
+    error: Optional[str] = Field(default=None, description="Error message of a failed job.")
+    changes: int = Field(default=0, description="Number of changes produced so far.")
+    submitted_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class _Job:
+    def __init__(self, info: JobInfo) -> None:
+        self.info = info
+        self.documents: Optional[Tuple[str, str]] = None
+        self.changes: List[Change] = []
+        self.condition = threading.Condition()
+
+
+class JobService:
+    """Queue of comparison jobs with a worker pool and an on-disk result store.
+
+    If ``validate_options`` is given, the options of every job are checked on submission, so
+    invalid options are rejected right away instead of failing the job later. If ``root_dir`` is
+    given, only files below it can be compared, and relative paths are resolved against it.
+    Every finished job writes ``<job_id>.json`` (the report) and ``<job_id>.job.json`` (its
+    status) to ``results_dir``. Jobs found there are loaded on start, so results survive a
+    restart of the service.
+    """
+
+    def __init__(
+        self,
+        run: JobRunner,
+        results_dir: str | Path,
+        workers: int = 2,
+        validate_options: Optional[OptionsValidator] = None,
+        root_dir: str | Path | None = None,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.run = run
+        self.validate_options = validate_options
+        self.root_dir = Path(root_dir).resolve() if root_dir is not None else None
+        self.results_dir = Path(results_dir)
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        self._jobs: Dict[str, _Job] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="compair-job")
+        for path in self.results_dir.glob("*.job.json"):
+            info = JobInfo.model_validate_json(path.read_text(encoding="utf-8"))
+            self._jobs[info.job_id] = _Job(info)
+        logging.info(f"Job service started with {workers} workers, {len(self._jobs)} stored jobs")
+
+    def submit(self, request: JobRequest) -> JobInfo:
+        """Queue a comparison job.
+
+        Args:
+            request: The files to compare and the analysis options.
+
+        Returns:
+            The status of the queued job.
+
+        Raises:
+            ValueError: If one of the files does not exist or is outside ``root_dir``, or the
+                options are invalid.
+        """
+        file_paths = []
+        for file_path in (request.file1, request.file2):
+            path = Path(file_path)
+            if self.root_dir is not None:
+                # resolving symlinks and ".." first, so neither can escape the root
+                path = (self.root_dir / path).resolve()
+                if not path.is_relative_to(self.root_dir):
+                    raise ValueError(f"File outside of the root directory: {file_path}")
+            if not path.is_file():
+                raise ValueError(f"File not found: {file_path}")
+            file_paths.append(str(path))
+        if self.validate_options is not None:
+            self.validate_options(request.options)
+        info = JobInfo(
+            job_id=uuid.uuid4().hex,
+            status="queued",
+            file1=file_paths[0],
+            file2=file_paths[1],
+            options=request.options,
+            submitted_at=time.time(),
+        )
+        job = _Job(info)
+        with self._lock:
+            self._jobs[info.job_id] = job
+        self._executor.submit(self._run_job, job)
+        logging.info(f"Queued job '{info.job_id}' for {request.file1} and {request.file2}")
+        return info.model_copy()
+
+    def _run_job(self, job: _Job) -> None:
+        with job.condition:
+            job.info.status = "running"
+            job.info.started_at = time.time()
+        try:
+            document_a, document_b, changes = self.run(
+                job.info.file1, job.info.file2, job.info.options
+            )
+            with job.condition:
+                job.documents = (document_a, document_b)
+                job.condition.notify_all()
+            for change in changes:
+                with job.condition:
+                    job.changes.append(change)
+                    job.info.changes = len(job.changes)
+                    job.condition.notify_all()
+            report = DifferenceReportWithInputs(
+                document_a=document_a,
+                document_b=document_b,
+                difference_report=DifferenceReport(
+                    changes=sorted(job.changes, key=lambda change: int(change.change_id or 0))
+                ),
+            )
+            self._result_path(job.info.job_id).write_text(
+                json.dumps(report.model_dump(), indent=2, ensure_ascii=False), encoding="utf-8"
+            )
+            status: JobStatus = "done"
+            error = None
+            logging.info(f"Job '{job.info.job_id}' finished with {len(job.changes)} changes")
+        except Exception as e:
+            logging.exception(f"Job '{job.info.job_id}' failed")
+            status, error = "failed", repr(e)
+        with job.condition:
+            job.info.status = status
+            job.info.error = error
+            job.info.finished_at = time.time()
+            (self.results_dir / f"{job.info.job_id}.job.json").write_text(
+                job.info.model_dump_json(), encoding="utf-8"
+            )
+            job.condition.notify_all()
+
+    def _result_path(self, job_id: str) -> Path:
+        return self.results_dir / f"{job_id}.json"
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        """Return the status of a job.
+
+        Args:
+            job_id: The id returned by ``submit``.
+
+        Returns:
+            A snapshot of the job's status, or ``None`` if the job is unknown.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        with job.condition:
+            return job.info.model_copy()
+
+    def list(self) -> List[JobInfo]:
+        """Return the status of all jobs.
+
+        Returns:
+            Snapshots of all known jobs, oldest first.
+        """
+        with self._lock:
+            job_ids = list(self._jobs)
+        infos = [info for info in (self.get(job_id) for job_id in job_ids) if info is not None]
+        return sorted(infos, key=lambda info: info.submitted_at)
+
+    def result(self, job_id: str) -> Optional[str]:
+        """Return the stored report of a finished job.
+
+        Args:
+            job_id: The id returned by ``submit``.
+
+        Returns:
+            The report as JSON text, or ``None`` if the job has no report.
+        """
+        path = self._result_path(job_id)
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+    def stream(self, job_id: str) -> Iterator[str]:
+        """Stream the report of a job as NDJSON records while it runs.
+
+        The first record holds both documents and every following record one change, in
+        completion order. Records of finished jobs are replayed from the result store.
+
+        Args:
+            job_id: The id returned by ``submit``.
+
+        Yields:
+            One JSON record per line, without the trailing newline.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        if job.documents is None and job.info.status == "done":
+            # loaded from the result store after a restart
+            report = DifferenceReportWithInputs.model_validate_json(self.result(job_id) or "")
+            job.documents = (report.document_a, report.document_b)
+            job.changes = report.difference_report.changes
+
+        sent = 0
+        head_sent = False
+        while True:
+            with job.condition:
+                job.condition.wait_for(
+                    lambda: (
+                        job.info.status in ("done", "failed")
+                        or (job.documents is not None and not head_sent)
+                        or len(job.changes) > sent
+                    )
+                )
+                documents = job.documents
+                new_changes = job.changes[sent:]
+                finished = job.info.status in ("done", "failed")
+            if documents is not None and not head_sent:
+                yield json.dumps(
+                    {"document_a": documents[0], "document_b": documents[1]}, ensure_ascii=False
+                )
+                head_sent = True
+            for change in new_changes:
+                yield change.model_dump_json()
+            sent += len(new_changes)
+            if finished:
+                return
+
+    def shutdown(self) -> None:
+        """Stop accepting jobs and wait for running jobs to finish."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: JobService
+    allow_origins: frozenset[str]
+
+    def log_message(self, format: str, *args: object) -> None:
+        logging.info(f"{self.address_string()} {format % args}")
+
+    def _send_headers(self, status: int, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        origin = self.headers.get("Origin")
+        if origin in self.allow_origins:
+            self.send_header("Access-Control-Allow-Origin", origin)
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+            self.send_header("Access-Control-Allow-Headers", "Content-Type")
+            self.send_header("Vary", "Origin")
+        self.end_headers()
+
+    def _reject_foreign_origin(self) -> bool:
+        # browsers send an Origin header with every cross-origin request; without this check
+        # any web page could queue comparisons of local files, even if it cannot read the reply
+        origin = self.headers.get("Origin")
+        if origin is None or origin in self.allow_origins:
+            return False
+        self._send_error(403, f"Origin not allowed: {origin}")
+        return True
+
+    def _send_json(self, status: int, body: str) -> None:
+        self._send_headers(status)
+        self.wfile.write(body.encode("utf-8"))
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send_json(status, json.dumps({"error": message}))
+
+    def do_OPTIONS(self) -> None:
+        if not self._reject_foreign_origin():
+            self._send_headers(204)
+
+    def do_POST(self) -> None:
+        if self._reject_foreign_origin():
+            return
+        if self.path.rstrip("/") != "/jobs":
+            self._send_error(404, "Not found")
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = JobRequest.model_validate_json(self.rfile.read(length))
+            info = self.service.submit(request)
+        except (ValidationError, ValueError) as e:
+            self._send_error(400, str(e))
+            return
+        self._send_json(202, info.model_dump_json())
+
+    def do_GET(self) -> None:
+        if self._reject_foreign_origin():
+            return
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        if parts == ["health"]:
+            self._send_json(200, json.dumps({"status": "ok"}))
+        elif parts == ["jobs"]:
+            infos = [info.model_dump() for info in self.service.list()]
+            self._send_json(200, json.dumps(infos))
+        elif len(parts) in (2, 3) and parts[0] == "jobs":
+            self._get_job(parts[1], parts[2] if len(parts) == 3 else None)
+        else:
+            self._send_error(404, "Not found")
+
+    def _get_job(self, job_id: str, resource: Optional[str]) -> None:
+        info = self.service.get(job_id)
+        if info is None:
+            self._send_error(404, f"Unknown job: {job_id}")
+        elif resource is None:
+            self._send_json(200, info.model_dump_json())
+        elif resource == "result":
+            result = self.service.result(job_id)
+            if result is None:
+                self._send_error(409, f"Job is {info.status}")
+            else:
+                self._send_json(200, result)
+        elif resource == "stream":
+            # HTTP/1.0 response without length, the connection closes after the last record
+            self._send_headers(200, "application/x-ndjson")
+            for record in self.service.stream(job_id):
+                self.wfile.write(record.encode("utf-8") + b"\n")
+                self.wfile.flush()
+        else:
+            self._send_error(404, "Not found")
+
+
+def make_server(
+    service: JobService,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    allow_origins: Collection[str] = (),
+) -> ThreadingHTTPServer:
+    """Create an HTTP server that exposes ``service``, one thread per connection.
+
+    Args:
+        service: The job service handling the requests.
+        host: Interface to bind to.
+        port: Port to bind to, ``0`` picks a free port.
+        allow_origins: Browser origins allowed to use the service, e.g.
+            ``"http://localhost:3000"`` for the web viewer. Requests from other origins are
+            rejected.
+
+    Returns:
+        The server; call ``serve_forever`` to start handling requests.
+    """
+    handler = type(
+        "CompairHandler",
+        (_Handler,),
+        {"service": service, "allow_origins": frozenset(allow_origins)},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
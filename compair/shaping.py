@@ -0,0 +1,257 @@
+"""Module for shaping diff hunks to a predictable token size before classification.
+
+A line diff with a fixed number of context lines yields hunks from single-word edits to
+multi-page rewrites. ``shape_hunks`` reshapes them with locally estimated token counts:
+
+- changed regions above ``max_tokens`` are split between lines, which are paragraphs in the
+  cleaned markdown, into roughly equal parts;
+- neighbouring regions at most ``MAX_MERGE_GAP`` unchanged lines apart are merged as long as
+  the result, including the lines between them, stays within ``target_tokens``;
+- every hunk gets one context line on each side and then more, alternating before and after,
+  until it reaches ``target_tokens`` or ``MAX_CONTEXT_LINES`` per side. Context never extends
+  into a neighbouring change.
+"""
+
+import logging
+import math
+from typing import List, NamedTuple, Optional, Sequence
+
+from compair.defaults import DEFAULT_MAX_HUNK_TOKENS, DEFAULT_TARGET_TOKENS
+from compair.diffing import Opcode, format_unified_groups
+from compair.models import DiffHunk
+from compair.preprocessing import estimate_tokens
+
+__all__ = ["DEFAULT_MAX_HUNK_TOKENS", "DEFAULT_TARGET_TOKENS", "shape_hunks"]
+
+MAX_MERGE_GAP = 3
+MAX_CONTEXT_LINES = 5
+
+
+class _Region(NamedTuple):
+    """0-based line ranges of one run of changed lines in both documents."""
+
+    i1: int
+    i2: int
+    j1: int
+    j2: int
+    location: Optional[str]
+
+
+def _regions(diff_hunk: DiffHunk) -> List[_Region]:
+    header = diff_hunk.hunk_header
+    # an empty range starts after the line given in the header, see ``diffing._format_range``
+    i = header.start_line_old - (header.end_line_old > header.start_line_old)
+    j = header.start_line_new - (header.end_line_new > header.start_line_new)
+    regions = []
+    start: Optional[tuple[int, int]] = None
+    for line in diff_hunk.unified_diff.splitlines()[1:]:
+        if line.startswith("-") or line.startswith("+"):
+            if start is None:
+                start = (i, j)
+            if line.startswith("-"):
+                i += 1
+            else:
+                j += 1
+            continue
+        if start is not None:
+            regions.append(_Region(start[0], i, start[1], j, diff_hunk.location))
+            start = None
+        i += 1
+        j += 1
+    if start is not None:
+        regions.append(_Region(start[0], i, start[1], j, diff_hunk.location))
+    return regions
+
+
+def _tokens(lines: Sequence[str]) -> int:
+    return sum(estimate_tokens(line) for line in lines)
+
+
+def _cut_points(tokens: List[int], parts: int) -> List[int]:
+    total = sum(tokens)
+    cuts = [0]
+    cumulative = 0
+    for index, count in enumerate(tokens):
+        cumulative += count
+        while len(cuts) < parts and cumulative >= len(cuts) * total / parts:
+            cuts.append(index + 1)
+    cuts.extend([len(tokens)] * (parts + 1 - len(cuts)))
+    return cuts
+
+
+def _split(
+    region: _Region, lines_a: Sequence[str], lines_b: Sequence[str], max_tokens: int
+) -> List[_Region]:
+    tokens_a = [estimate_tokens(line) for line in lines_a[region.i1 : region.i2]]
+    tokens_b = [estimate_tokens(line) for line in lines_b[region.j1 : region.j2]]
+    parts = math.ceil((sum(tokens_a) + sum(tokens_b)) / max_tokens)
+    if parts <= 1:
+        return [region]
+    # both sides are cut at the same fractions of their tokens, so rewritten paragraphs stay
+    # next to the paragraphs they replace; cuts fall between lines, so more parts may be needed
+    while True:
+        cuts_a = _cut_points(tokens_a, parts)
+        cuts_b = _cut_points(tokens_b, parts)
+        sizes = [
+            sum(tokens_a[cuts_a[k] : cuts_a[k + 1]]) + sum(tokens_b[cuts_b[k] : cuts_b[k + 1]])
+            for k in range(parts)
+        ]
+        if max(sizes) <= max_tokens or parts >= len(tokens_a) + len(tokens_b):
+            break
+        parts += 1
+    pieces = [
+        _Region(
+            region.i1 + cuts_a[k],
+            region.i1 + cuts_a[k + 1],
+            region.j1 + cuts_b[k],
+            region.j1 + cuts_b[k + 1],
+            region.location,
+        )
+        for k in range(parts)
+    ]
+    return [piece for piece in pieces if piece.i1 < piece.i2 or piece.j1 < piece.j2]
+
+
+def _region_tokens(region: _Region, lines_a: Sequence[str], lines_b: Sequence[str]) -> int:
+    return _tokens(lines_a[region.i1 : region.i2]) + _tokens(lines_b[region.j1 : region.j2])
+
+
+def _merge(
+    regions: List[_Region], lines_a: Sequence[str], lines_b: Sequence[str], target_tokens: int
+) -> List[List[_Region]]:
+    groups: List[List[_Region]] = []
+    group_tokens: List[int] = []
+    for region in regions:
+        tokens = _region_tokens(region, lines_a, lines_b)
+        if groups:
+            last = groups[-1][-1]
+            gap = region.i1 - last.i2
+            merged_tokens = group_tokens[-1] + _tokens(lines_a[last.i2 : region.i1]) + tokens
+            if (
+                0 <= gap <= MAX_MERGE_GAP
+                and region.j1 - last.j2 == gap
+                and merged_tokens <= target_tokens
+            ):
+                groups[-1].append(region)
+                group_tokens[-1] = merged_tokens
+                continue
+        groups.append([region])
+        group_tokens.append(tokens)
+    return groups
+
+
+def _with_context(
+    group: List[_Region],
+    before_limit: int,
+    after_limit: int,
+    lines_a: Sequence[str],
+    lines_b: Sequence[str],
+    target_tokens: int,
+) -> List[Opcode]:
+    first, last = group[0], group[-1]
+    tokens = sum(_region_tokens(region, lines_a, lines_b) for region in group)
+    tokens += sum(_tokens(lines_a[a.i2 : b.i1]) for a, b in zip(group, group[1:]))
+    before = min(1, before_limit)
+    after = min(1, after_limit)
+    tokens += _tokens(lines_a[first.i1 - before : first.i1]) + _tokens(
+        lines_a[last.i2 : last.i2 + after]
+    )
+    grown = True
+    while grown:
+        grown = False
+        if before < before_limit:
+            line_tokens = estimate_tokens(lines_a[first.i1 - before - 1])
+            if tokens + line_tokens <= target_tokens:
+                before += 1
+                tokens += line_tokens
+                grown = True
+        if after < after_limit:
+            line_tokens = estimate_tokens(lines_a[last.i2 + after])
+            if tokens + line_tokens <= target_tokens:
+                after += 1
+                tokens += line_tokens
+                grown = True
+
+    opcodes: List[Opcode] = []
+    if before:
+        opcodes.append(("equal", first.i1 - before, first.i1, first.j1 - before, first.j1))
+    for previous, region in zip([None, *group], group):
+        if previous is not None:
+            opcodes.append(("equal", previous.i2, region.i1, previous.j2, region.j1))
+        tag = "replace" if region.i1 < region.i2 and region.j1 < region.j2 else "delete"
+        if region.i1 == region.i2:
+            tag = "insert"
+        opcodes.append((tag, region.i1, region.i2, region.j1, region.j2))
+    if after:
+        opcodes.append(("equal", last.i2, last.i2 + after, last.j2, last.j2 + after))
+    return opcodes
+
+
+def shape_hunks(
+    lines_a: Sequence[str],
+    lines_b: Sequence[str],
+    diff_hunks: List[DiffHunk],
+    target_tokens: int = DEFAULT_TARGET_TOKENS,
+    max_tokens: int = DEFAULT_MAX_HUNK_TOKENS,
+) -> List[DiffHunk]:
+    """Split, merge and add context to diff hunks so their sizes approach a token budget.
+
+    Tokens are estimated locally with ``preprocessing.estimate_tokens``. Each hunk keeps the
+    ``location`` of the hunk its first change came from.
+
+    Args:
+        lines_a: Lines of the first document, as diffed.
+        lines_b: Lines of the second document, as diffed.
+        diff_hunks: Hunks of the diff between both documents with header line numbers relative
+            to ``lines_a`` and ``lines_b``, in document order.
+        target_tokens: Size up to which hunks are merged and context is added.
+        max_tokens: Size above which the changed lines of a hunk are split. A single line is
+            never split, so a hunk may still exceed it.
+
+    Returns:
+        The reshaped hunks in document order.
+
+    Raises:
+        ValueError: If ``target_tokens`` is smaller than 1 or larger than ``max_tokens``.
+    """
+    if not 1 <= target_tokens <= max_tokens:
+        raise ValueError("target_tokens must be at least 1 and at most max_tokens")
+
+    regions = [
+        piece
+        for diff_hunk in diff_hunks
+        for region in _regions(diff_hunk)
+        for piece in _split(region, lines_a, lines_b, max_tokens)
+    ]
+    groups = _merge(regions, lines_a, lines_b, target_tokens)
+    opcode_groups = []
+    for k, group in enumerate(groups):
+        first, last = group[0], group[-1]
+        previous_end = groups[k - 1][-1] if k else None
+        next_start = groups[k + 1][0] if k + 1 < len(groups) else None
+        before_limit = min(
+            MAX_CONTEXT_LINES,
+            first.i1 - (previous_end.i2 if previous_end else 0),
+            first.j1 - (previous_end.j2 if previous_end else 0),
+        )
+        after_limit = min(
+            MAX_CONTEXT_LINES,
+            (next_start.i1 if next_start else len(lines_a)) - last.i2,
+            (next_start.j1 if next_start else len(lines_b)) - last.j2,
+        )
+        opcode_groups.append(
+            _with_context(group, before_limit, after_limit, lines_a, lines_b, target_tokens)
+        )
+
+    shaped = DiffHunk.from_unified_diff_lines(
+        list(format_unified_groups(lines_a, lines_b, opcode_groups))
+    )
+    shaped = [
+        diff_hunk.model_copy(update={"location": group[0].location})
+        for diff_hunk, group in zip(shaped, groups)
+    ]
+    logging.info(
+        f"Shaped {len(diff_hunks)} hunks into {len(shaped)} hunks with a target of "
+        f"{target_tokens} and a maximum of {max_tokens} tokens"
+    )
+    return shaped
@@ -0,0 +1,82 @@
+"""Module for uploading input files once through the OpenAI Files API and reusing their ids.
+
+llm-only sends both PDFs with every request. Inlined as base64 data URLs they grow by a third
+and are uploaded again on every run, even when the same baseline document is compared over and
+over. ``upload_file`` uploads a file once, with an expiry, and caches the returned file id on
+disk, keyed by the SHA-256 of the file content and the API base URL. Later runs reference the
+cached id as long as it has not expired and the API still knows it.
+"""
+
+import logging
+import time
+from pathlib import Path
+
+from openai import NotFoundError
+from pydantic import BaseModel, Field
+
+from compair.cache import get_cache, hash_file, make_key
+from compair.client import call_with_retries, get_openai_client
+
+__all__ = ["DEFAULT_UPLOAD_TTL", "UploadedFile", "upload_file"]
+
+UPLOAD_CACHE_MAX_BYTES = 1024 * 1024
+# Files expire on the API after 30 days, the longest expiry it accepts
+DEFAULT_UPLOAD_TTL = 30 * 24 * 3600
+# Cached ids that expire within this many seconds are uploaded again instead
+EXPIRY_MARGIN = 3600
+UPLOAD_PURPOSE = "user_data"
+
+
+class UploadedFile(BaseModel):
+    file_id: str = Field(description="Id of the uploaded file.")
+    expires_at: int = Field(description="Unix time at which the API deletes the file.")
+
+
+def upload_file(
+    file_path: str | Path, ttl_seconds: int = DEFAULT_UPLOAD_TTL, use_cache: bool = True
+) -> str:
+    """Return the id of a file on the Files API, uploading the file only if needed.
+
+    Args:
+        file_path: Path to the file, e.g. a PDF to attach to a chat completion.
+        ttl_seconds: Seconds after which the API deletes a newly uploaded file, between one hour
+            and 30 days.
+        use_cache: Whether to reuse and store file ids in the on-disk upload cache.
+
+    Returns:
+        The file id to reference in requests.
+    """
+    client = get_openai_client()
+    cache = get_cache("uploads", UPLOAD_CACHE_MAX_BYTES) if use_cache else None
+    key = make_key(hash_file(file_path), str(client.base_url), UPLOAD_PURPOSE)
+
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        uploaded = UploadedFile.model_validate_json(cached)
+        if uploaded.expires_at - EXPIRY_MARGIN > time.time():
+            file_id = uploaded.file_id
+            try:
+                call_with_retries(
+                    lambda: client.files.retrieve(file_id), kind="upload_check", completion=False
+                )
+            except NotFoundError:
+                logging.warning(f"Uploaded file {file_id} no longer exists, uploading again")
+            else:
+                logging.info(f"Reusing uploaded file {file_id} for '{file_path}'")
+                return file_id
+
+    file_object = call_with_retries(
+        lambda: client.files.create(
+            file=Path(file_path),
+            purpose=UPLOAD_PURPOSE,
+            expires_after={"anchor": "created_at", "seconds": ttl_seconds},
+        ),
+        kind="upload",
+        completion=False,
+    )
+    logging.info(f"Uploaded '{file_path}' as file {file_object.id}")
+    if cache is not None:
+        expires_at = file_object.expires_at or file_object.created_at + ttl_seconds
+        uploaded = UploadedFile(file_id=file_object.id, expires_at=expires_at)
+        cache.set(key, uploaded.model_dump_json().encode("utf-8"))
+    return file_object.id
@@ -0,0 +1,93 @@
+"""Module for locating the changed words within the changed lines of diff hunks.
+
+``cleanup_markdown`` turns every paragraph into a single line, so a line diff reports a one-word
+edit as a whole paragraph replaced. ``word_spans`` splits both excerpts of a hunk into word,
+whitespace and punctuation tokens, diffs the tokens with one of the engines of
+``compair.diffing`` and returns every replaced, removed or inserted run of tokens as a
+``WordSpan``: character offsets into ``old_excerpt`` and ``new_excerpt``, where a removal has an
+empty range in the new excerpt and an insertion an empty range in the old one. Changes that are
+only separated by whitespace form one span. Offsets count Unicode code points, as Python's
+``str`` does.
+"""
+
+import logging
+import re
+from typing import List, Sequence
+
+from compair.diffing import DiffEngine, get_opcodes
+from compair.models import DiffHunk, WordSpan
+
+__all__ = ["add_word_spans", "word_spans"]
+
+# Runs of word characters, runs of whitespace and single other characters; together they cover
+# the whole text, so token boundaries map back to character offsets
+_TOKEN_RE = re.compile(r"\w+|\s+|[^\w\s]")
+
+
+def _offsets(tokens: Sequence[str]) -> List[int]:
+    offsets = [0]
+    for token in tokens:
+        offsets.append(offsets[-1] + len(token))
+    return offsets
+
+
+def word_spans(old_text: str, new_text: str, engine: DiffEngine = "histogram") -> List[WordSpan]:
+    """Find the changed words between two texts.
+
+    Args:
+        old_text: The old text, e.g. the old excerpt of a hunk.
+        new_text: The new text, e.g. the new excerpt of a hunk.
+        engine: The diff engine applied to the tokens, see ``compair.diffing``. The default
+            ``histogram`` anchors on rare words, so frequent words such as "the" do not split a
+            rewritten phrase into many small spans.
+
+    Returns:
+        The changed spans in text order.
+    """
+    old_tokens = _TOKEN_RE.findall(old_text)
+    new_tokens = _TOKEN_RE.findall(new_text)
+    old_offsets = _offsets(old_tokens)
+    new_offsets = _offsets(new_tokens)
+    spans: List[WordSpan] = []
+    gap_is_whitespace = False
+    for tag, i1, i2, j1, j2 in get_opcodes(old_tokens, new_tokens, engine=engine):
+        if tag == "equal":
+            gap_is_whitespace = all(token.isspace() for token in old_tokens[i1:i2])
+        elif spans and gap_is_whitespace:
+            # a rewritten phrase is one span, not one span per word
+            spans[-1].old_end, spans[-1].new_end = old_offsets[i2], new_offsets[j2]
+        else:
+            spans.append(
+                WordSpan(
+                    old_start=old_offsets[i1],
+                    old_end=old_offsets[i2],
+                    new_start=new_offsets[j1],
+                    new_end=new_offsets[j2],
+                )
+            )
+    return spans
+
+
+def add_word_spans(diff_hunks: Sequence[DiffHunk]) -> List[DiffHunk]:
+    """Set ``word_spans`` on every hunk that changes lines on both sides.
+
+    Hunks that only remove or only add lines change all of their words and keep
+    ``word_spans`` unset.
+
+    Args:
+        diff_hunks: The hunks to annotate.
+
+    Returns:
+        The hunks with ``word_spans`` set where applicable.
+    """
+    annotated = [
+        diff_hunk.model_copy(
+            update={"word_spans": word_spans(diff_hunk.old_excerpt, diff_hunk.new_excerpt)}
+        )
+        if diff_hunk.old_excerpt is not None and diff_hunk.new_excerpt is not None
+        else diff_hunk
+        for diff_hunk in diff_hunks
+    ]
+    n_spans = sum(len(diff_hunk.word_spans or []) for diff_hunk in annotated)
+    logging.info(f"Located {n_spans} changed word spans in {len(annotated)} hunks")
+    return annotated
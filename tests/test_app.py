@@ -0,0 +1,55 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from compair import app
+
+HEAVY_MODULES = ["dotenv", "openai", "pydantic", "pymupdf", "pymupdf4llm"]
+
+
+def _loaded_heavy_modules(argv: list[str]) -> list[str]:
+    script = (
+        "import json, sys\n"
+        f"sys.argv = {['compair', *argv]!r}\n"
+        "from compair.app import app\n"
+        "try:\n"
+        "    app()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_cli_help_and_argument_errors_do_not_import_the_pipelines() -> None:
+    assert _loaded_heavy_modules(["--help"]) == []
+    assert _loaded_heavy_modules(["batch", "--help"]) == []
+    assert _loaded_heavy_modules(["serve", "--help"]) == []
+    assert _loaded_heavy_modules(["only-one-file.pdf"]) == []
+
+
+@pytest.mark.parametrize(
+    "options", [["--unknown"], ["-a", "llm-medium"], ["--max-concurrency", "many"]]
+)
+def test_validate_job_options_rejects_invalid_options(options: list[str]) -> None:
+    parser = app._JobOptionsParser(prog="job options", add_help=False)
+    app._add_analysis_arguments(parser)
+    defaults = parser.parse_args([])
+
+    app._validate_job_options(parser, defaults, ["-a", "llm-heavy"])
+    with pytest.raises(ValueError):
+        app._validate_job_options(parser, defaults, options)
+
+
+def test_parse_workers_are_divided_among_concurrent_jobs(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(app.os, "cpu_count", lambda: 8)
+
+    assert app._parse_workers_per_job(None, 4) == 2
+    assert app._parse_workers_per_job(None, 16) == 1
+    assert app._parse_workers_per_job(None, 1) is None
+    assert app._parse_workers_per_job(3, 4) == 3
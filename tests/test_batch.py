@@ -0,0 +1,59 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from compair.batch import load_manifest, load_state, run_batch
+from compair.models import DifferenceReport, DifferenceReportWithInputs
+
+
+def _fake_report(file1: str, file2: str) -> DifferenceReportWithInputs:
+    return DifferenceReportWithInputs(
+        document_a=file1, document_b=file2, difference_report=DifferenceReport(changes=[])
+    )
+
+
+def test_load_manifest_csv_and_jsonl(tmp_path: Path) -> None:
+    (tmp_path / "pairs.csv").write_text("file1,file2,job_id\na.pdf,b.pdf,first\n", encoding="utf-8")
+    (tmp_path / "pairs.jsonl").write_text(
+        json.dumps({"file1": "a.pdf", "file2": "b.pdf"}) + "\n", encoding="utf-8"
+    )
+
+    csv_jobs = load_manifest(tmp_path / "pairs.csv")
+    jsonl_jobs = load_manifest(tmp_path / "pairs.jsonl")
+
+    assert csv_jobs[0].job_id == "first"
+    assert csv_jobs[0].file1 == str(tmp_path / "a.pdf")
+    # derived ids are stable across runs so the state file can be matched on resume
+    assert jsonl_jobs[0].job_id.startswith("a__b__")
+    assert jsonl_jobs[0].job_id == load_manifest(tmp_path / "pairs.jsonl")[0].job_id
+
+
+def test_load_manifest_rejects_duplicate_job_ids(tmp_path: Path) -> None:
+    manifest = tmp_path / "pairs.csv"
+    manifest.write_text("file1,file2,job_id\na.pdf,b.pdf,x\nc.pdf,d.pdf,x\n", encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        load_manifest(manifest)
+
+
+def test_run_batch_resumes_and_retries_failed_jobs(tmp_path: Path) -> None:
+    manifest = tmp_path / "pairs.csv"
+    manifest.write_text("file1,file2,job_id\na.pdf,b.pdf,ok\nc.pdf,d.pdf,flaky\n", encoding="utf-8")
+    jobs = load_manifest(manifest)
+    calls: list[str] = []
+
+    def flaky_run(file1: str, file2: str) -> DifferenceReportWithInputs:
+        calls.append(Path(file1).name)
+        if Path(file1).name == "c.pdf" and calls.count("c.pdf") == 1:
+            raise RuntimeError("API unavailable")
+        return _fake_report(file1, file2)
+
+    first = run_batch(jobs, flaky_run, output_dir=tmp_path / "out", workers=2)
+    second = run_batch(jobs, flaky_run, output_dir=tmp_path / "out", workers=2)
+
+    assert first["flaky"].status == "failed"
+    assert second["flaky"].status == "done"
+    assert sorted(calls) == ["a.pdf", "c.pdf", "c.pdf"]
+    assert load_state(tmp_path / "out" / "batch-state.json") == second
+    assert Path(second["ok"].output or "").exists()
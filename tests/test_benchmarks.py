@@ -0,0 +1,48 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from benchmarks.stub_server import StubLLMServer
+from benchmarks.synthetic import make_document_pair, to_raw_markdown, write_pdf
+from compair import client
+from compair.pipelines import run_llm_heavy, run_llm_light
+from compair.preprocessing import cleanup_markdown
+
+
+@pytest.fixture
+def stub(monkeypatch: pytest.MonkeyPatch) -> Iterator[StubLLMServer]:
+    with StubLLMServer(latency=0.01) as server:
+        monkeypatch.delenv("AZURE_OPENAI_ENDPOINT", raising=False)
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "stub")
+        monkeypatch.setattr(client, "_client", None)
+        yield server
+
+
+def test_make_document_pair_is_deterministic() -> None:
+    lines_a, lines_b = make_document_pair(200, edit_ratio=0.1, seed=1)
+
+    assert (lines_a, lines_b) == make_document_pair(200, edit_ratio=0.1, seed=1)
+    assert len(lines_a) == 200 and lines_a != lines_b
+    assert cleanup_markdown(to_raw_markdown(lines_a)) == "\n".join(lines_a)
+
+
+def test_pipelines_run_against_stub_server(stub: StubLLMServer, tmp_path: Path) -> None:
+    lines_a, lines_b = make_document_pair(150, edit_ratio=0.1)
+    pdf_a = str(write_pdf(lines_a, tmp_path / "a.pdf"))
+    pdf_b = str(write_pdf(lines_b, tmp_path / "b.pdf"))
+
+    light = run_llm_light(pdf_a, pdf_b, max_concurrency=4, batch_size=3, use_cache=False)
+    light_requests = stub.requests
+    heavy = run_llm_heavy(pdf_a, pdf_b, use_cache=False)
+
+    changes = light.difference_report.changes
+    llm_changes = [c for c in changes if not c.change_classification.locally_decided]
+    assert llm_changes
+    assert all(c.change_classification.summary == "Stub classification." for c in llm_changes)
+    # hunks are batched, so there are fewer requests than classified hunks
+    assert 0 < light_requests < len(llm_changes)
+    assert stub.max_in_flight >= 1
+    assert heavy.difference_report.summary == "Stub report."
+    assert stub.requests == light_requests + 1
@@ -0,0 +1,31 @@
+import os
+from pathlib import Path
+
+from compair.cache import DiskCache, make_key
+
+
+def test_disk_cache_roundtrip_and_counters(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path, max_bytes=1024)
+
+    assert cache.get("missing") is None
+    cache.set("key", b"value")
+
+    assert cache.get("key") == b"value"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path, max_bytes=25)
+    for i, key in enumerate(["a", "b"]):
+        cache.set(key, b"x" * 10)
+        os.utime(tmp_path / key, (i, i))
+
+    # reading "a" makes "b" the least recently used entry
+    assert cache.get("a") is not None
+    cache.set("c", b"x" * 10)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a", "c"]
+
+
+def test_make_key_separates_parts() -> None:
+    assert make_key("ab", "c") != make_key("a", "bc")
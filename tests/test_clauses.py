@@ -0,0 +1,62 @@
+import pytest
+
+from compair.clauses import build_clause_index, diff_clauses, find_clause_id
+from compair.diffing import unified_diff_lines
+from compair.models import DiffHunk
+
+
+@pytest.mark.parametrize(
+    "line, clause_id",
+    [
+        ("## **5.1 Technical and organizational measures**", "5.1"),
+        ("5.1.1. The Processor shall", "5.1.1"),
+        ("7. Term", "7"),
+        ("**Appendix 3** Instructions", "Appendix 3"),
+        ("ANNEX II", "Annex II"),
+        ("§ 4 Liability", "§ 4"),
+        ("The fee is 5 EUR.", None),
+        ("30 days after termination", None),
+        ("| 5.1 | table cell |", None),
+    ],
+)
+def test_find_clause_id(line: str, clause_id: str | None) -> None:
+    assert find_clause_id(line) == clause_id
+
+
+def test_build_clause_index_covers_all_lines() -> None:
+    lines = ["Preamble", "1. Scope", "Text", "1.1 Detail", "2. Term", "Text"]
+
+    clauses = build_clause_index(lines)
+
+    assert [(c.clause_id, c.start_line, c.end_line) for c in clauses] == [
+        (None, 0, 1),
+        ("1", 1, 3),
+        ("1.1", 3, 4),
+        ("2", 4, 6),
+    ]
+
+
+def test_diff_clauses_sets_locations_and_matches_line_diff_format() -> None:
+    lines_a = ["Preamble", "1. Scope", "Applies to all data.", "2. Term", "One year.", "3. Fees"]
+    lines_b = ["Preamble", "1. Scope", "Applies to some data.", "2. Term", "One year.", "3. Fees"]
+    lines_b += ["3.1 Fees are due within 30 days."]
+
+    hunks = diff_clauses(lines_a, lines_b, n=1)
+
+    assert [hunk.location for hunk in hunks] == ["1", "3.1"]
+    expected = DiffHunk.from_unified_diff_lines(unified_diff_lines(lines_a, lines_b, n=1))
+    assert [hunk.unified_diff for hunk in hunks] == [hunk.unified_diff for hunk in expected]
+
+
+def test_diff_clauses_does_not_match_lines_across_clauses() -> None:
+    # the repeated line must stay in its own clause instead of anchoring clause 1 against 2
+    lines_a = ["1. Scope", "See Appendix 1.", "2. Term", "One year."]
+    lines_b = ["1. Scope", "2. Term", "See Appendix 1.", "One year."]
+
+    hunks = diff_clauses(lines_a, lines_b, n=0)
+
+    assert [hunk.location for hunk in hunks] == ["1", "2"]
+    assert [(hunk.old_excerpt, hunk.new_excerpt) for hunk in hunks] == [
+        ("See Appendix 1.", None),
+        (None, "See Appendix 1."),
+    ]
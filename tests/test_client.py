@@ -0,0 +1,77 @@
+import httpx
+import pytest
+from openai import BadRequestError, RateLimitError
+
+from compair import client
+
+
+def _status_error(error_type: type, status_code: int, headers: dict[str, str]) -> Exception:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return error_type("error", response=response, body=None)
+
+
+def test_call_with_retries_honors_retry_after(monkeypatch: pytest.MonkeyPatch) -> None:
+    delays: list[float] = []
+    monkeypatch.setattr(client.time, "sleep", delays.append)
+    errors = [_status_error(RateLimitError, 429, {"retry-after": "3"})]
+
+    def request() -> str:
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    assert client.call_with_retries(request) == "ok"
+    assert delays == [3.0]
+
+
+@pytest.mark.parametrize(
+    "headers, delay",
+    [
+        ({"retry-after": "86400"}, client.BACKOFF_MAX),
+        ({"retry-after-ms": "1e12"}, client.BACKOFF_MAX),
+        ({"retry-after": "nan"}, 0.0),
+        ({"retry-after": "-5"}, 0.0),
+    ],
+)
+def test_call_with_retries_caps_retry_after(
+    monkeypatch: pytest.MonkeyPatch, headers: dict[str, str], delay: float
+) -> None:
+    delays: list[float] = []
+    monkeypatch.setattr(client.time, "sleep", delays.append)
+    errors = [_status_error(RateLimitError, 429, headers)]
+
+    def request() -> str:
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    assert client.call_with_retries(request) == "ok"
+    assert delays == [delay]
+
+
+def test_call_with_retries_does_not_retry_client_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(client.time, "sleep", lambda delay: None)
+    calls: list[int] = []
+
+    def request() -> str:
+        calls.append(1)
+        raise _status_error(BadRequestError, 400, {})
+
+    with pytest.raises(BadRequestError):
+        client.call_with_retries(request)
+    assert len(calls) == 1
+
+
+def test_call_with_retries_gives_up_after_max_retries(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("COMPAIR_OPENAI_MAX_RETRIES", "2")
+    monkeypatch.setattr(client.time, "sleep", lambda delay: None)
+    calls: list[int] = []
+
+    def request() -> str:
+        calls.append(1)
+        raise _status_error(RateLimitError, 429, {})
+
+    with pytest.raises(RateLimitError):
+        client.call_with_retries(request)
+    assert len(calls) == 3
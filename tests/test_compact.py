@@ -0,0 +1,86 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic import make_document_pair
+from compair.compact import read_compact, write_compact
+from compair.models import Change, ChangeClassification, DiffHunk, HunkHeader
+from compair.moves import detect_moves
+from compair.preprocessing import diff_texts
+from compair.words import add_word_spans
+
+
+def _changes(hunks: list[DiffHunk]) -> list[Change]:
+    return [
+        Change(
+            change_id=str(i),
+            diff_hunk=hunk,
+            change_classification=ChangeClassification(
+                change_type="modified", category="Minor", location=hunk.location
+            ),
+        )
+        for i, hunk in enumerate(hunks)
+    ]
+
+
+@pytest.mark.parametrize("encoding", ["json", "gzip"])
+def test_compact_report_round_trips_and_references_the_documents(
+    encoding: str, tmp_path: Path
+) -> None:
+    lines_a, _ = make_document_pair(400, edit_ratio=0.0)
+    # move one paragraph to the end, so a moved hunk with two blocks is included
+    lines_b = lines_a[:101] + lines_a[102:] + [lines_a[101]]
+    lines_b[200] = lines_b[200].replace("shall", "may")
+    document_a, document_b = "\n".join(lines_a), "\n".join(lines_b)
+    hunks, _ = detect_moves(diff_texts(document_a, document_b))
+    changes = _changes(add_word_spans(hunks))
+    path = tmp_path / "report.compact"
+
+    write_compact(path, document_a, document_b, changes, "Summary.", encoding=encoding)  # type: ignore[arg-type]
+    report = read_compact(path)
+
+    assert report.document_a == document_a and report.document_b == document_b
+    assert report.difference_report.changes == changes
+    assert report.difference_report.summary == "Summary."
+    if encoding == "json":
+        records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert all("hunk" in record for record in records[1:-1])
+        assert any(len(record["hunk"]["blocks"]) == 2 for record in records[1:-1])
+        assert any("word_spans" in record["hunk"] for record in records[1:-1])
+
+
+def test_compact_report_keeps_hunks_that_do_not_match_the_documents(tmp_path: Path) -> None:
+    written = DiffHunk(
+        unified_diff="@@ -1 +1 @@\n-Old text.\n+New text.",
+        old_excerpt="Old text.",
+        new_excerpt="New text.",
+        hunk_header=HunkHeader(start_line_old=1, end_line_old=2, start_line_new=1, end_line_new=2),
+    )
+    changes = _changes([written])
+    path = tmp_path / "report.compact"
+
+    write_compact(path, "Other text.", "Other text.", changes)
+
+    (_, record) = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert "diff_hunk" in record and "hunk" not in record
+    assert read_compact(path).difference_report.changes == changes
+
+
+def test_compact_report_msgpack_encoding(tmp_path: Path) -> None:
+    pytest.importorskip("msgpack")
+    document_a, document_b = "A.\nB.\nC.", "A.\nB!\nC."
+    changes = _changes(diff_texts(document_a, document_b))
+    path = tmp_path / "report.msgpack"
+
+    write_compact(path, document_a, document_b, changes, encoding="msgpack")
+
+    assert read_compact(path).difference_report.changes == changes
+
+
+def test_read_compact_rejects_other_reports(tmp_path: Path) -> None:
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps({"document_a": "", "document_b": ""}), encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        read_compact(path)
@@ -0,0 +1,111 @@
+import pytest
+
+from compair import pipelines
+from compair.dedup import SHARED_SUMMARY, edit_signature, group_duplicates, shared_classification
+from compair.models import ChangeClassification, DiffHunk, HunkHeader, ImpactAnalysis
+
+LINES = [
+    f"{i}. The Processor shall perform obligation number {i} under this Agreement."
+    for i in range(40)
+]
+
+
+def _hunk(old: str, new: str) -> DiffHunk:
+    return DiffHunk(
+        unified_diff=f"@@ -1 +1 @@\n-{old}\n+{new}",
+        old_excerpt=old,
+        new_excerpt=new,
+        hunk_header=HunkHeader(start_line_old=1, end_line_old=2, start_line_new=1, end_line_new=2),
+    )
+
+
+def test_edit_signature_ignores_distant_text_and_numbering() -> None:
+    rename = [_hunk(line, line.replace("Processor", "Sub-processor")) for line in LINES[3:5]] + [
+        _hunk(
+            "**The Processor** shall perform all services.",
+            "The Sub-processor shall perform all services.",
+        )
+    ]
+
+    assert len({edit_signature(hunk) for hunk in rename}) == 1
+    assert edit_signature(_hunk(LINES[3], LINES[3].replace("shall", "may"))) != edit_signature(
+        _hunk(LINES[3], LINES[3].replace("shall", "must"))
+    )
+    # the same edit in a clause of different meaning is not the same change
+    assert edit_signature(
+        _hunk(
+            "The Processor shall notify the Controller.", "The Processor may notify the Controller."
+        )
+    ) != edit_signature(
+        _hunk("The Controller shall pay the fees.", "The Controller may pay the fees.")
+    )
+    # renumbering and punctuation change no words
+    assert edit_signature(_hunk("3. The Processor.", "4. The Processor;")) is None
+
+
+def test_group_duplicates_keeps_first_hunk_as_representative() -> None:
+    hunks = [
+        _hunk(LINES[0], LINES[0].replace("Processor", "Sub-processor")),
+        _hunk(LINES[1], LINES[1].replace("shall", "may")),
+        _hunk(LINES[2], LINES[2].replace("Processor", "Sub-processor")),
+        _hunk(LINES[3], LINES[3].replace("Processor", "Sub-processor")),
+        _hunk(LINES[4], LINES[4].replace("Processor", "Sub-processor")),
+    ]
+
+    assert group_duplicates(hunks) == {0: [2, 3, 4]}
+    assert group_duplicates(hunks, skip={0}) == {2: [3, 4]}
+
+
+def test_stream_llm_light_classifies_repeated_edits_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    lines_b = list(LINES)
+    for i in range(0, 40, 8):
+        lines_b[i] = lines_b[i].replace("Processor", "Sub-processor")
+    lines_b[20] = lines_b[20].replace("shall", "may")
+    documents = {"a.pdf": "\n".join(LINES), "b.pdf": "\n".join(lines_b)}
+    calls: list[str] = []
+
+    def fake_classify(unified_diff: str) -> ChangeClassification:
+        calls.append(unified_diff)
+        return ChangeClassification(
+            change_type="modified", category="Minor", location="1", summary=unified_diff
+        )
+
+    monkeypatch.setattr(
+        pipelines,
+        "get_markdown_from_pdfs",
+        lambda pdf_paths, use_cache, max_workers: [documents[path] for path in pdf_paths],
+    )
+    monkeypatch.setattr(pipelines, "_classify_diff", fake_classify)
+
+    _, _, stream = pipelines.stream_llm_light("a.pdf", "b.pdf", use_cache=False, hunk_tokens=None)
+    changes = sorted(stream, key=lambda change: int(change.change_id or 0))
+
+    assert len(calls) == 2
+    assert [change.change_id for change in changes] == [str(i) for i in range(1, 7)]
+    # each change keeps its own hunk, the renames share the classification of the first one
+    assert len({change.diff_hunk.hunk_header.start_line_old for change in changes}) == 6
+    renames = [changes[i] for i in (0, 1, 2, 4, 5)]
+    (rename_call,) = [unified_diff for unified_diff in calls if "Sub-processor" in unified_diff]
+    assert rename_call == renames[0].diff_hunk.unified_diff
+    assert renames[0].change_classification.summary == rename_call
+    assert all(change.change_classification.summary == SHARED_SUMMARY for change in renames[1:])
+    assert [change.change_classification.location for change in renames] == ["1"] + [None] * 4
+
+
+def test_shared_classification_drops_the_representatives_description() -> None:
+    classification = ChangeClassification(
+        change_type="modified",
+        category="Critical",
+        confidence=0.9,
+        location="5.1",
+        summary="The Processor may now notify instead of having to.",
+        impact_analysis=ImpactAnalysis(
+            severity="high", party_affected=["Data Controller"], rationale="Weaker duty."
+        ),
+    )
+
+    shared = shared_classification(classification)
+
+    assert (shared.change_type, shared.category, shared.confidence) == ("modified", "Critical", 0.9)
+    assert (shared.location, shared.impact_analysis) == (None, None)
+    assert shared.summary == SHARED_SUMMARY
@@ -0,0 +1,107 @@
+import difflib
+import random
+
+import pytest
+
+from compair.diffing import DIFF_ENGINES, DiffEngine, get_opcodes, unified_diff_lines
+from compair.models import DiffHunk
+
+VOCABULARY = ["## Definitions", "| a | b |", "|---|---|", "Clause 1.", "Clause 2.", ""]
+
+
+def random_lines(rng: random.Random, n: int) -> list[str]:
+    return [rng.choice(VOCABULARY) for _ in range(n)]
+
+
+def apply_opcodes(lines_a: list[str], lines_b: list[str], engine: DiffEngine) -> list[str]:
+    result = []
+    for tag, i1, i2, j1, j2 in get_opcodes(lines_a, lines_b, engine):
+        if tag == "equal":
+            assert lines_a[i1:i2] == lines_b[j1:j2]
+            result.extend(lines_a[i1:i2])
+        else:
+            result.extend(lines_b[j1:j2])
+    return result
+
+
+def lcs_length(lines_a: list[str], lines_b: list[str]) -> int:
+    previous = [0] * (len(lines_b) + 1)
+    for line_a in lines_a:
+        current = [0]
+        for j, line_b in enumerate(lines_b):
+            current.append(
+                previous[j] + 1 if line_a == line_b else max(previous[j + 1], current[j])
+            )
+        previous = current
+    return previous[-1]
+
+
+def test_difflib_engine_matches_difflib() -> None:
+    rng = random.Random(0)
+    for _ in range(200):
+        lines_a, lines_b = (
+            random_lines(rng, rng.randint(0, 30)),
+            random_lines(rng, rng.randint(0, 30)),
+        )
+        expected = list(difflib.unified_diff(lines_a, lines_b, n=2, lineterm=""))[2:]
+        assert unified_diff_lines(lines_a, lines_b, n=2, engine="difflib") == expected
+
+
+@pytest.mark.parametrize("engine", DIFF_ENGINES)
+def test_opcodes_reconstruct_second_text(engine: DiffEngine) -> None:
+    rng = random.Random(1)
+    for _ in range(200):
+        lines_a, lines_b = (
+            random_lines(rng, rng.randint(0, 40)),
+            random_lines(rng, rng.randint(0, 40)),
+        )
+        assert apply_opcodes(lines_a, lines_b, engine) == lines_b
+
+
+def test_myers_diff_is_minimal() -> None:
+    rng = random.Random(2)
+    for _ in range(200):
+        lines_a, lines_b = (
+            random_lines(rng, rng.randint(0, 30)),
+            random_lines(rng, rng.randint(0, 30)),
+        )
+        matched = sum(
+            i2 - i1
+            for tag, i1, i2, _, _ in get_opcodes(lines_a, lines_b, "myers")
+            if tag == "equal"
+        )
+        assert matched == lcs_length(lines_a, lines_b)
+
+
+def test_histogram_does_not_anchor_on_repeated_lines() -> None:
+    lines_a = ["1. Scope", "| row |", "2. Term", "| row |", "3. Fees"]
+    lines_b = ["1. Scope", "| row |", "2. Term changed", "| row |", "3. Fees"]
+
+    opcodes = get_opcodes(lines_a, lines_b, "histogram")
+
+    assert [op for op in opcodes if op[0] != "equal"] == [("replace", 2, 3, 2, 3)]
+
+
+@pytest.mark.parametrize("engine", DIFF_ENGINES)
+def test_unified_diff_lines_parse_into_hunks(engine: DiffEngine) -> None:
+    lines_a = [f"line {i}" for i in range(20)]
+    lines_b = lines_a[:4] + ["inserted"] + lines_a[4:15] + lines_a[16:]
+
+    diff = unified_diff_lines(lines_a, lines_b, n=1, engine=engine)
+    hunks = DiffHunk.from_unified_diff_lines(diff)
+
+    headers = [hunk.hunk_header for hunk in hunks]
+    assert [
+        (h.start_line_old, h.end_line_old, h.start_line_new, h.end_line_new) for h in headers
+    ] == [
+        (4, 6, 4, 7),
+        (15, 18, 16, 18),
+    ]
+
+
+def test_single_line_ranges_are_parsed() -> None:
+    hunks = DiffHunk.from_unified_diff_lines(["@@ -5 +5,2 @@", "-old", "+new", "+added"])
+
+    header = hunks[0].hunk_header
+    assert (header.start_line_old, header.end_line_old) == (5, 6)
+    assert (header.start_line_new, header.end_line_new) == (5, 7)
@@ -0,0 +1,113 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from compair import incremental, pipelines
+from compair.incremental import VersionStore, diff_changed_region, hunk_body
+from compair.models import ChangeClassification
+from compair.preprocessing import diff_texts
+
+CLAUSES = [f"{i}. The Processor shall keep record number {i}." for i in range(1, 41)]
+
+
+def test_diff_changed_region_matches_full_diff(tmp_path: Path) -> None:
+    lines_b = list(CLAUSES)
+    lines_b[20] = "21. The Processor may keep record number 21."
+    lines_b[25:26] = []
+    store = VersionStore(tmp_path)
+    document_a = store.save_document("a", "\n".join(CLAUSES))
+    document_b = store.save_document("b", "\n".join(lines_b))
+
+    hunks = diff_changed_region(document_a, document_b, n_context_lines=1)
+
+    expected = diff_texts("\n".join(CLAUSES), "\n".join(lines_b), n_context_lines=1)
+    assert [hunk.unified_diff for hunk in hunks] == [hunk.unified_diff for hunk in expected]
+    assert [hunk.hunk_header for hunk in hunks] == [hunk.hunk_header for hunk in expected]
+    assert store.load_document("a") == document_a
+
+
+@pytest.mark.parametrize("align_clauses", [False, True])
+def test_diff_changed_region_only_diffs_the_changed_regions(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, align_clauses: bool
+) -> None:
+    lines_a = [
+        line
+        for i in range(1, 201)
+        for line in (f"## {i}. Obligation {i}", f"The Processor shall keep record number {i}.")
+    ]
+    rng = random.Random(3)
+    for _ in range(10):
+        lines_b = list(lines_a)
+        # edits near both ends and a few in between, including a repeated line
+        for i in sorted(rng.sample(range(1, len(lines_a) - 1), 4) + [2, len(lines_a) - 3])[::-1]:
+            edit = rng.choice(["replace", "delete", "insert"])
+            if edit == "replace":
+                lines_b[i] = lines_b[i].replace("shall", "may")
+            elif edit == "delete":
+                del lines_b[i]
+            else:
+                lines_b.insert(i, "The Processor shall keep all records.")
+        store = VersionStore(tmp_path)
+        document_a = store.save_document("a", "\n".join(lines_a))
+        document_b = store.save_document("b", "\n".join(lines_b))
+        diffed: list[int] = []
+
+        def diff_region(text_a: str, text_b: str, **kwargs: object) -> list:
+            diffed.append(len(text_a.splitlines()))
+            return diff_texts(text_a, text_b, **kwargs)  # type: ignore[arg-type]
+
+        with monkeypatch.context() as patch:
+            patch.setattr(incremental, "diff_texts", diff_region)
+            hunks = diff_changed_region(
+                document_a, document_b, n_context_lines=1, align_clauses=align_clauses
+            )
+
+        expected = diff_texts(
+            "\n".join(lines_a), "\n".join(lines_b), n_context_lines=1, align_clauses=align_clauses
+        )
+        assert [hunk.unified_diff for hunk in hunks] == [hunk.unified_diff for hunk in expected]
+        assert [hunk.hunk_header for hunk in hunks] == [hunk.hunk_header for hunk in expected]
+        assert [hunk.location for hunk in hunks] == [hunk.location for hunk in expected]
+        assert sum(diffed) < len(lines_a) / 10
+
+
+def test_hunk_body_ignores_position() -> None:
+    assert hunk_body("@@ -3,2 +3,2 @@\n-a\n+b") == hunk_body("@@ -13,2 +14,2 @@\n-a\n+b")
+
+
+def test_run_llm_light_carries_classifications_forward(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    v2 = list(CLAUSES)
+    v2[10] = "11. The Processor may keep record number 11."
+    # v3 keeps the change of v2, adds a line at the top and changes another clause
+    v3 = ["Draft 3"] + v2
+    v3[31] = "31. The Processor must delete record number 31."
+    documents = {}
+    for name, lines in [("v1.pdf", CLAUSES), ("v2.pdf", v2), ("v3.pdf", v3)]:
+        path = tmp_path / name
+        path.write_text(name)
+        documents[str(path)] = "\n".join(lines)
+    monkeypatch.setattr(
+        pipelines,
+        "get_markdown_from_pdfs",
+        lambda pdf_paths, use_cache, max_workers: [documents[path] for path in pdf_paths],
+    )
+    classified: list[str] = []
+
+    def fake_classify(unified_diff: str) -> ChangeClassification:
+        classified.append(unified_diff)
+        return ChangeClassification(change_type="modified", category="Critical")
+
+    monkeypatch.setattr(pipelines, "_classify_diff", fake_classify)
+    options = dict(use_cache=False, formatting_rules=False, history=tmp_path / "history")
+
+    pipelines.run_llm_light(tmp_path / "v1.pdf", tmp_path / "v2.pdf", **options)
+    report = pipelines.run_llm_light(tmp_path / "v1.pdf", tmp_path / "v3.pdf", **options)
+
+    assert len(report.difference_report.changes) == 3
+    assert len(classified) == 3
+    # only the insertion at the top and the new change reach the model in the second round
+    assert sorted("Draft 3" in diff for diff in classified[1:]) == [False, True]
+    assert any("must delete" in diff for diff in classified[1:])
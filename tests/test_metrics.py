@@ -0,0 +1,99 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from benchmarks.stub_server import StubLLMServer
+from benchmarks.synthetic import make_document_pair, write_pdf
+from compair import client, metrics
+from compair.pipelines import run_llm_light
+
+
+def test_collector_aggregates_stages_requests_and_cost() -> None:
+    usage = SimpleNamespace(
+        prompt_tokens=1000,
+        completion_tokens=100,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=400),
+    )
+    response = SimpleNamespace(model="gpt-4.1-2025-04-14", usage=usage)
+
+    with metrics.collect_metrics() as collector:
+        with metrics.stage("diff"):
+            pass
+        with pytest.raises(RuntimeError), metrics.stage("diff"):
+            raise RuntimeError("stage failed")
+        metrics.record_request("classify", 0.5, response=response)
+        metrics.record_request("classify", 1.5, retries=2, response=response)
+    metrics.record_request("classify", 9.0, response=response)
+    summary = collector.summary()
+
+    assert summary.stages["diff"].calls == 2
+    assert summary.requests == 2 and summary.retries == 2
+    assert (summary.prompt_tokens, summary.completion_tokens, summary.cached_tokens) == (
+        2000,
+        200,
+        800,
+    )
+    assert summary.latency_seconds is not None and summary.latency_seconds.max == 1.5
+    # 600 input, 400 cached and 100 output tokens at gpt-4.1 prices, twice
+    assert summary.estimated_cost_usd == pytest.approx(2 * (600 * 2 + 400 * 0.5 + 100 * 8) / 1e6)
+    assert metrics.estimate_cost("unknown-model", 10, 10) is None
+
+
+def test_collector_discounts_batch_requests() -> None:
+    usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=100)
+    response = SimpleNamespace(model="gpt-4.1", usage=usage)
+
+    with metrics.collect_metrics() as collector:
+        metrics.record_request("classify", 0.5, response=response)
+        metrics.record_request("classify_offline", 60.0, response=response, batch=True)
+
+    cost = (1000 * 2 + 100 * 8) / 1e6
+    assert collector.summary().estimated_cost_usd == pytest.approx(
+        cost * (1 + metrics.BATCH_DISCOUNT)
+    )
+
+
+def test_call_with_retries_reports_retries(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(client.time, "sleep", lambda delay: None)
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    errors = [RateLimitError("error", response=httpx.Response(429, request=request), body=None)]
+
+    def call() -> SimpleNamespace:
+        if errors:
+            raise errors.pop()
+        return SimpleNamespace(model="gpt-4.1", usage=None)
+
+    with metrics.collect_metrics() as collector:
+        client.call_with_retries(call, kind="classify")
+
+    (event,) = collector.summary().request_log
+    assert (event.kind, event.retries, event.failed, event.model) == (
+        "classify",
+        1,
+        False,
+        "gpt-4.1",
+    )
+
+
+def test_llm_light_reports_stages_and_usage(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    lines_a, lines_b = make_document_pair(100, edit_ratio=0.1)
+    pdf_a = str(write_pdf(lines_a, tmp_path / "a.pdf"))
+    pdf_b = str(write_pdf(lines_b, tmp_path / "b.pdf"))
+
+    with StubLLMServer() as stub, metrics.collect_metrics() as collector:
+        monkeypatch.delenv("AZURE_OPENAI_ENDPOINT", raising=False)
+        monkeypatch.setenv("OPENAI_BASE_URL", stub.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "stub")
+        monkeypatch.setattr(client, "_client", None)
+        run_llm_light(pdf_a, pdf_b, use_cache=False)
+    summary = collector.summary()
+
+    assert {"parse", "cleanup", "diff", "classify"} <= set(summary.stages)
+    assert summary.requests == stub.requests > 0
+    assert summary.prompt_tokens > 0 and summary.completion_tokens > 0
+    assert summary.estimated_cost_usd is not None and summary.estimated_cost_usd > 0
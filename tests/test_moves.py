@@ -0,0 +1,102 @@
+import pytest
+
+from compair import pipelines
+from compair.models import ChangeClassification
+from compair.moves import detect_moves, normalize_block
+from compair.preprocessing import diff_texts
+
+CLAUSES = [
+    f"{i}. The Processor shall perform obligation number {i} under this agreement."
+    for i in range(1, 9)
+]
+
+
+def test_normalize_block_ignores_numbering_and_markup() -> None:
+    assert normalize_block("5.1 **The Processor**  shall\n- 2. notify") == normalize_block(
+        "7.3 The processor shall\n* notify"
+    )
+    # numbers that are not clause identifiers are part of the text
+    assert normalize_block("30 days after termination") != normalize_block(
+        "90 days after termination"
+    )
+
+
+def test_detect_moves_merges_relocated_clause() -> None:
+    text_a = "\n".join(CLAUSES)
+    # clause 2 moves to the end and is renumbered
+    text_b = "\n".join(CLAUSES[:1] + CLAUSES[2:] + ["9." + CLAUSES[1][2:]])
+
+    hunks, moved = detect_moves(diff_texts(text_a, text_b, n_context_lines=1))
+
+    assert len(hunks) == 1
+    assert moved == {0: 1.0}
+    header = hunks[0].hunk_header
+    assert header.start_line_old == 1
+    assert header.start_line_new == 7
+
+
+def test_detect_moves_pairs_edited_blocks_by_similarity() -> None:
+    moved_clause = "Personal data shall be deleted within thirty days after the end of the provision of services."
+    text_a = "\n".join([moved_clause] + CLAUSES)
+    text_b = "\n".join(CLAUSES + [moved_clause.replace("thirty", "ninety")])
+
+    hunks, moved = detect_moves(diff_texts(text_a, text_b, n_context_lines=1), min_similarity=0.6)
+
+    assert len(hunks) == 1
+    assert 0.6 <= moved[0] < 1.0
+    assert detect_moves(diff_texts(text_a, text_b, n_context_lines=1), min_similarity=0.9)[1] == {}
+
+
+def test_stream_llm_light_classifies_unchanged_moves_locally(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    documents = {
+        "a.pdf": "\n".join(CLAUSES),
+        "b.pdf": "\n".join(CLAUSES[1:] + [CLAUSES[0]]),
+    }
+    monkeypatch.setattr(
+        pipelines,
+        "get_markdown_from_pdfs",
+        lambda pdf_paths, use_cache, max_workers: [documents[path] for path in pdf_paths],
+    )
+
+    def fail_classify(unified_diff: str) -> ChangeClassification:
+        raise AssertionError("moved block must not be sent to the LLM")
+
+    monkeypatch.setattr(pipelines, "_classify_diff", fail_classify)
+
+    report = pipelines.run_llm_light("a.pdf", "b.pdf", use_cache=False)
+    changes = report.difference_report.changes
+
+    assert len(changes) == 1
+    assert changes[0].change_classification.change_type == "moved"
+
+
+def test_stream_llm_light_sends_moves_with_changed_numbers_to_the_llm(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    moved_clause = "30 days after termination the Processor shall delete all personal data."
+    documents = {
+        "a.pdf": "\n".join(["1. " + moved_clause] + CLAUSES[1:]),
+        "b.pdf": "\n".join(CLAUSES[1:] + ["9. " + moved_clause.replace("30", "90")]),
+    }
+    calls: list[str] = []
+
+    def fake_classify(unified_diff: str) -> ChangeClassification:
+        calls.append(unified_diff)
+        return ChangeClassification(change_type="modified", category="Critical", summary="Period")
+
+    monkeypatch.setattr(
+        pipelines,
+        "get_markdown_from_pdfs",
+        lambda pdf_paths, use_cache, max_workers: [documents[path] for path in pdf_paths],
+    )
+    monkeypatch.setattr(pipelines, "_classify_diff", fake_classify)
+
+    report = pipelines.run_llm_light("a.pdf", "b.pdf", use_cache=False)
+    (change,) = report.difference_report.changes
+
+    assert len(calls) == 1
+    assert change.change_classification.change_type == "moved"
+    assert change.change_classification.category == "Critical"
+    assert not change.change_classification.locally_decided
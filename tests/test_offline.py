@@ -0,0 +1,158 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from benchmarks.stub_server import StubLLMServer
+from benchmarks.synthetic import make_document_pair, write_pdf
+from compair import client, metrics, offline
+from compair.models import ChangeClassification
+from compair.pipelines import run_llm_light
+
+
+def _use_stub(monkeypatch: pytest.MonkeyPatch, stub: StubLLMServer) -> None:
+    monkeypatch.delenv("AZURE_OPENAI_ENDPOINT", raising=False)
+    monkeypatch.setenv("OPENAI_BASE_URL", stub.base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    monkeypatch.setattr(client, "_client", None)
+
+
+def _bodies(n: int) -> dict[str, dict[str, Any]]:
+    response_format = offline.response_format(ChangeClassification)
+    return {
+        str(i): {
+            "model": "gpt-4.1",
+            "messages": [{"role": "user", "content": f"Hunk {i}"}],
+            "response_format": response_format,
+        }
+        for i in range(1, n + 1)
+    }
+
+
+def test_run_llm_light_offline_classifies_in_one_batch(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    lines_a, lines_b = make_document_pair(100, edit_ratio=0.1)
+    pdf_a = str(write_pdf(lines_a, tmp_path / "a.pdf"))
+    pdf_b = str(write_pdf(lines_b, tmp_path / "b.pdf"))
+
+    with StubLLMServer(batch_latency=0.05, batch_errors=1) as stub:
+        _use_stub(monkeypatch, stub)
+        online = run_llm_light(pdf_a, pdf_b, use_cache=False)
+        online_requests = stub.requests
+        with metrics.collect_metrics() as collector:
+            report = run_llm_light(
+                pdf_a, pdf_b, use_cache=False, offline_dir=tmp_path / "batches", poll_interval=0.01
+            )
+
+    changes = report.difference_report.changes
+    assert [change.diff_hunk for change in changes] == [
+        change.diff_hunk for change in online.difference_report.changes
+    ]
+    assert [change.change_id for change in changes] == [str(i) for i in range(1, len(changes) + 1)]
+    assert len(stub.batches) == 1
+    # the failed batch request is classified online
+    assert stub.requests == online_requests + 1
+    summary = collector.summary()
+    offline_requests = [request for request in summary.request_log if request.batch]
+    assert len(offline_requests) == online_requests - 1
+    # uploading, creating, polling and downloading the batch have no token cost
+    assert summary.requests == online_requests
+    assert summary.other_requests >= 4
+    assert summary.estimated_cost_usd is not None and summary.estimated_cost_usd > 0
+
+
+def test_run_batch_resumes_the_saved_batch(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    bodies = _bodies(3)
+
+    def interrupt(delay: float) -> None:
+        raise KeyboardInterrupt
+
+    with StubLLMServer(batch_latency=0.2) as stub:
+        _use_stub(monkeypatch, stub)
+        with monkeypatch.context() as patch:
+            patch.setattr(offline.time, "sleep", interrupt)
+            with pytest.raises(KeyboardInterrupt):
+                offline.run_batch(bodies, tmp_path, ChangeClassification, poll_interval=0.01)
+        (state_path,) = tmp_path.glob("*/batch.json")
+        state = offline.BatchState.model_validate_json(state_path.read_text(encoding="utf-8"))
+        assert state.batch_id in stub.batches and state.status == "in_progress"
+
+        results = offline.run_batch(bodies, tmp_path, ChangeClassification, poll_interval=0.01)
+        # finished batches are read from disk without polling
+        again = offline.run_batch(bodies, tmp_path, ChangeClassification, poll_interval=0.01)
+
+    assert list(stub.batches) == [state.batch_id]
+    assert sorted(results) == ["1", "2", "3"] and again == results
+
+
+def test_run_batch_submits_a_new_batch_after_a_failed_one(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    bodies = _bodies(3)
+
+    def interrupt(delay: float) -> None:
+        raise KeyboardInterrupt
+
+    with StubLLMServer(batch_latency=60) as stub:
+        _use_stub(monkeypatch, stub)
+        with monkeypatch.context() as patch:
+            patch.setattr(offline.time, "sleep", interrupt)
+            with pytest.raises(KeyboardInterrupt):
+                offline.run_batch(bodies, tmp_path, ChangeClassification, poll_interval=0.01)
+        (failed_id,) = stub.batches
+        stub.batches[failed_id].update(
+            status="failed",
+            errors={"object": "list", "data": [{"code": "invalid", "message": "Bad input"}]},
+        )
+
+        with pytest.raises(RuntimeError, match="Bad input"):
+            offline.run_batch(bodies, tmp_path, ChangeClassification, poll_interval=0.01)
+        (state_path,) = tmp_path.glob("*/batch.json")
+        state = offline.BatchState.model_validate_json(state_path.read_text(encoding="utf-8"))
+        assert (state.input_file_id, state.batch_id, state.status) == (None, None, None)
+
+        stub.batch_latency = 0.0
+        results = offline.run_batch(bodies, tmp_path, ChangeClassification, poll_interval=0.01)
+
+    assert len(stub.batches) == 2
+    assert sorted(results) == ["1", "2", "3"]
+
+
+def test_read_batch_results_maps_custom_ids_and_skips_failures() -> None:
+    def result(custom_id: str, summary: str) -> dict[str, Any]:
+        content = ChangeClassification(
+            change_type="modified", category="Minor", summary=summary
+        ).model_dump_json()
+        body = {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4.1",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+        }
+        return {"custom_id": custom_id, "response": {"status_code": 200, "body": body}}
+
+    lines = [
+        result("7", "seventh"),
+        {"custom_id": "3", "response": None, "error": {"code": "server_error"}},
+        {"custom_id": "5", "response": {"status_code": 500, "body": {}}},
+        result("2", "second"),
+        {**result("4", ""), "response": {"status_code": 200, "body": {"choices": []}}},
+    ]
+
+    results = offline.read_batch_results(
+        "\n".join(json.dumps(line) for line in lines), ChangeClassification
+    )
+
+    assert {custom_id: item.summary for custom_id, item in results.items()} == {
+        "7": "seventh",
+        "2": "second",
+    }
@@ -1,9 +1,12 @@
 import json
 import os
+import time
 from pathlib import Path
 
 import pytest
 
+from compair import pipelines
+from compair.models import Change, ChangeClassification, DifferenceReport, DiffHunk, HunkHeader
 from compair.pipelines import run_llm_heavy, run_llm_light
 
 RESOURCES_DIR = Path(__file__).parent / "resources"
@@ -32,3 +35,157 @@ def test_run_llm(analysis_type: str) -> None:
     )
 
     assert out_path.exists() and out_path.stat().st_size > 0
+
+
+def test_run_llm_light_keeps_hunk_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    documents = {
+        "a.pdf": "\n".join(f"Clause {i} original." for i in range(20)),
+        "b.pdf": "\n".join(
+            f"Clause {i} {'changed' if i % 4 == 0 else 'original'}." for i in range(20)
+        ),
+    }
+
+    def fake_classify(unified_diff: str) -> ChangeClassification:
+        # finish later hunks first to exercise out-of-order completion
+        start_line_old = int(unified_diff.split()[1].lstrip("-").split(",")[0])
+        time.sleep(0.002 * (20 - start_line_old))
+        return ChangeClassification(change_type="modified", category="Minor", summary=unified_diff)
+
+    monkeypatch.setattr(
+        pipelines,
+        "get_markdown_from_pdfs",
+        lambda pdf_paths, use_cache, max_workers: [documents[path] for path in pdf_paths],
+    )
+    monkeypatch.setattr(pipelines, "_classify_diff", fake_classify)
+
+    report = pipelines.run_llm_light(
+        "a.pdf", "b.pdf", max_concurrency=4, use_cache=False, deduplicate=False
+    )
+    changes = report.difference_report.changes
+
+    assert [change.change_id for change in changes] == [str(i + 1) for i in range(len(changes))]
+    assert all(
+        change.change_classification.summary == change.diff_hunk.unified_diff for change in changes
+    )
+
+
+def test_classify_diff_group_retries_missing_hunks(monkeypatch: pytest.MonkeyPatch) -> None:
+    def fake_classify_batch(unified_diffs: dict[str, str]) -> dict[str, ChangeClassification]:
+        # drop the last hunk to simulate an incomplete batch response
+        return {
+            hunk_id: ChangeClassification(change_type="modified", category="Minor")
+            for hunk_id in list(unified_diffs)[:-1]
+        }
+
+    retried: list[str] = []
+
+    def fake_classify(unified_diff: str) -> ChangeClassification:
+        retried.append(unified_diff)
+        return ChangeClassification(change_type="added", category="Critical")
+
+    monkeypatch.setattr(pipelines, "_classify_diff_batch", fake_classify_batch)
+    monkeypatch.setattr(pipelines, "_classify_diff", fake_classify)
+
+    classifications = pipelines._classify_diff_group({"1": "diff 1", "2": "diff 2", "3": "diff 3"})
+
+    assert retried == ["diff 3"]
+    assert [c.category for c in classifications] == ["Minor", "Minor", "Critical"]
+
+
+def test_pack_batches_respects_size_and_token_budget() -> None:
+    unified_diffs = {
+        str(i + 1): text
+        for i, text in enumerate(["a" * 40, "b" * 40, "c" * 40, "d" * 400, "e" * 40])
+    }
+    batches = pipelines._pack_batches(unified_diffs, batch_size=2, batch_token_budget=50)
+
+    assert [list(batch) for batch in batches] == [["1", "2"], ["3"], ["4"], ["5"]]
+
+
+def test_iter_classifications_reuses_cached_classifications(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("COMPAIR_CACHE_DIR", str(tmp_path))
+    calls: list[str] = []
+
+    def fake_classify(unified_diff: str) -> ChangeClassification:
+        calls.append(unified_diff)
+        return ChangeClassification(change_type="modified", category="Minor", summary=unified_diff)
+
+    monkeypatch.setattr(pipelines, "_classify_diff", fake_classify)
+    header = HunkHeader(start_line_old=1, end_line_old=2, start_line_new=1, end_line_new=2)
+    first_run = [DiffHunk(unified_diff=text, hunk_header=header) for text in ["x", "y"]]
+    second_run = [DiffHunk(unified_diff=text, hunk_header=header) for text in ["y", "z"]]
+    options = dict(max_concurrency=1, batch_size=1, batch_token_budget=100, use_cache=True)
+
+    list(pipelines._iter_classifications(first_run, **options))
+    classifications = dict(pipelines._iter_classifications(second_run, **options))
+
+    assert calls == ["x", "y", "z"]
+    assert [classifications[i].summary for i in range(2)] == ["y", "z"]
+
+
+def test_stream_llm_light_yields_changes_as_classified(monkeypatch: pytest.MonkeyPatch) -> None:
+    documents = {
+        "a.pdf": "One.\nTwo.\nThree.\nFour.\nFive.",
+        "b.pdf": "One more.\nTwo.\nThree.\nFour.\nFive more.",
+    }
+
+    def fake_classify(unified_diff: str) -> ChangeClassification:
+        # the first hunk finishes last
+        time.sleep(0.05 if "One" in unified_diff else 0)
+        return ChangeClassification(change_type="modified", category="Minor")
+
+    monkeypatch.setattr(
+        pipelines,
+        "get_markdown_from_pdfs",
+        lambda pdf_paths, use_cache, max_workers: [documents[path] for path in pdf_paths],
+    )
+    monkeypatch.setattr(pipelines, "_classify_diff", fake_classify)
+
+    document_a, _, changes = pipelines.stream_llm_light(
+        "a.pdf", "b.pdf", use_cache=False, hunk_tokens=None, deduplicate=False
+    )
+
+    assert document_a == documents["a.pdf"]
+    assert [change.change_id for change in changes] == ["2", "1"]
+
+
+def test_run_llm_heavy_chunked_merges_section_reports(monkeypatch: pytest.MonkeyPatch) -> None:
+    lines_a = [f"Clause {i}: the Processor shall keep record number {i}." for i in range(100)]
+    lines_b = list(lines_a)
+    lines_b[10] = "Clause 10: the Processor may keep record number 10."
+    lines_b[80] = "Clause 80: the Processor may keep record number 80."
+    documents = {"a.pdf": "\n".join(lines_a), "b.pdf": "\n".join(lines_b)}
+    requests: list[str] = []
+
+    def fake_compare(
+        document_a_markdown: str, document_b_markdown: str, excerpt_note: str | None = None
+    ) -> DifferenceReport:
+        requests.append(document_a_markdown)
+        section_lines = document_b_markdown.splitlines()
+        line = next(i for i, text in enumerate(section_lines) if "may" in text) + 1
+        header = HunkHeader(
+            start_line_old=line, end_line_old=line + 1, start_line_new=line, end_line_new=line + 1
+        )
+        change = Change(
+            change_id="1",
+            diff_hunk=DiffHunk(unified_diff="", hunk_header=header),
+            change_classification=ChangeClassification(change_type="modified", category="Critical"),
+        )
+        return DifferenceReport(changes=[change], summary="Obligation weakened.")
+
+    monkeypatch.setattr(
+        pipelines,
+        "get_markdown_from_pdfs",
+        lambda pdf_paths, use_cache, max_workers: [documents[path] for path in pdf_paths],
+    )
+    monkeypatch.setattr(pipelines, "_compare_documents", fake_compare)
+
+    report = run_llm_heavy("a.pdf", "b.pdf", chunk_token_budget=500, max_concurrency=2)
+    changes = report.difference_report.changes
+
+    # unchanged sections are not sent to the model
+    assert sum(len(text.splitlines()) for text in requests) < len(lines_a)
+    assert [change.change_id for change in changes] == ["1", "2"]
+    assert [change.diff_hunk.hunk_header.start_line_new for change in changes] == [11, 81]
@@ -1,11 +1,19 @@
+import random
 from pathlib import Path
 
 import pytest
 
+from benchmarks.legacy import legacy_cleanup_markdown
+from benchmarks.synthetic import make_document_pair, to_raw_markdown
+from compair import preprocessing
 from compair.preprocessing import (
+    MarkdownNormalizer,
     cleanup_markdown,
     diff_texts,
+    get_markdown_from_pdf,
+    get_markdown_from_pdfs,
     parse_pdf_to_markdown,
+    parse_pdfs_to_markdown,
 )
 
 RESOURCES_DIR = Path(__file__).parent / "resources"
@@ -26,6 +34,43 @@ def test_parse_pdf_to_markdown(pdf_file_path: str) -> None:
     assert text.strip() != ""
 
 
+def _write_form_pdf(path: Path) -> str:
+    import pymupdf
+
+    with pymupdf.open() as doc:
+        for i in range(6):
+            page = doc.new_page()
+            page.insert_text((72, 100), f"Clause {i}", fontsize=16)
+            page.insert_text((72, 140), f"The Processor shall perform obligation {i}.", fontsize=11)
+            widget = pymupdf.Widget()
+            widget.field_type = pymupdf.PDF_WIDGET_TYPE_TEXT
+            widget.field_name = f"signature_{i}"
+            widget.field_value = f"Signed by party {i}"
+            widget.text_fontsize = 24
+            widget.rect = pymupdf.Rect(72, 200, 500, 260)
+            page.add_widget(widget)
+            page.add_freetext_annot(pymupdf.Rect(72, 300, 400, 340), f"Note {i}", fontsize=20)
+        doc.save(path)
+    return str(path)
+
+
+def test_parse_pdfs_to_markdown_matches_sequential_parsing(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    # the generated PDF has form fields and annotations, which are baked before parsing
+    pdf_paths = [
+        str(RESOURCES_DIR / "1.pdf"),
+        str(RESOURCES_DIR / "2.pdf"),
+        _write_form_pdf(tmp_path / "form.pdf"),
+    ]
+    # force several page ranges per document
+    monkeypatch.setattr(preprocessing, "MIN_PAGES_PER_TASK", 3)
+
+    texts = parse_pdfs_to_markdown(pdf_paths, max_workers=4)
+
+    assert texts == [parse_pdf_to_markdown(pdf_path) for pdf_path in pdf_paths]
+
+
 @pytest.mark.parametrize("left,right", [("1.pdf", "2.pdf")])
 def test_diff_texts(left: str, right: str) -> None:
     left_text = parse_pdf_to_markdown(str(RESOURCES_DIR / left))
@@ -54,3 +99,69 @@ def test_diff_texts(left: str, right: str) -> None:
 )
 def test_cleanup_markdown(input_text: str, expected: str) -> None:
     assert cleanup_markdown(input_text) == expected
+
+
+def _regression_corpus() -> list[str]:
+    lines, _ = make_document_pair(300, edit_ratio=0.1, seed=2)
+    raw = to_raw_markdown(lines)
+    corpus = [parse_pdf_to_markdown(str(RESOURCES_DIR / name)) for name in ["1.pdf", "2.pdf"]]
+    corpus += [raw, raw.replace("\n", "\r\n"), raw.replace("Agreement", "Agreement\u00a0\u2019")]
+    corpus += [
+        "",
+        " \n\t\n",
+        "\r\rText\r",
+        "a\tb\x0cc \x0b d\n\x1f\ne\u2028f\x85g",
+        "  ```\ncode  \t\n  indented\xa0\n```  \n\n\n\ttext\n```",
+        "\n```\n\n``` ``\n\n`` ```\n",
+    ]
+    # random mixes of words, fences and whitespace
+    rng = random.Random(0)
+    pieces = ["word", "`", "```", " ", "  ", "\t", "\n", "\n\n", "\r", "\r\n", "\xa0", "\x0c"]
+    corpus += ["".join(rng.choices(pieces, k=rng.randint(1, 40))) for _ in range(2000)]
+    return corpus
+
+
+def test_cleanup_markdown_matches_previous_implementation() -> None:
+    for text in _regression_corpus():
+        assert cleanup_markdown(text) == legacy_cleanup_markdown(text), repr(text)
+
+
+def test_markdown_normalizer_matches_cleanup_markdown_for_any_chunking() -> None:
+    rng = random.Random(1)
+    for text in _regression_corpus():
+        normalizer = MarkdownNormalizer()
+        start = 0
+        while start < len(text):
+            end = start + rng.randint(0, 300 if len(text) > 1000 else 5)
+            normalizer.feed(text[start:end])
+            start = end
+        assert normalizer.finish() == cleanup_markdown(text), repr(text)
+
+
+def test_get_markdown_from_pdfs_cleans_up_page_ranges_as_they_arrive(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    pdf_paths = [str(RESOURCES_DIR / "1.pdf"), str(RESOURCES_DIR / "2.pdf")]
+    monkeypatch.setattr(preprocessing, "MIN_PAGES_PER_TASK", 3)
+
+    def fail_cleanup(markdown_text: str) -> str:
+        raise AssertionError("page ranges must be cleaned up incrementally")
+
+    expected = [cleanup_markdown(parse_pdf_to_markdown(pdf_path)) for pdf_path in pdf_paths]
+    monkeypatch.setattr(preprocessing, "cleanup_markdown", fail_cleanup)
+
+    assert get_markdown_from_pdfs(pdf_paths, use_cache=False, max_workers=4) == expected
+
+
+def test_get_markdown_from_pdf_uses_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("COMPAIR_CACHE_DIR", str(tmp_path))
+    pdf_path = str(RESOURCES_DIR / "1.pdf")
+
+    first = get_markdown_from_pdf(pdf_path)
+
+    def fail_parse(file_path: str) -> str:
+        raise AssertionError("cache hit must skip parsing")
+
+    monkeypatch.setattr(preprocessing, "parse_pdf_to_markdown", fail_parse)
+
+    assert get_markdown_from_pdf(pdf_path) == first
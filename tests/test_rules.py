@@ -0,0 +1,75 @@
+import pytest
+
+from compair.preprocessing import cleanup_markdown, diff_texts
+from compair.rules import classify_formatting
+
+
+@pytest.mark.parametrize(
+    "old, new, confidence",
+    [
+        (
+            "The Processor shall  notify\nthe Controller.",
+            "The Processor shall notify the Controller.",
+            0.99,
+        ),
+        (
+            "The **Processor** shall notify the Controller.",
+            "The Processor shall notify the Controller.",
+            0.95,
+        ),
+        (
+            "Personal data is pro\u00adcessed on behalf.",
+            "Personal data is processed on behalf.",
+            0.95,
+        ),
+        (
+            "THE PROCESSOR shall notify the Controller.",
+            "The Processor shall notify the Controller.",
+            0.9,
+        ),
+        (
+            "The Processor shall notify the Controller;",
+            "The Processor shall notify the Controller.",
+            0.8,
+        ),
+    ],
+)
+def test_classify_formatting_detects_presentation_changes(
+    old: str, new: str, confidence: float
+) -> None:
+    hunks = diff_texts(f"Intro\n{old}\nEnd", f"Intro\n{new}\nEnd", n_context_lines=1)
+
+    classification = classify_formatting(hunks[0])
+
+    assert classification is not None
+    assert classification.category == "Formatting"
+    assert classification.confidence == confidence
+    assert classification.locally_decided
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [
+        ("The Processor shall notify the Controller.", "The Processor may notify the Controller."),
+        ("Notify within 72 hours.", "Notify within 24 hours."),
+        ("The fee is 1.000 EUR.", "The fee is 1,000 EUR."),
+        ("The fee is 5 EUR.", "The fee is 5 %."),
+        ("Keep a part of the data.", "Keep apart of the data."),
+        ("The Controller's data.", "The Controllers' data."),
+        ("All data (excluding backups) is deleted.", "All data excluding backups is deleted."),
+    ],
+)
+def test_classify_formatting_leaves_substantive_changes_to_the_llm(old: str, new: str) -> None:
+    hunks = diff_texts(f"Intro\n{old}\nEnd", f"Intro\n{new}\nEnd", n_context_lines=1)
+
+    assert classify_formatting(hunks[0]) is None
+
+
+def test_classify_formatting_ignores_hyphenation_in_cleaned_markdown() -> None:
+    old = cleanup_markdown("Intro\n\nPersonal data is pro-\ncessed on behalf.\n\nEnd")
+    new = cleanup_markdown("Intro\n\nPersonal data is processed on behalf.\n\nEnd")
+
+    classification = classify_formatting(diff_texts(old, new, n_context_lines=1)[0])
+
+    assert classification is not None
+    assert classification.confidence == 0.95
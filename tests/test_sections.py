@@ -0,0 +1,34 @@
+from compair.sections import split_aligned_sections
+
+LINES_A = [f"Clause {i}: the Processor shall keep record number {i}." for i in range(100)]
+
+
+def test_split_aligned_sections_cuts_at_matched_lines() -> None:
+    lines_b = list(LINES_A)
+    lines_b[10] = "Clause 10: the Processor may keep record number 10."
+    lines_b[60:62] = ["Clause 60 and 61 merged."]
+
+    sections = split_aligned_sections(LINES_A, lines_b, token_budget=400)
+
+    assert len(sections) > 1
+    assert (sections[0].start_line_a, sections[0].start_line_b) == (0, 0)
+    assert (sections[-1].end_line_a, sections[-1].end_line_b) == (len(LINES_A), len(lines_b))
+    for previous, section in zip(sections, sections[1:]):
+        assert (previous.end_line_a, previous.end_line_b) == (
+            section.start_line_a,
+            section.start_line_b,
+        )
+        # every cut is at a line boundary of matching content
+        assert LINES_A[section.start_line_a] == lines_b[section.start_line_b]
+    changed = [section for section in sections if not section.identical]
+    assert len(changed) == 2
+    assert changed[0].start_line_a <= 10 < changed[0].end_line_a
+    assert changed[1].start_line_a <= 60 and 62 <= changed[1].end_line_a
+
+
+def test_split_aligned_sections_keeps_small_documents_whole() -> None:
+    sections = split_aligned_sections(LINES_A, LINES_A[1:], token_budget=100_000)
+
+    assert [(s.start_line_a, s.end_line_a, s.start_line_b, s.end_line_b) for s in sections] == [
+        (0, 100, 0, 99)
+    ]
@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from compair.models import Change, ChangeClassification, DiffHunk, HunkHeader
+from compair.server import JobService, make_server
+
+
+def _change(change_id: str) -> Change:
+    header = HunkHeader(start_line_old=1, end_line_old=2, start_line_new=1, end_line_new=2)
+    return Change(
+        change_id=change_id,
+        diff_hunk=DiffHunk(unified_diff="", hunk_header=header),
+        change_classification=ChangeClassification(change_type="modified", category="Minor"),
+    )
+
+
+VIEWER_ORIGIN = "http://localhost:3000"
+
+
+def _fake_run(file1: str, file2: str, options: list[str]) -> tuple[str, str, Iterator[Change]]:
+    if "--fail" in options:
+        raise RuntimeError("API unavailable")
+    # completion order differs from change order
+    return Path(file1).name, Path(file2).name, iter([_change("2"), _change("1")])
+
+
+def _fake_validate(options: list[str]) -> None:
+    if "--unknown" in options:
+        raise ValueError("unrecognized arguments: --unknown")
+
+
+@pytest.fixture
+def base_url(tmp_path: Path) -> Iterator[str]:
+    service = JobService(
+        _fake_run,
+        tmp_path / "results",
+        workers=2,
+        validate_options=_fake_validate,
+        root_dir=tmp_path,
+    )
+    server = make_server(service, port=0, allow_origins=[VIEWER_ORIGIN])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+
+def _request(
+    url: str, body: dict | None = None, headers: dict[str, str] | None = None
+) -> tuple[int, str]:
+    return _request_with_headers(url, body, headers)[:2]
+
+
+def _request_with_headers(
+    url: str, body: dict | None = None, headers: dict[str, str] | None = None
+) -> tuple[int, str, dict[str, str]]:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json", **(headers or {})}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, response.read().decode("utf-8"), dict(response.headers)
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8"), dict(e.headers)
+
+
+def _wait_finished(base_url: str, job_id: str) -> dict:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        info = json.loads(_request(f"{base_url}/jobs/{job_id}")[1])
+        if info["status"] in ("done", "failed"):
+            return info
+        time.sleep(0.02)
+    raise TimeoutError(job_id)
+
+
+def test_job_result_and_stream(base_url: str, tmp_path: Path) -> None:
+    (tmp_path / "a.pdf").write_bytes(b"a")
+    (tmp_path / "b.pdf").write_bytes(b"b")
+
+    status, body = _request(
+        f"{base_url}/jobs", {"file1": str(tmp_path / "a.pdf"), "file2": str(tmp_path / "b.pdf")}
+    )
+    job_id = json.loads(body)["job_id"]
+    info = _wait_finished(base_url, job_id)
+    result = json.loads(_request(f"{base_url}/jobs/{job_id}/result")[1])
+    records = _request(f"{base_url}/jobs/{job_id}/stream")[1].splitlines()
+
+    assert status == 202
+    assert info["status"] == "done" and info["changes"] == 2
+    assert result["document_a"] == "a.pdf"
+    assert [change["change_id"] for change in result["difference_report"]["changes"]] == ["1", "2"]
+    assert json.loads(records[0]) == {"document_a": "a.pdf", "document_b": "b.pdf"}
+    assert [json.loads(record)["change_id"] for record in records[1:]] == ["2", "1"]
+    assert [job["job_id"] for job in json.loads(_request(f"{base_url}/jobs")[1])] == [job_id]
+
+
+def test_failed_job_has_no_result(base_url: str, tmp_path: Path) -> None:
+    (tmp_path / "a.pdf").write_bytes(b"a")
+    job = {
+        "file1": str(tmp_path / "a.pdf"),
+        "file2": str(tmp_path / "a.pdf"),
+        "options": ["--fail"],
+    }
+
+    job_id = json.loads(_request(f"{base_url}/jobs", job)[1])["job_id"]
+    info = _wait_finished(base_url, job_id)
+
+    assert info["status"] == "failed" and "API unavailable" in info["error"]
+    assert _request(f"{base_url}/jobs/{job_id}/result")[0] == 409
+
+
+def test_rejects_missing_files_and_unknown_jobs(base_url: str, tmp_path: Path) -> None:
+    missing = {"file1": str(tmp_path / "missing.pdf"), "file2": str(tmp_path / "missing.pdf")}
+
+    assert _request(f"{base_url}/jobs", missing)[0] == 400
+    assert _request(f"{base_url}/jobs", {"file1": "a.pdf"})[0] == 400
+    assert _request(f"{base_url}/jobs/unknown")[0] == 404
+
+
+def test_rejects_invalid_options_on_submission(base_url: str, tmp_path: Path) -> None:
+    (tmp_path / "a.pdf").write_bytes(b"a")
+    job = {
+        "file1": str(tmp_path / "a.pdf"),
+        "file2": str(tmp_path / "a.pdf"),
+        "options": ["--unknown"],
+    }
+
+    status, body = _request(f"{base_url}/jobs", job)
+
+    assert status == 400
+    assert "unrecognized arguments: --unknown" in body
+    assert json.loads(_request(f"{base_url}/jobs")[1]) == []
+
+
+def test_rejects_files_outside_the_root_directory(base_url: str, tmp_path: Path) -> None:
+    (tmp_path / "a.pdf").write_bytes(b"a")
+    outside = tmp_path.parent / "outside.pdf"
+    outside.write_bytes(b"secret")
+
+    for file_path in (str(outside), "../outside.pdf"):
+        status, body = _request(f"{base_url}/jobs", {"file1": "a.pdf", "file2": file_path})
+        assert status == 400 and "outside of the root directory" in body
+
+    status, body = _request(f"{base_url}/jobs", {"file1": "a.pdf", "file2": "a.pdf"})
+    assert status == 202
+    assert json.loads(body)["file1"] == str((tmp_path / "a.pdf").resolve())
+
+
+def test_only_allowed_origins_can_use_the_service(base_url: str, tmp_path: Path) -> None:
+    (tmp_path / "a.pdf").write_bytes(b"a")
+    job = {"file1": "a.pdf", "file2": "a.pdf"}
+    foreign = {"Origin": "https://example.com"}
+
+    assert _request(f"{base_url}/jobs", job, foreign)[0] == 403
+    assert _request(f"{base_url}/jobs", headers=foreign)[0] == 403
+    assert json.loads(_request(f"{base_url}/jobs")[1]) == []
+
+    status, _, headers = _request_with_headers(
+        f"{base_url}/jobs", headers={"Origin": VIEWER_ORIGIN}
+    )
+    assert status == 200
+    assert headers["Access-Control-Allow-Origin"] == VIEWER_ORIGIN
+    assert "Access-Control-Allow-Origin" not in _request_with_headers(f"{base_url}/jobs")[2]
@@ -0,0 +1,87 @@
+import pytest
+
+from compair.models import DiffHunk
+from compair.preprocessing import diff_texts, estimate_tokens
+from compair.shaping import shape_hunks
+
+LINES = [
+    f"{i}. The Processor shall perform obligation number {i} under this Agreement."
+    for i in range(60)
+]
+
+
+def _sides(hunk: DiffHunk) -> tuple[list[str], list[str]]:
+    body = hunk.unified_diff.splitlines()[1:]
+    old = [line[1:] for line in body if not line.startswith("+")]
+    new = [line[1:] for line in body if not line.startswith("-")]
+    return old, new
+
+
+def _assert_consistent(hunks: list[DiffHunk], lines_a: list[str], lines_b: list[str]) -> None:
+    for hunk in hunks:
+        header = hunk.hunk_header
+        old, new = _sides(hunk)
+        if old:
+            assert lines_a[header.start_line_old - 1 : header.end_line_old - 1] == old
+        if new:
+            assert lines_b[header.start_line_new - 1 : header.end_line_new - 1] == new
+
+
+def _shape(lines_a: list[str], lines_b: list[str], **options: int) -> list[DiffHunk]:
+    hunks = diff_texts("\n".join(lines_a), "\n".join(lines_b), n_context_lines=1)
+    shaped = shape_hunks(lines_a, lines_b, hunks, **options)
+    _assert_consistent(shaped, lines_a, lines_b)
+    return shaped
+
+
+def test_shape_hunks_merges_tiny_neighbouring_hunks() -> None:
+    lines_b = list(LINES)
+    lines_b[10] = lines_b[10].replace("shall", "may")
+    lines_b[13] = lines_b[13].replace("shall", "must")
+    lines_b[40] = lines_b[40].replace("shall", "will")
+
+    hunks = _shape(LINES, lines_b, target_tokens=150)
+
+    assert len(hunks) == 2
+    assert (hunks[0].old_excerpt or "").splitlines() == [LINES[10], LINES[13]]
+    assert hunks[1].old_excerpt == LINES[40]
+
+
+def test_shape_hunks_splits_oversized_rewrites_between_paragraphs() -> None:
+    lines_b = [line.replace("Processor", "Subcontractor") for line in LINES[:30]] + LINES[30:]
+
+    hunks = _shape(LINES, lines_b, target_tokens=50, max_tokens=200)
+
+    assert len(hunks) > 1
+    for hunk in hunks:
+        changed = (hunk.old_excerpt or "").splitlines() + (hunk.new_excerpt or "").splitlines()
+        assert sum(estimate_tokens(line) for line in changed) <= 200
+    # every rewritten paragraph ends up in exactly one hunk, next to its replacement
+    removed = [line for hunk in hunks for line in (hunk.old_excerpt or "").splitlines()]
+    added = [line for hunk in hunks for line in (hunk.new_excerpt or "").splitlines()]
+    assert removed == LINES[:30] and added == lines_b[:30]
+
+
+def test_shape_hunks_adds_context_up_to_target_without_crossing_changes() -> None:
+    lines_b = list(LINES)
+    lines_b[20] = lines_b[20].replace("shall", "may")
+    lines_b[24] = lines_b[24] + " This obligation survives termination of the Agreement."
+
+    small = _shape(LINES, lines_b, target_tokens=30)
+    large = _shape(LINES, lines_b, target_tokens=300)
+
+    def context(hunk: DiffHunk) -> int:
+        return len(_sides(hunk)[0]) - len((hunk.old_excerpt or "").splitlines())
+
+    assert [context(hunk) for hunk in small] == [2, 2]
+    (hunk,) = large
+    old, _ = _sides(hunk)
+    added = (hunk.new_excerpt or "").splitlines()
+    assert 2 + 3 < context(hunk) <= 2 * 5 + 3
+    assert sum(map(estimate_tokens, old)) + sum(map(estimate_tokens, added)) <= 300
+    assert hunk.hunk_header.start_line_old < 21 and hunk.hunk_header.end_line_old > 26
+
+
+def test_shape_hunks_rejects_inconsistent_budgets() -> None:
+    with pytest.raises(ValueError):
+        shape_hunks([], [], [], target_tokens=500, max_tokens=100)
@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pytest
+
+from benchmarks.stub_server import StubLLMServer
+from benchmarks.synthetic import make_document_pair, write_pdf
+from compair import client, metrics, uploads
+from compair.pipelines import run_llm_only
+
+
+@pytest.fixture
+def stub(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):  # type: ignore[no-untyped-def]
+    monkeypatch.setenv("COMPAIR_CACHE_DIR", str(tmp_path / "cache"))
+    with StubLLMServer() as stub:
+        monkeypatch.delenv("AZURE_OPENAI_ENDPOINT", raising=False)
+        monkeypatch.setenv("OPENAI_BASE_URL", stub.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "stub")
+        monkeypatch.setattr(client, "_client", None)
+        yield stub
+
+
+def test_run_llm_only_uploads_files_once_and_references_them(
+    stub: StubLLMServer, tmp_path: Path
+) -> None:
+    lines_a, lines_b = make_document_pair(200, edit_ratio=0.1)
+    pdf_a = write_pdf(lines_a, tmp_path / "a.pdf")
+    pdf_b = write_pdf(lines_b, tmp_path / "b.pdf")
+    pdf_bytes = pdf_a.stat().st_size + pdf_b.stat().st_size
+
+    run_llm_only(pdf_a, pdf_b)
+    inline_bytes = stub.request_bytes
+    with metrics.collect_metrics() as collector:
+        for _ in range(2):
+            report = run_llm_only(pdf_a, pdf_b, upload_files=True)
+    summary = collector.summary()
+
+    assert report.difference_report.summary == "Stub report."
+    assert len(stub.files) == 2
+    # two uploads and two checks of the cached ids are not completion requests
+    assert (summary.requests, summary.other_requests) == (2, 4)
+    assert summary.estimated_cost_usd is not None and summary.estimated_cost_usd > 0
+    # every request saves at least the base64-encoded PDFs
+    upload_bytes = (stub.request_bytes - inline_bytes) / 2
+    assert inline_bytes - upload_bytes > pdf_bytes * 4 / 3
+    for file_object in stub.file_objects.values():
+        assert file_object["purpose"] == "user_data"
+        assert file_object["expires_at"] - file_object["created_at"] == uploads.DEFAULT_UPLOAD_TTL
+
+
+def test_upload_file_uploads_again_when_the_id_is_gone_or_expires(
+    stub: StubLLMServer, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pdf = write_pdf(["Clause 1."], tmp_path / "a.pdf")
+
+    first = uploads.upload_file(pdf)
+    assert uploads.upload_file(pdf) == first
+    # ignores the cache when disabled
+    assert uploads.upload_file(pdf, use_cache=False) != first
+
+    del stub.file_objects[first]
+    second = uploads.upload_file(pdf)
+    assert second != first
+
+    now = uploads.time.time()
+    monkeypatch.setattr(
+        uploads.time, "time", lambda: now + uploads.DEFAULT_UPLOAD_TTL - uploads.EXPIRY_MARGIN
+    )
+    assert uploads.upload_file(pdf) not in (first, second)
@@ -0,0 +1,50 @@
+from compair.models import DiffHunk, HunkHeader
+from compair.preprocessing import diff_texts
+from compair.words import add_word_spans, word_spans
+
+
+def _changed(old: str, new: str) -> list[tuple[str, str]]:
+    return [
+        (old[span.old_start : span.old_end], new[span.new_start : span.new_end])
+        for span in word_spans(old, new)
+    ]
+
+
+def test_word_spans_locate_changed_words_and_phrases() -> None:
+    old = "The Processor shall notify the Controller without undue delay."
+    new = "The Sub-processor must notify the Controller within 24 hours."
+
+    assert _changed(old, new) == [
+        ("Processor shall", "Sub-processor must"),
+        ("without undue delay", "within 24 hours"),
+    ]
+
+
+def test_word_spans_of_insertions_and_removals_are_empty_on_the_other_side() -> None:
+    assert _changed("Payment within 30 days.", "Payment within 60 days of invoice.") == [
+        ("30", "60"),
+        ("", " of invoice"),
+    ]
+    assert _changed("Clause 1.\nClause 2.", "Clause 1.") == [("\nClause 2.", "")]
+    assert word_spans("Unchanged.", "Unchanged.") == []
+
+
+def test_word_spans_count_code_points() -> None:
+    old, new = "𝔓rocessor shall act.", "𝔓rocessor may act."
+
+    (span,) = word_spans(old, new)
+
+    assert (span.old_start, span.old_end, span.new_start, span.new_end) == (10, 15, 10, 13)
+
+
+def test_add_word_spans_annotates_hunks_with_both_sides() -> None:
+    hunks = diff_texts("A.\nThe term is 12 months.\nC.", "A.\nThe term is 24 months.\nC.")
+    header = HunkHeader(start_line_old=1, end_line_old=1, start_line_new=1, end_line_new=2)
+    added = DiffHunk(unified_diff="@@ -0,0 +1 @@\n+New.", new_excerpt="New.", hunk_header=header)
+
+    annotated = add_word_spans([*hunks, added])
+
+    (span,) = annotated[0].word_spans or []
+    assert annotated[0].old_excerpt is not None and annotated[0].new_excerpt is not None
+    assert annotated[0].old_excerpt[span.old_start : span.old_end] == "12"
+    assert annotated[-1].word_spans is None
@@ -1,31 +1,62 @@
-import React, { useState } from 'react'
+import React, { useEffect, useState } from 'react'
 import './App.css'
 import { DifferenceReportWithInputs } from './models'
 import DiffViewer from './components/DiffViewer'
+import { loadReport, parseNdjsonReport } from './utils/reportLoader'
+
+// Opened as ?job=<id>&server=<url>, the viewer streams the report of a job from `compair serve`
+// and renders the changes as they are classified.
+async function streamJob(
+  server: string,
+  jobId: string,
+  onReport: (report: DifferenceReportWithInputs) => void,
+  signal: AbortSignal
+) {
+  const response = await fetch(`${server.replace(/\/$/, '')}/jobs/${encodeURIComponent(jobId)}/stream`, { signal })
+  if (!response.ok || !response.body) throw new Error(`Server responded with ${response.status}`)
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let text = ''
+  for (;;) {
+    const { done, value } = await reader.read()
+    if (done) break
+    text += decoder.decode(value, { stream: true })
+    if (text.includes('\n')) onReport(parseNdjsonReport(text))
+  }
+}
 
 const App: React.FC = () => {
   const [data, setData] = useState<DifferenceReportWithInputs | null>(null)
   const [error, setError] = useState<string | null>(null)
 
+  useEffect(() => {
+    const params = new URLSearchParams(window.location.search)
+    const jobId = params.get('job')
+    if (!jobId) return
+    const controller = new AbortController()
+    streamJob(params.get('server') ?? 'http://127.0.0.1:8765', jobId, setData, controller.signal)
+      .then(() => setError(null))
+      .catch((err) => {
+        if (!controller.signal.aborted) setError(`Failed to stream job ${jobId}: ${err}`)
+      })
+    return () => controller.abort()
+  }, [])
+
   const handleFileUpload: React.ChangeEventHandler<HTMLInputElement> = (e) => {
     const file = e.target.files?.[0]
     if (!file) return
-    const reader = new FileReader()
-    reader.onload = () => {
-      try {
-        const parsed = JSON.parse(String(reader.result)) as DifferenceReportWithInputs
+    file
+      .arrayBuffer()
+      .then((buffer) => loadReport(buffer, file.name))
+      .then((parsed) => {
         // Basic shape check
         if (!parsed.document_a || !parsed.document_b || !parsed.difference_report?.changes) {
           throw new Error('Invalid JSON shape')
         }
         setData(parsed)
         setError(null)
-      } catch (err) {
-        setError('Failed to parse JSON. Please provide a valid file.')
-      }
-    }
-    reader.onerror = () => setError('Failed to read file')
-    reader.readAsText(file)
+      })
+      .catch(() => setError('Failed to parse the report. Please provide a valid file.'))
   }
 
   const handleClear = () => setData(null)
@@ -92,7 +123,7 @@ const App: React.FC = () => {
         <div className="topbar">
           <div className="controls inline">
             <label className="upload-btn">
-              <input type="file" accept="application/json" onChange={handleFileUpload} />
+              <input type="file" accept="application/json,.json,.ndjson,.jsonl,.gz,.msgpack" onChange={handleFileUpload} />
               Upload JSON
             </label>
             {data && (
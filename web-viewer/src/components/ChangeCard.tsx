@@ -9,11 +9,12 @@ interface ChangeCardProps {
   location?: string | null
   impact?: ImpactAnalysis | null
   summary?: string | null
+  locallyDecided?: boolean
   onClose?: () => void
   style?: React.CSSProperties
 }
 
-const ChangeCard: React.FC<ChangeCardProps> = ({ changeId, category, changeType, confidence, location, impact, summary, style }) => {
+const ChangeCard: React.FC<ChangeCardProps> = ({ changeId, category, changeType, confidence, location, impact, summary, locallyDecided, style }) => {
   const frameClass = category === 'Critical' ? 'frame-critical' : category === 'Minor' ? 'frame-minor' : 'frame-formatting'
   const typeBadge = `badge-type-${changeType}`
   const catBadge = `badge-cat-${category}`
@@ -26,6 +27,7 @@ const ChangeCard: React.FC<ChangeCardProps> = ({ changeId, category, changeType,
         <span className={`badge ${typeBadge}`}>{changeType}</span>
         <span className={`badge ${catBadge}`}>{category}</span>
         {impact?.severity ? <span className={`badge ${sevBadge}`}>severity: {impact.severity}</span> : null}
+        {locallyDecided ? <span className="badge badge-local">rule-based</span> : null}
       </div>
       <div className="row">
         <div className="k">Location</div>
@@ -107,6 +107,7 @@ const DiffViewer: React.FC<DiffViewerProps> = ({ data }) => {
           location={hoverInfo.change.change_classification.location ?? undefined}
           impact={hoverInfo.change.change_classification.impact_analysis ?? null}
           summary={hoverInfo.change.change_classification.summary ?? undefined}
+          locallyDecided={hoverInfo.change.change_classification.locally_decided ?? false}
           style={{ left: hoverInfo.x, top: hoverInfo.y }}
         />
       ) : null}
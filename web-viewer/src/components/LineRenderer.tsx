@@ -4,8 +4,7 @@ import remarkGfm from 'remark-gfm'
 import remarkBreaks from 'remark-breaks'
 import rehypeRaw from 'rehype-raw'
 import { ChangeItem } from '../models'
-
-type Highlight = { key: string; cls: string; change: ChangeItem; part: 'old' | 'new'; text: string }
+import { Highlight, WordRange } from '../utils/diffUtils'
 
 interface LineRendererProps {
   line: string
@@ -17,6 +16,17 @@ interface LineRendererProps {
   onHideHover: () => void
 }
 
+// Wraps the changed words in <mark> elements, which rehype-raw renders within the markdown
+function markWords(line: string, words: WordRange[], cls: string): string {
+  let marked = ''
+  let pos = 0
+  for (const [start, end] of words) {
+    marked += line.slice(pos, start) + `<mark class="${cls}">` + line.slice(start, end) + '</mark>'
+    pos = end
+  }
+  return marked + line.slice(pos)
+}
+
 const LineRenderer: React.FC<LineRendererProps> = ({ line, lineIdx, side, aMap, bMap, onShowHover, onHideHover }) => {
   const list = side === 'a' ? aMap[lineIdx] : bMap[lineIdx]
 
@@ -42,7 +52,7 @@ const LineRenderer: React.FC<LineRendererProps> = ({ line, lineIdx, side, aMap,
           style={{ cursor: 'help' }}
         >
           <ReactMarkdown remarkPlugins={[remarkGfm, remarkBreaks]} rehypePlugins={[rehypeRaw]}>
-            {line || '\u00A0'}
+            {h.words?.length ? markWords(line, h.words, h.part === 'old' ? 'word-removed' : 'word-added') : line || '\u00A0'}
           </ReactMarkdown>
         </div>
       ))}
@@ -14,6 +14,7 @@ export interface ChangeClassification {
   location?: string | null
   impact_analysis?: ImpactAnalysis | null
   summary?: string | null
+  locally_decided?: boolean
 }
 
 export interface HunkHeader {
@@ -23,11 +24,20 @@ export interface HunkHeader {
   end_line_new: number
 }
 
+// Offsets into old_excerpt and new_excerpt, counted in Unicode code points
+export interface WordSpan {
+  old_start: number
+  old_end: number
+  new_start: number
+  new_end: number
+}
+
 export interface DiffHunk {
   unified_diff: string
   old_excerpt: string | null
   new_excerpt: string | null
   hunk_header: HunkHeader
+  word_spans?: WordSpan[] | null
 }
 
 export interface ChangeItem {
@@ -1,9 +1,57 @@
-import { Category, ChangeItem } from '../models'
+import { Category, ChangeItem, WordSpan } from '../models'
 
 export const categoryClass = (category: Category) =>
   category === 'Critical' ? 'category-critical' : category === 'Minor' ? 'category-minor' : 'category-formatting'
 
-type Highlight = { key: string; cls: string; change: ChangeItem; part: 'old' | 'new'; text: string }
+// Start and end of changed words within a document line
+export type WordRange = [number, number]
+
+export type Highlight = {
+  key: string
+  cls: string
+  change: ChangeItem
+  part: 'old' | 'new'
+  text: string
+  words?: WordRange[]
+}
+
+// Python counts offsets in code points, JavaScript strings index UTF-16 code units
+function codePointOffsets(text: string): (offset: number) => number {
+  if (!/[\uD800-\uDFFF]/.test(text)) return offset => offset
+  const units = [0]
+  for (const char of text) units.push(units[units.length - 1] + char.length)
+  return offset => units[Math.min(offset, units.length - 1)]
+}
+
+// Splits the precomputed word spans of a hunk by the lines of one of its excerpts. Insertions
+// and removals leave an empty range on the other side, which is not highlighted.
+function excerptWordRanges(excerpt: string, spans: WordSpan[], part: 'old' | 'new'): WordRange[][] {
+  const toUtf16 = codePointOffsets(excerpt)
+  const ranges = spans.map(span =>
+    part === 'old'
+      ? [toUtf16(span.old_start), toUtf16(span.old_end)]
+      : [toUtf16(span.new_start), toUtf16(span.new_end)]
+  )
+  let lineStart = 0
+  return excerpt.split('\n').map(line => {
+    const lineEnd = lineStart + line.length
+    const lineRanges: WordRange[] = []
+    for (const [start, end] of ranges) {
+      if (start < lineEnd && end > lineStart) {
+        lineRanges.push([Math.max(start, lineStart) - lineStart, Math.min(end, lineEnd) - lineStart])
+      }
+    }
+    lineStart = lineEnd + 1
+    return lineRanges
+  })
+}
+
+// Moves the ranges of an excerpt line to where the line was found in the document line
+function wordsInLine(docLine: string, excerptLine: string, ranges: WordRange[] | undefined): WordRange[] | undefined {
+  const offset = ranges?.length ? docLine.indexOf(excerptLine) : -1
+  if (!ranges || offset < 0) return undefined
+  return ranges.map(([start, end]) => [start + offset, end + offset])
+}
 
 export function buildLineHighlights(
   docALines: string[],
@@ -25,6 +73,9 @@ export function buildLineHighlights(
     const newSrc = ch.diff_hunk?.new_excerpt ?? ch.new_excerpt ?? ''
     const oldLines = oldSrc.split('\n')
     const newLines = newSrc.split('\n')
+    const spans = ch.diff_hunk?.word_spans
+    const oldWords = spans && oldSrc ? excerptWordRanges(oldSrc, spans, 'old') : []
+    const newWords = spans && newSrc ? excerptWordRanges(newSrc, spans, 'new') : []
 
     const header = ch.diff_hunk?.hunk_header
 
@@ -40,7 +91,14 @@ export function buildLineHighlights(
 
       for (let lineIdx = aWindowStart; lineIdx <= aWindowEnd; lineIdx++) {
         if (docALines[lineIdx].includes(needle)) {
-          ensure(aMap, lineIdx).push({ key: `${ch.change_id ?? idx}-o-${i}-${lineIdx}`, cls, change: ch, part: 'old', text: oldLines[i] })
+          ensure(aMap, lineIdx).push({
+            key: `${ch.change_id ?? idx}-o-${i}-${lineIdx}`,
+            cls,
+            change: ch,
+            part: 'old',
+            text: oldLines[i],
+            words: wordsInLine(docALines[lineIdx], oldLines[i], oldWords[i])
+          })
           matched = true
           break
         }
@@ -49,7 +107,14 @@ export function buildLineHighlights(
       if (!matched && !header) {
         for (let lineIdx = 0; lineIdx < docALines.length; lineIdx++) {
           if (docALines[lineIdx].includes(needle)) {
-            ensure(aMap, lineIdx).push({ key: `${ch.change_id ?? idx}-o-${i}-${lineIdx}`, cls, change: ch, part: 'old', text: oldLines[i] })
+            ensure(aMap, lineIdx).push({
+              key: `${ch.change_id ?? idx}-o-${i}-${lineIdx}`,
+              cls,
+              change: ch,
+              part: 'old',
+              text: oldLines[i],
+              words: wordsInLine(docALines[lineIdx], oldLines[i], oldWords[i])
+            })
             break
           }
         }
@@ -63,7 +128,14 @@ export function buildLineHighlights(
 
       for (let lineIdx = bWindowStart; lineIdx <= bWindowEnd; lineIdx++) {
         if (docBLines[lineIdx].includes(needle)) {
-          ensure(bMap, lineIdx).push({ key: `${ch.change_id ?? idx}-n-${i}-${lineIdx}`, cls, change: ch, part: 'new', text: newLines[i] })
+          ensure(bMap, lineIdx).push({
+            key: `${ch.change_id ?? idx}-n-${i}-${lineIdx}`,
+            cls,
+            change: ch,
+            part: 'new',
+            text: newLines[i],
+            words: wordsInLine(docBLines[lineIdx], newLines[i], newWords[i])
+          })
           matched = true
           break
         }
@@ -72,7 +144,14 @@ export function buildLineHighlights(
       if (!matched && !header) {
         for (let lineIdx = 0; lineIdx < docBLines.length; lineIdx++) {
           if (docBLines[lineIdx].includes(needle)) {
-            ensure(bMap, lineIdx).push({ key: `${ch.change_id ?? idx}-n-${i}-${lineIdx}`, cls, change: ch, part: 'new', text: newLines[i] })
+            ensure(bMap, lineIdx).push({
+              key: `${ch.change_id ?? idx}-n-${i}-${lineIdx}`,
+              cls,
+              change: ch,
+              part: 'new',
+              text: newLines[i],
+              words: wordsInLine(docBLines[lineIdx], newLines[i], newWords[i])
+            })
             break
           }
         }
@@ -0,0 +1,155 @@
+import { decodeMulti } from '@msgpack/msgpack'
+import { ChangeItem, DiffHunk, DifferenceReportWithInputs } from '../models'
+
+const changeOrder = (change: ChangeItem) => Number(change.change_id ?? Number.MAX_SAFE_INTEGER)
+
+// A trailing partial line from an interrupted run is ignored.
+function parseJsonLines(text: string): unknown[] {
+  const lines = text.split('\n').filter(line => line.trim().length > 0)
+  const records: unknown[] = []
+  for (let i = 0; i < lines.length; i++) {
+    try {
+      records.push(JSON.parse(lines[i]))
+    } catch (err) {
+      if (i === lines.length - 1) break
+      throw err
+    }
+  }
+  return records
+}
+
+// NDJSON reports hold the documents in the first record and one change per following record.
+// Records arrive in completion order, so changes are sorted by change_id.
+export function parseNdjsonReport(text: string): DifferenceReportWithInputs {
+  const [head, ...changes] = parseJsonLines(text) as [
+    { document_a: string; document_b: string },
+    ...ChangeItem[]
+  ]
+  return {
+    document_a: head.document_a,
+    document_b: head.document_b,
+    difference_report: { changes: changes.sort((a, b) => changeOrder(a) - changeOrder(b)), summary: null }
+  }
+}
+
+// Compact reports (`compair -f compact`, `compact-gzip` or `compact-msgpack`) store the documents
+// once and describe each hunk by line offsets into them; see compair/compact.py for the layout.
+const COMPACT_FORMAT = 'compair-compact'
+const COMPACT_VERSION = 1
+const COMPACT_PREFIX = /^\s*\{"format":\s*"compair-compact"/
+
+// Same line boundaries as Python's str.splitlines, which the offsets refer to
+const LINE_BREAK = /\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]/
+
+type CompactBlock = [header: string, lineA: number, lineB: number, ops: string]
+
+interface CompactHunk {
+  blocks: CompactBlock[]
+  hunk_header: [number, number, number, number]
+  location?: string
+  word_spans?: Array<[number, number, number, number]>
+}
+
+interface CompactHead {
+  format: string
+  version: number
+  document_a: string
+  document_b: string
+}
+
+type CompactRecord = ChangeItem & { hunk?: CompactHunk; summary?: string | null }
+
+function splitLines(text: string): string[] {
+  const lines = text.split(LINE_BREAK)
+  if (lines[lines.length - 1] === '') lines.pop()
+  return lines
+}
+
+function decodeHunk(hunk: CompactHunk, linesA: string[], linesB: string[]): DiffHunk {
+  const diffLines: string[] = []
+  const oldExcerpt: string[] = []
+  const newExcerpt: string[] = []
+  for (const [header, lineA, lineB, ops] of hunk.blocks) {
+    let i = lineA
+    let j = lineB
+    diffLines.push(header)
+    for (const [, tag, count] of ops.matchAll(/([=+-])(\d+)/g)) {
+      for (let k = 0; k < Number(count); k++) {
+        if (tag === '=') {
+          diffLines.push(' ' + linesA[i++])
+          j++
+        } else if (tag === '-') {
+          oldExcerpt.push(linesA[i])
+          diffLines.push('-' + linesA[i++])
+        } else {
+          newExcerpt.push(linesB[j])
+          diffLines.push('+' + linesB[j++])
+        }
+      }
+    }
+  }
+  const [start_line_old, end_line_old, start_line_new, end_line_new] = hunk.hunk_header
+  return {
+    unified_diff: diffLines.join('\n'),
+    old_excerpt: oldExcerpt.length ? oldExcerpt.join('\n') : null,
+    new_excerpt: newExcerpt.length ? newExcerpt.join('\n') : null,
+    hunk_header: { start_line_old, end_line_old, start_line_new, end_line_new },
+    word_spans: hunk.word_spans?.map(([old_start, old_end, new_start, new_end]) => ({ old_start, old_end, new_start, new_end })) ?? null
+  }
+}
+
+export function parseCompactRecords(records: unknown[]): DifferenceReportWithInputs {
+  const [head, ...rest] = records as [CompactHead, ...CompactRecord[]]
+  if (head?.format !== COMPACT_FORMAT || head.version !== COMPACT_VERSION) {
+    throw new Error('Unsupported compact report')
+  }
+  const linesA = splitLines(head.document_a)
+  const linesB = splitLines(head.document_b)
+  const changes: ChangeItem[] = []
+  let summary: string | null = null
+  for (const record of rest) {
+    if ('summary' in record) {
+      summary = record.summary ?? null
+      continue
+    }
+    const { hunk, ...change } = record
+    changes.push(hunk ? { ...change, diff_hunk: decodeHunk(hunk, linesA, linesB) } : change)
+  }
+  return {
+    document_a: head.document_a,
+    document_b: head.document_b,
+    difference_report: { changes: changes.sort((a, b) => changeOrder(a) - changeOrder(b)), summary }
+  }
+}
+
+export function parseReport(text: string, fileName: string): DifferenceReportWithInputs {
+  if (COMPACT_PREFIX.test(text.slice(0, 64))) {
+    return parseCompactRecords(parseJsonLines(text))
+  }
+  if (fileName.endsWith('.ndjson') || fileName.endsWith('.jsonl')) {
+    return parseNdjsonReport(text)
+  }
+  return JSON.parse(text) as DifferenceReportWithInputs
+}
+
+async function gunzip(buffer: ArrayBuffer): Promise<ArrayBuffer> {
+  const stream = new Blob([buffer]).stream().pipeThrough(new DecompressionStream('gzip'))
+  return new Response(stream).arrayBuffer()
+}
+
+// msgpack-encoded compact reports start with the map of their first record
+const isMsgpackMap = (byte: number) => (byte >= 0x80 && byte <= 0x8f) || byte === 0xde || byte === 0xdf
+
+// Loads any report file: JSON, NDJSON and compact reports, also gzip-compressed, and compact
+// reports encoded as msgpack.
+export async function loadReport(buffer: ArrayBuffer, fileName: string): Promise<DifferenceReportWithInputs> {
+  const gzipped = new Uint8Array(buffer, 0, Math.min(2, buffer.byteLength))
+  if (gzipped[0] === 0x1f && gzipped[1] === 0x8b) {
+    buffer = await gunzip(buffer)
+  }
+  const bytes = new Uint8Array(buffer)
+  if (bytes.length && isMsgpackMap(bytes[0])) {
+    return parseCompactRecords(Array.from(decodeMulti(bytes)))
+  }
+  return parseReport(new TextDecoder().decode(bytes), fileName.replace(/\.gz$/, ''))
+}